@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+Content-addressed storage for the artifacts in testing/results/.
+
+Generated workbooks, their failed- variants and comparison screenshots are
+stored once in testing/results/.blobs/, under the SHA-256 of their content.
+The file in testing/results/<example>/ is a hard link to its blob, so every
+tool keeps reading the usual paths, and a per-example manifest
+(.artifacts.json) maps each artifact name to its digest. Storing an
+artifact whose content is already in the store only links it again: a rerun
+that produces the same output costs no disk space and no copy.
+
+Blobs are only ever replaced by renaming a new file over a path, never
+written in place, and they are read-only, so a file cannot change the blob
+other examples share. Blobs no manifest refers to are removed by `gc`;
+files that were replaced since they were stored are stored again first.
+
+Common usage:
+  python3 utils/artifact_store.py ingest            # Move existing results into the store
+  python3 utils/artifact_store.py stats             # Show how much the store saves
+  python3 utils/artifact_store.py gc --dry-run      # List the blobs gc would remove
+  python3 utils/artifact_store.py gc                # Remove unreachable blobs
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import argparse
+import tempfile
+from pathlib import Path
+
+# Add the project root to sys.path to allow imports to work both when run as a module
+# and directly
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+try:
+    from utils.xlsx_source import CHUNK_SIZE
+except ModuleNotFoundError:
+    from xlsx_source import CHUNK_SIZE
+
+PROJECT_ROOT = Path(__file__).parent.parent
+RESULTS_DIR = PROJECT_ROOT / "testing" / "results"
+
+BLOB_DIR_NAME = ".blobs"
+MANIFEST_NAME = ".artifacts.json"
+MANIFEST_VERSION = 1
+
+# Artifacts that go into the store; status files and text reports stay as they are
+ARTIFACT_PATTERNS = ("*.xlsx", "*.xlsm", "comparison_*.png")
+
+# Blobs younger than this are never collected, so gc cannot race an artifact being stored
+DEFAULT_GRACE_SECONDS = 3600
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def blob_path(digest, results_dir=RESULTS_DIR):
+    return Path(results_dir) / BLOB_DIR_NAME / digest[:2] / digest[2:]
+
+
+def read_manifest(example_dir):
+    """Return {artifact name: digest} for an example directory, empty if it has no manifest"""
+    try:
+        with open(Path(example_dir) / MANIFEST_NAME) as file:
+            manifest = json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+    if manifest.get("version") != MANIFEST_VERSION:
+        return {}
+    return dict(manifest.get("artifacts", {}))
+
+
+def write_manifest(example_dir, artifacts):
+    """Replace the manifest of an example directory atomically; an empty one is removed"""
+    manifest_file = Path(example_dir) / MANIFEST_NAME
+    if not artifacts:
+        manifest_file.unlink(missing_ok=True)
+        return
+    fd, tmp_name = tempfile.mkstemp(prefix=".artifacts-", suffix=".json", dir=example_dir)
+    try:
+        with os.fdopen(fd, "w") as file:
+            json.dump({"version": MANIFEST_VERSION, "artifacts": dict(sorted(artifacts.items()))}, file, indent=1)
+        os.replace(tmp_name, manifest_file)
+    except BaseException:
+        os.unlink(tmp_name)
+        raise
+
+
+def _replace_with(target, make_file):
+    """Create a file next to target with make_file(tmp path) and rename it over target"""
+    target = Path(target)
+    tmp_name = target.with_name(f".{target.name}.{os.getpid()}.tmp")
+    tmp_name.unlink(missing_ok=True)
+    try:
+        make_file(tmp_name)
+        os.replace(tmp_name, target)
+    except BaseException:
+        tmp_name.unlink(missing_ok=True)
+        raise
+
+
+def _link_or_copy(source, target):
+    try:
+        os.link(source, target)
+    except OSError:
+        # File systems without hard links get a copy
+        shutil.copy2(source, target)
+
+
+def _same_file(first, second):
+    try:
+        return os.path.samefile(first, second)
+    except OSError:
+        return False
+
+
+def _add_blob(source, digest, results_dir, how):
+    """Put the content of source into the store under digest, unless it is already there.
+
+    how is "move", "link" (for a file that already is in an example
+    directory) or "copy" (for a file that stays where it is).
+    """
+    blob = blob_path(digest, results_dir)
+    if blob.exists():
+        return blob
+    blob.parent.mkdir(parents=True, exist_ok=True)
+    if how == "move":
+        # A rename when source is on the same file system, a copy otherwise
+        _replace_with(blob, lambda tmp_name: shutil.move(str(source), str(tmp_name)))
+    elif how == "link":
+        _replace_with(blob, lambda tmp_name: _link_or_copy(source, tmp_name))
+    else:
+        _replace_with(blob, lambda tmp_name: shutil.copy2(source, tmp_name))
+    os.chmod(blob, 0o444)
+    return blob
+
+
+def store_artifact(example_name, source, name=None, move=True, results_dir=RESULTS_DIR):
+    """Store a file as the artifact name (default: the file's name) of an example.
+
+    The content goes into the blob store and testing/results/<example>/<name>
+    becomes a link to its blob. With move, source is consumed, as by
+    shutil.move; source may also be the artifact's own path, e.g. a
+    screenshot captured in place. Returns the artifact's path.
+    """
+    source = Path(source)
+    example_dir = Path(results_dir) / example_name
+    example_dir.mkdir(parents=True, exist_ok=True)
+    name = name or source.name
+    dest = example_dir / name
+
+    digest = file_digest(source)
+    in_place = _same_file(source, dest)
+    blob = _add_blob(source, digest, results_dir, "link" if in_place else "move" if move else "copy")
+    if not _same_file(dest, blob):
+        _replace_with(dest, lambda tmp_name: _link_or_copy(blob, tmp_name))
+    if move and not in_place and source.exists():
+        source.unlink()
+
+    artifacts = read_manifest(example_dir)
+    if artifacts.get(name) != digest:
+        artifacts[name] = digest
+        write_manifest(example_dir, artifacts)
+    return dest
+
+
+def example_dirs(results_dir=RESULTS_DIR):
+    return sorted(path for path in Path(results_dir).iterdir() if path.is_dir() and path.name != BLOB_DIR_NAME)
+
+
+def sync_manifest(example_dir, results_dir=RESULTS_DIR):
+    """Bring a manifest up to date with its directory and return the digests it refers to.
+
+    Files that were replaced since they were stored, e.g. by a new
+    screenshot, are stored again, and entries whose file is gone are dropped.
+    """
+    example_dir = Path(example_dir)
+    for name, digest in read_manifest(example_dir).items():
+        path = example_dir / name
+        if path.exists() and not _same_file(path, blob_path(digest, results_dir)):
+            store_artifact(example_dir.name, path, results_dir=results_dir)
+
+    artifacts = read_manifest(example_dir)
+    present = {name: digest for name, digest in artifacts.items() if (example_dir / name).exists()}
+    if present != artifacts:
+        write_manifest(example_dir, present)
+    return set(present.values())
+
+
+def iter_blobs(results_dir=RESULTS_DIR):
+    """Yield (digest, path) for every blob in the store"""
+    blob_dir = Path(results_dir) / BLOB_DIR_NAME
+    if not blob_dir.is_dir():
+        return
+    for prefix_dir in sorted(blob_dir.iterdir()):
+        if not prefix_dir.is_dir():
+            continue
+        for blob in sorted(prefix_dir.iterdir()):
+            if not blob.name.startswith("."):
+                yield prefix_dir.name + blob.name, blob
+
+
+def collect_garbage(results_dir=RESULTS_DIR, dry_run=False, grace_seconds=DEFAULT_GRACE_SECONDS):
+    """Remove the blobs no manifest refers to; return (blobs removed, bytes freed)"""
+    reachable = set()
+    for example_dir in example_dirs(results_dir):
+        reachable |= sync_manifest(example_dir, results_dir) if not dry_run else set(read_manifest(example_dir).values())
+
+    cutoff = time.time() - grace_seconds
+    removed = freed = 0
+    for digest, blob in iter_blobs(results_dir):
+        if digest in reachable:
+            continue
+        stat = blob.stat()
+        if stat.st_mtime > cutoff:
+            continue
+        removed += 1
+        # A blob still linked from an example directory frees nothing until that file goes too
+        freed += stat.st_size if stat.st_nlink == 1 else 0
+        if not dry_run:
+            blob.unlink()
+    if not dry_run:
+        for prefix_dir in (Path(results_dir) / BLOB_DIR_NAME).glob("*"):
+            if prefix_dir.is_dir() and not any(prefix_dir.iterdir()):
+                prefix_dir.rmdir()
+    return removed, freed
+
+
+def ingest(results_dir=RESULTS_DIR):
+    """Store the artifacts already in the example directories; return how many were stored"""
+    stored = 0
+    for example_dir in example_dirs(results_dir):
+        known = read_manifest(example_dir)
+        for pattern in ARTIFACT_PATTERNS:
+            for path in sorted(example_dir.glob(pattern)):
+                if path.name in known and _same_file(path, blob_path(known[path.name], results_dir)):
+                    continue
+                store_artifact(example_dir.name, path, results_dir=results_dir)
+                stored += 1
+    return stored
+
+
+def store_stats(results_dir=RESULTS_DIR):
+    """Return (artifacts, blobs, bytes stored, bytes the artifacts would take as copies)"""
+    sizes = {digest: blob.stat().st_size for digest, blob in iter_blobs(results_dir)}
+    artifacts = logical = 0
+    for example_dir in example_dirs(results_dir):
+        for digest in read_manifest(example_dir).values():
+            artifacts += 1
+            logical += sizes.get(digest, 0)
+    return artifacts, len(sizes), sum(sizes.values()), logical
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the content-addressed store of testing/results artifacts")
+    parser.add_argument("command", choices=["ingest", "gc", "stats"],
+                        help="ingest existing artifacts, gc unreachable blobs or show stats")
+    parser.add_argument("--dry-run", action="store_true", help="gc: only report what would be removed")
+    parser.add_argument("--grace", type=float, default=DEFAULT_GRACE_SECONDS,
+                        help=f"gc: keep unreachable blobs younger than this many seconds (default: {DEFAULT_GRACE_SECONDS})")
+    parser.add_argument("--results-dir", default=str(RESULTS_DIR), help="Results directory (default: testing/results)")
+
+    args = parser.parse_args()
+    results_dir = Path(args.results_dir)
+    if not results_dir.is_dir():
+        print(f"Error: {results_dir} is not a directory")
+        return 1
+
+    if args.command == "ingest":
+        print(f"✅ Stored {ingest(results_dir)} artifacts")
+    elif args.command == "gc":
+        removed, freed = collect_garbage(results_dir, dry_run=args.dry_run, grace_seconds=args.grace)
+        verb = "Would remove" if args.dry_run else "Removed"
+        print(f"✅ {verb} {removed} unreachable blobs, freeing {freed / 1024:.1f} KB")
+
+    artifacts, blobs, stored, logical = store_stats(results_dir)
+    print(f"{artifacts} artifacts in {blobs} blobs: {stored / 1024:.1f} KB stored for {logical / 1024:.1f} KB of artifacts")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -8,14 +8,20 @@ Common usage:
   python3 utils/autocheck.py example_name --build --run        # Build, run and check
   python3 utils/autocheck.py example_name --ignore-styles      # Ignore style differences
   python3 utils/autocheck.py --all                             # Check all examples
+  python3 utils/autocheck.py --all --jobs 4 --max-rss 512      # Check in 4 recycled worker processes
+  python3 utils/autocheck.py --all --run --io-report           # Report I/O, temp files, memory and CPU per run
+  python3 utils/autocheck.py example_name --checks formulas,xml  # Run only some of the checks
+  python3 utils/autocheck.py --all --no-cache                  # Rerun every check instead of replaying cached results
   python3 utils/autocheck.py --list-broken                     # List known broken examples
+  some_generator | python3 utils/autocheck.py example_name --stdin --file-only  # Check piped workbook bytes
 """
 
 import os
 import sys
 import argparse
 from pathlib import Path
-import openpyxl
+import io
+import contextlib
 import traceback
 
 # Add the project root to sys.path to allow imports to work both when run as a module 
@@ -27,26 +33,22 @@ sys.path.insert(0, str(project_root))
 # Import local modules
 try:
     # When run as module (python -m utils.autocheck)
-    from utils.excel_checks import (
-        check_formulas,
-        check_string_null_termination,
-        check_xml_content,
-        check_binary_compatibility,
-        check_row_visibility
-    )
-    from utils.file_comparison import compare_with_reference, get_relative_path
-    from utils.example_runner import build_example, run_example
+    from utils.check_registry import CHECKS, CheckContext, select_checks, run_checks
+    from utils.file_comparison import get_relative_path
+    from utils.example_runner import build_example, run_example, ResourceLimits, print_run_stats
+    from utils.xlsx_source import source_label
+    from utils.prefetch import ExamplePrefetcher, DEFAULT_DEPTH
+    from utils.worker_pool import RecyclingPool, MB
+    from utils.result_cache import ResultCache, DEFAULT_CACHE_DIR, DEFAULT_CACHE_MB
 except ModuleNotFoundError:
     # When run directly (python utils/autocheck.py)
-    from excel_checks import (
-        check_formulas,
-        check_string_null_termination,
-        check_xml_content,
-        check_binary_compatibility,
-        check_row_visibility
-    )
-    from file_comparison import compare_with_reference, get_relative_path
-    from example_runner import build_example, run_example
+    from check_registry import CHECKS, CheckContext, select_checks, run_checks
+    from file_comparison import get_relative_path
+    from example_runner import build_example, run_example, ResourceLimits, print_run_stats
+    from xlsx_source import source_label
+    from prefetch import ExamplePrefetcher, DEFAULT_DEPTH
+    from worker_pool import RecyclingPool, MB
+    from result_cache import ResultCache, DEFAULT_CACHE_DIR, DEFAULT_CACHE_MB
 
 # Set up paths
 PROJECT_ROOT = Path(__file__).parent.parent
@@ -78,6 +80,20 @@ def is_broken_example(example_name, broken_examples=None):
     return example_name in broken_examples
 
 
+def resource_limits(args):
+    """Return the ResourceLimits for example runs given on the command line, or None"""
+    if not (args.limit_memory or args.limit_cpu or args.limit_file_size):
+        return None
+    return ResourceLimits(args.limit_memory, args.limit_cpu, args.limit_file_size)
+
+
+def result_cache(args):
+    """Return the ResultCache check results are memoized in, or None with --no-cache"""
+    if args.no_cache:
+        return None
+    return ResultCache(args.cache_dir, args.cache_size * MB)
+
+
 def check_single_example(example_name, args):
     """Run checks on a single example"""
     # Check if example is known to be broken
@@ -103,75 +119,60 @@ def check_single_example(example_name, args):
     
     # Run if requested
     if args.run:
-        if not run_example(example_name, PROJECT_ROOT):
+        run_stats = [] if args.io_report else None
+        ran = run_example(example_name, PROJECT_ROOT, limits=resource_limits(args), run_stats=run_stats)
+        print_run_stats(run_stats)
+        if not ran:
             return is_broken  # Return success for broken examples
     
-    # Look for the Excel file
-    excel_file = Path(f"{example_name}.xlsx")
-    excel_macro_file = Path(f"{example_name}.xlsm")
-    if not excel_file.exists() and not excel_macro_file.exists():
-        print(f"❌ Excel file not found: {excel_file} or {excel_macro_file}")
-        print("Run with --run option to generate it")
-        return is_broken  # Return success for broken examples
+    if args.stdin:
+        # Check a workbook piped in from a generator, without writing it to disk
+        excel_file = sys.stdin.buffer.read()
+    else:
+        # Look for the Excel file
+        excel_file = Path(f"{example_name}.xlsx")
+        excel_macro_file = Path(f"{example_name}.xlsm")
+        if not excel_file.exists() and not excel_macro_file.exists():
+            print(f"❌ Excel file not found: {excel_file} or {excel_macro_file}")
+            print("Run with --run option to generate it")
+            return is_broken  # Return success for broken examples
+        
+        # Use the macro file if it exists, otherwise use the regular file
+        excel_file = excel_macro_file if excel_macro_file.exists() else excel_file
     
-    # Use the macro file if it exists, otherwise use the regular file
-    excel_file = excel_macro_file if excel_macro_file.exists() else excel_file
+    print(f"\n=== Checking Excel file: {source_label(excel_file)} ===\n")
     
-    print(f"\n=== Checking Excel file: {excel_file} ===\n")
+    checks = select_checks(args.checks)
+    cache = result_cache(args)
     
     try:
-        # Load workbook for checks
-        workbook = openpyxl.load_workbook(excel_file)
-        
-        # Run checks
-        print(f"[{example_name}] Checking formulas...")
-        formula_check = check_formulas(workbook, example_name)
-        
-        print(f"[{example_name}] Checking string null-termination...")
-        string_check = check_string_null_termination(workbook, example_name)
-        
-        print(f"[{example_name}] Checking XML content...")
-        xml_check = check_xml_content(example_name)
-        
-        print(f"[{example_name}] Checking binary compatibility...")
-        binary_check = check_binary_compatibility(example_name, REFERENCE_DIR)
-        
-        print(f"[{example_name}] Checking row visibility...")
-        visibility_check = check_row_visibility(example_name, REFERENCE_DIR)
-        
-        print(f"[{example_name}] Comparing with reference file...")
-        content_check = compare_with_reference(
-            example_name, 
-            REFERENCE_DIR, 
-            RESULTS_DIR, 
-            PROJECT_ROOT, 
-            ignore_styles=args.ignore_styles
-        )
-        
-        # Summary
-        print(f"\n=== Check Summary for {example_name} ===")
-        print(f"Formula Check: {'✅ PASSED' if formula_check else '❌ FAILED'}")
-        print(f"String Null-Termination: {'✅ PASSED' if string_check else '❌ FAILED'}")
-        print(f"XML Check: {'✅ PASSED' if xml_check else '❌ FAILED'}")
-        print(f"Binary Compatibility: {'✅ PASSED' if binary_check else '❌ FAILED'}")
-        print(f"Row Visibility: {'✅ PASSED' if visibility_check else '❌ FAILED'}")
-        print(f"Content Check: {'✅ PASSED' if content_check else '❌ FAILED'}")
-        
-        all_passed = formula_check and string_check and xml_check and binary_check and visibility_check and content_check
-        
-        if is_broken and not all_passed:
-            print(f"\n{example_name} ⚠️ Known broken example failed checks as expected.")
-            return True  # Return success for broken examples that fail
-        elif is_broken and all_passed:
-            print(f"\n{example_name} ⚠️ This example is listed as broken but all checks passed!")
-            print("Consider removing it from testing/.broken")
-            return False  # Fail when a "broken" example passes all checks
-        elif all_passed:
-            print(f"\n{example_name} ✅ All checks passed! The file should pass manual verification.")
-            return True
-        else:
-            print(f"\n{example_name} ⚠️ Some checks failed. Review issues before manual verification.")
-            return False
+        # Each input is loaded once, and only if one of the selected checks reads it
+        with CheckContext(example_name, excel_file, REFERENCE_DIR, RESULTS_DIR, PROJECT_ROOT,
+                          ignore_styles=args.ignore_styles, max_findings=args.max_findings) as context:
+            results = run_checks(context, checks, cache=cache)
+            if cache is not None:
+                cache.evict()
+            
+            # Summary
+            print(f"\n=== Check Summary for {example_name} ===")
+            for check in checks:
+                print(f"{check.summary}: {'✅ PASSED' if results[check.name] else '❌ FAILED'}")
+            
+            all_passed = all(results.values())
+            
+            if is_broken and not all_passed:
+                print(f"\n{example_name} ⚠️ Known broken example failed checks as expected.")
+                return True  # Return success for broken examples that fail
+            elif is_broken and all_passed:
+                print(f"\n{example_name} ⚠️ This example is listed as broken but all checks passed!")
+                print("Consider removing it from testing/.broken")
+                return False  # Fail when a "broken" example passes all checks
+            elif all_passed:
+                print(f"\n{example_name} ✅ All checks passed! The file should pass manual verification.")
+                return True
+            else:
+                print(f"\n{example_name} ⚠️ Some checks failed. Review issues before manual verification.")
+                return False
             
     except Exception as e:
         print(f"{example_name} ❌ Error checking Excel file: {e}")
@@ -179,12 +180,162 @@ def check_single_example(example_name, args):
         return is_broken  # Return success for broken examples
 
 
+def check_example_file(example_file, args, checks, broken_examples, failed_examples, prefetcher=None,
+                       run_stats=None, cache=None):
+    """Check one example of a --all run, appending to failed_examples if it fails.
+
+    The resource use of running the example is appended to run_stats if given,
+    and check results are memoized in cache if given.
+    """
+    example_name = example_file.stem
+    if example_name == "status":  # Skip status binary
+        return
+        
+    # Skip broken examples unless forced
+    if is_broken_example(example_name, broken_examples) and not args.force:
+        print(f"{example_name} [BROKEN] ⚠️ Skipping as known broken example")
+        return
+        
+    # Run if requested
+    if args.run:
+        if not run_example(example_name, PROJECT_ROOT, quiet=True, limits=resource_limits(args), run_stats=run_stats):
+            if is_broken_example(example_name, broken_examples):
+                print(f"{example_name} [BROKEN] ✅ Failed to run as expected")
+                return
+            failed_examples.append((example_name, "Failed to run example"))
+            return
+        
+    # Only check Excel files if we're not in build-only mode
+    if not (args.build and not args.run):
+        # Check the Excel file
+        excel_file = Path(f"{example_name}.xlsx")
+        excel_macro_file = Path(f"{example_name}.xlsm")
+        if not excel_file.exists() and not excel_macro_file.exists():
+            if prefetcher is not None:
+                prefetcher.skip(example_name)
+            if is_broken_example(example_name, broken_examples):
+                print(f"{example_name} [BROKEN] ✅ Excel file not generated as expected")
+                return
+            failed_examples.append((example_name, "Excel file not generated"))
+            return
+        
+        try:
+            # Use the macro file if it exists, otherwise use the regular file
+            file_to_check = excel_macro_file if excel_macro_file.exists() else excel_file
+            
+            # Run checks, keeping their output to show only if something fails
+            output = io.StringIO()
+            with contextlib.ExitStack() as stack:
+                generated, reference = file_to_check, None
+                if prefetcher is not None:
+                    sources = prefetcher.take(example_name)
+                    for archive in sources:
+                        if archive is not None:
+                            stack.callback(archive.close)
+                    generated = sources.generated or file_to_check
+                    reference = sources.reference
+                context = stack.enter_context(
+                    CheckContext(example_name, generated, REFERENCE_DIR, RESULTS_DIR, PROJECT_ROOT,
+                                 ignore_styles=args.ignore_styles, reference=reference,
+                                 max_findings=args.max_findings))
+                with contextlib.redirect_stdout(output):
+                    results = run_checks(context, checks, cache=cache)
+            
+            all_passed = all(results.values())
+            
+            if is_broken_example(example_name, broken_examples):
+                if all_passed:
+                    print(f"{example_name} [BROKEN] ⚠️ Unexpectedly passed all checks")
+                    failed_examples.append((example_name, "Broken example passed all checks"))
+                else:
+                    print(f"{example_name} [BROKEN] ✅ Failed checks as expected")
+            elif all_passed:
+                print(f"{example_name} ✅")
+            else:
+                failed_examples.append((example_name, "One or more checks failed"))
+                print(f"\nDetailed output for {example_name}:")
+                print(output.getvalue(), end="")
+            
+        except Exception as e:
+            if is_broken_example(example_name, broken_examples):
+                print(f"{example_name} [BROKEN] ✅ Error occurred as expected: {e}")
+                return
+            failed_examples.append((example_name, f"Error checking Excel file: {e}"))
+
+
+# State of a check worker process, set up once per worker by _init_check_worker
+_worker_state = {}
+
+
+def _init_check_worker(args):
+    _worker_state['args'] = args
+    _worker_state['checks'] = select_checks(args.checks)
+    _worker_state['broken_examples'] = load_broken_examples()
+    _worker_state['cache'] = result_cache(args)
+
+
+def _check_in_worker(example_file):
+    """Check one example in a worker process and return its output, failures and run statistics"""
+    failed_examples = []
+    run_stats = []
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        check_example_file(example_file, _worker_state['args'], _worker_state['checks'],
+                           _worker_state['broken_examples'], failed_examples, run_stats=run_stats,
+                           cache=_worker_state['cache'])
+    return output.getvalue(), failed_examples, run_stats
+
+
+def check_examples_in_workers(example_files, args, failed_examples, run_stats=None):
+    """Check examples in recycled worker processes, printing their output in order.
+
+    Returns the peak memory of every example that was checked, as (example name, bytes).
+    """
+    pool = RecyclingPool(_check_in_worker, jobs=args.jobs, recycle_after=args.recycle_after,
+                         max_rss=args.max_rss * MB if args.max_rss else None,
+                         memory_budget=args.memory_budget * MB if args.memory_budget else None,
+                         initializer=_init_check_worker, initargs=(args,))
+    peaks = []
+    for outcome in pool.run(example_files):
+        example_name = outcome.task.stem
+        if outcome.error is not None:
+            if outcome.error == "exceeded the memory budget":
+                error = f"Check worker exceeded the memory budget of {args.memory_budget} MB"
+            else:
+                error = f"Check worker failed: {outcome.error}"
+            print(f"{example_name} ❌ {error}")
+            failed_examples.append((example_name, error))
+            continue
+        output, failures, example_run_stats = outcome.result
+        print(output, end="")
+        failed_examples.extend(failures)
+        if run_stats is not None:
+            run_stats.extend(example_run_stats)
+        if outcome.peak_rss:
+            peaks.append((example_name, outcome.peak_rss))
+    if args.verbose:
+        print(f"Workers recycled: {pool.recycled}")
+    return peaks
+
+
+def print_peak_memory(peaks, count=5):
+    """Print the examples that needed the most memory"""
+    if not peaks:
+        return
+    print("\n=== Peak Memory ===")
+    for example_name, peak in sorted(peaks, key=lambda item: -item[1])[:count]:
+        print(f"{example_name}: {peak / MB:.1f} MB")
+
+
 def check_all_examples(args):
     """Run checks on all examples"""
     # Get all example files
     example_files = list(EXAMPLES_DIR.glob("*.zig"))
     failed_examples = []
     broken_examples = load_broken_examples()
+    checks = select_checks(args.checks)
+    run_stats = [] if args.io_report else None
+    cache = result_cache(args)
     
     # Build all examples at once if requested
     if args.build:
@@ -195,101 +346,30 @@ def check_all_examples(args):
         else:
             print("✅")
     
-    for example_file in example_files:
-        example_name = example_file.stem
-        if example_name == "status":  # Skip status binary
-            continue
-            
-        # Skip broken examples unless forced
-        if is_broken_example(example_name, broken_examples) and not args.force:
-            print(f"{example_name} [BROKEN] ⚠️ Skipping as known broken example")
-            continue
-            
-        # Run if requested
-        if args.run:
-            if not run_example(example_name, PROJECT_ROOT, quiet=True):
-                if is_broken_example(example_name, broken_examples):
-                    print(f"{example_name} [BROKEN] ✅ Failed to run as expected")
-                    continue
-                failed_examples.append((example_name, "Failed to run example"))
-                continue
-            
-        # Only check Excel files if we're not in build-only mode
-        if not (args.build and not args.run):
-            # Check the Excel file
-            excel_file = Path(f"{example_name}.xlsx")
-            excel_macro_file = Path(f"{example_name}.xlsm")
-            if not excel_file.exists() and not excel_macro_file.exists():
-                if is_broken_example(example_name, broken_examples):
-                    print(f"{example_name} [BROKEN] ✅ Excel file not generated as expected")
-                    continue
-                failed_examples.append((example_name, "Excel file not generated"))
-                continue
-            
-            try:
-                # Use the macro file if it exists, otherwise use the regular file
-                file_to_check = excel_macro_file if excel_macro_file.exists() else excel_file
-                # Load workbook for checks
-                workbook = openpyxl.load_workbook(file_to_check)
-                
-                # Run checks
-                formula_check = check_formulas(workbook, example_name)
-                string_check = check_string_null_termination(workbook, example_name)
-                xml_check = check_xml_content(example_name)
-                binary_check = check_binary_compatibility(example_name, REFERENCE_DIR)
-                visibility_check = check_row_visibility(example_name, REFERENCE_DIR)
-                content_check = compare_with_reference(
-                    example_name, 
-                    REFERENCE_DIR, 
-                    RESULTS_DIR, 
-                    PROJECT_ROOT, 
-                    quiet=True, 
-                    ignore_styles=args.ignore_styles
-                )
-                
-                all_passed = formula_check and string_check and xml_check and binary_check and visibility_check and content_check
-                
-                if is_broken_example(example_name, broken_examples):
-                    if all_passed:
-                        print(f"{example_name} [BROKEN] ⚠️ Unexpectedly passed all checks")
-                        failed_examples.append((example_name, "Broken example passed all checks"))
-                    else:
-                        print(f"{example_name} [BROKEN] ✅ Failed checks as expected")
-                elif all_passed:
-                    print(f"{example_name} ✅")
-                else:
-                    failed_examples.append((example_name, "One or more checks failed"))
-                    # Re-run checks with verbose output to show details
-                    print(f"\nDetailed output for {example_name}:")
-                    try:
-                        workbook = openpyxl.load_workbook(Path(f"{example_name}.xlsx"))
-                        print(f"\n[{example_name}] Checking formulas...")
-                        check_formulas(workbook, example_name)
-                        print(f"\n[{example_name}] Checking string null-termination...")
-                        check_string_null_termination(workbook, example_name)
-                        print(f"\n[{example_name}] Checking XML content...")
-                        check_xml_content(example_name)
-                        print(f"\n[{example_name}] Checking binary compatibility...")
-                        check_binary_compatibility(example_name, REFERENCE_DIR)
-                        print(f"\n[{example_name}] Checking row visibility...")
-                        check_row_visibility(example_name, REFERENCE_DIR)
-                        print(f"\n[{example_name}] Comparing with reference file...")
-                        compare_with_reference(
-                            example_name, 
-                            REFERENCE_DIR, 
-                            RESULTS_DIR, 
-                            PROJECT_ROOT, 
-                            ignore_styles=args.ignore_styles
-                        )
-                    except Exception as e:
-                        print(f"Error during detailed check: {e}")
-                        traceback.print_exc()
-                
-            except Exception as e:
-                if is_broken_example(example_name, broken_examples):
-                    print(f"{example_name} [BROKEN] ✅ Error occurred as expected: {e}")
-                    continue
-                failed_examples.append((example_name, f"Error checking Excel file: {e}"))
+    if args.jobs:
+        # Each example is checked in a worker process, which is replaced as it ages or grows
+        peaks = check_examples_in_workers(example_files, args, failed_examples, run_stats)
+        print_peak_memory(peaks)
+    else:
+        # Examples are only checked straight from disk when they are not run here;
+        # then the next ones can be opened while the current one is checked
+        prefetcher = None
+        if not args.run and not args.build and args.prefetch > 0:
+            to_check = [example_file.stem for example_file in example_files
+                        if example_file.stem != "status"
+                        and (args.force or not is_broken_example(example_file.stem, broken_examples))]
+            prefetcher = ExamplePrefetcher(to_check, REFERENCE_DIR, depth=args.prefetch)
+        
+        with prefetcher or contextlib.nullcontext():
+            for example_file in example_files:
+                check_example_file(example_file, args, checks, broken_examples, failed_examples, prefetcher,
+                                   run_stats, cache)
+        if cache is not None and args.verbose:
+            print(f"Check results from the cache: {cache.hits} of {cache.hits + cache.misses}")
+    
+    if cache is not None:
+        cache.evict()
+    print_run_stats(run_stats)
     
     # Print detailed failure information if any
     if failed_examples:
@@ -327,9 +407,41 @@ def main():
     parser.add_argument("--ignore-styles", action="store_true", help="Ignore style differences in comparison")
     parser.add_argument("--force", "-f", action="store_true", help="Force checking of known broken examples")
     parser.add_argument("--list-broken", action="store_true", help="List examples marked as broken")
+    parser.add_argument("--stdin", action="store_true", help="Read the workbook to check from standard input instead of a file")
+    parser.add_argument("--checks", help=f"Comma separated checks to run (default: {','.join(check.name for check in select_checks())}; "
+                                         f"also available: {','.join(name for name, check in CHECKS.items() if not check.default)})")
+    parser.add_argument("--max-findings", type=int,
+                        help="Stop a check once it has found this many mismatches (default: no limit)")
+    parser.add_argument("--prefetch", type=int, default=DEFAULT_DEPTH,
+                        help=f"With --all, number of examples to open ahead of the one being checked; 0 disables (default: {DEFAULT_DEPTH})")
+    parser.add_argument("--jobs", "-j", type=int,
+                        help="With --all, check examples in this many worker processes (default: check in this process)")
+    parser.add_argument("--recycle-after", type=int, default=25,
+                        help="With --jobs, replace a worker after it has checked this many examples (default: 25)")
+    parser.add_argument("--max-rss", type=int, default=1024,
+                        help="With --jobs, replace a worker once its memory exceeds this many MB (default: 1024)")
+    parser.add_argument("--memory-budget", type=int,
+                        help="With --jobs, fail an example whose check needs more than this many MB (default: no limit)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Run every check instead of replaying results cached for identical files")
+    parser.add_argument("--cache-dir", default=str(DEFAULT_CACHE_DIR),
+                        help="Directory of the check result cache (default: testing/.check-cache)")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_CACHE_MB,
+                        help=f"Evict the least recently used check results beyond this many MB (default: {DEFAULT_CACHE_MB})")
+    parser.add_argument("--io-report", action="store_true",
+                        help="With --run, report the I/O, temporary file, memory and CPU use of every example run")
+    parser.add_argument("--limit-memory", type=int, help="With --run, limit the address space of example runs to this many MB")
+    parser.add_argument("--limit-cpu", type=int, help="With --run, limit the CPU time of example runs to this many seconds")
+    parser.add_argument("--limit-file-size", type=int, help="With --run, limit the files example runs write to this many MB")
     
     args = parser.parse_args()
     
+    try:
+        select_checks(args.checks)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 1
+    
     if args.list_broken:
         list_broken_examples()
         return 0
@@ -345,6 +457,10 @@ def main():
         print("Error: Must specify either an example name or --all or --list-broken")
         return 1
     
+    if args.stdin and (args.build or args.run):
+        print("Error: Cannot use --stdin together with --build or --run")
+        return 1
+    
     return 0 if check_single_example(args.example, args) else 1
 
 
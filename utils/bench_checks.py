@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the autocheck checks.
+
+Every registered check is run over a ladder of synthetic workbooks (see
+synth_corpus.py). Each check is timed on its own, with its inputs already
+loaded, and the inputs are timed separately, so parsing the sheets with
+XlsxWorkbook is charged to the workbook load and not to the checks that
+read them. Times are reported as
+median and p95 over several runs; peak memory comes from one extra run
+under tracemalloc.
+
+Baselines are kept per machine in a JSON file. A run fails when a check
+gets slower or needs more memory than its baseline allows.
+
+Common usage:
+  python3 utils/bench_checks.py --update-baseline          # Record baselines for this machine
+  python3 utils/bench_checks.py                            # Compare against them
+  python3 utils/bench_checks.py --sizes 10k,1M --checks content,rows --repeat 3
+"""
+
+import io
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import statistics
+import tracemalloc
+import contextlib
+from pathlib import Path
+
+# Add the project root to sys.path to allow imports to work both when run as a module
+# and directly
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+try:
+    from utils.check_registry import CheckContext, INPUTS, input_closure, select_checks, clear_caches
+    from utils.synth_corpus import DEFAULT_SPEC, corpus_name, write_pair
+except ModuleNotFoundError:
+    from check_registry import CheckContext, INPUTS, input_closure, select_checks, clear_caches
+    from synth_corpus import DEFAULT_SPEC, corpus_name, write_pair
+
+PROJECT_ROOT = Path(__file__).parent.parent
+BASELINE_FILE = PROJECT_ROOT / "testing" / "bench-baselines.json"
+
+DEFAULT_SIZES = "10k,100k"
+DEFAULT_REPEAT = 5
+
+# Allowed growth over the baseline, in percent
+DEFAULT_TOLERANCE = 25.0
+DEFAULT_MEMORY_TOLERANCE = 25.0
+
+# Differences below these are noise, whatever the percentage
+MIN_TIME_DELTA = 0.005
+MIN_MEMORY_DELTA = 256 * 1024
+
+
+def parse_size(text):
+    """Parse a cell count such as 10000, 10k or 1M"""
+    text = text.strip()
+    multiplier = {"k": 1_000, "m": 1_000_000}.get(text[-1:].lower(), 1)
+    return int(float(text[:-1] if multiplier > 1 else text) * multiplier)
+
+
+def machine_id():
+    """Identify the machine and interpreter a baseline was recorded on"""
+    return f"{platform.node()}-{platform.machine()}-py{platform.python_version()}"
+
+
+def percentile(samples, fraction):
+    """Nearest-rank percentile of a list of samples"""
+    ordered = sorted(samples)
+    rank = max(1, min(len(ordered), round(fraction * len(ordered) + 0.5)))
+    return ordered[rank - 1]
+
+
+def _measure(run, repeat, prepare):
+    """Time run() repeat times and trace its peak memory once more.
+
+    prepare() is called before every run, outside the measurement, and
+    returns the argument run() is called with.
+    """
+    times = []
+    for _ in range(repeat):
+        argument = prepare()
+        start = time.perf_counter()
+        run(argument)
+        times.append(time.perf_counter() - start)
+
+    argument = prepare()
+    tracemalloc.start()
+    try:
+        run(argument)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'median': statistics.median(times),
+        'p95': percentile(times, 0.95),
+        'peak_bytes': peak,
+    }
+
+
+def load_input(context, input_name):
+    """Load an input as a check would find it.
+
+    XlsxWorkbook parses its sheets lazily, so a workbook is only loaded
+    once every worksheet is read; otherwise the parse is charged to
+    whichever check reads the sheets first.
+    """
+    value = context.get(input_name)
+    if input_name == 'workbook':
+        list(value.worksheets())
+    elif input_name == 'styles' and value is not None:
+        for workbook in value:
+            list(workbook.worksheets())
+    return value
+
+
+def bench_size(corpus_dir, cells, checks, repeat, ignore_styles=True):
+    """Benchmark the inputs and checks on one corpus workbook; returns {key: measurement}"""
+    spec = DEFAULT_SPEC._replace(cells=cells)
+    name = corpus_name(spec)
+    reference_dir = corpus_dir / "reference-xls"
+    generated_file = corpus_dir / f"{name}.xlsx"
+    if not generated_file.exists() or not (reference_dir / f"{name}.xlsx").exists():
+        print(f"Generating {name}...", flush=True)
+        write_pair(corpus_dir, spec)
+
+    contexts = []
+
+    def new_context(preload):
+        # Caches are cleared so every run starts cold
+        clear_caches()
+        for context in contexts:
+            context.close()
+        contexts.clear()
+        context = CheckContext(name, generated_file, reference_dir, corpus_dir / "results", corpus_dir,
+                               ignore_styles=ignore_styles, quiet=True)
+        for input_name in preload:
+            load_input(context, input_name)
+        contexts.append(context)
+        return context
+
+    results = {}
+    try:
+        needed = []
+        for check in checks:
+            for input_name in input_closure(check.inputs):
+                if input_name not in needed:
+                    needed.append(input_name)
+
+        for input_name in INPUTS:
+            if input_name not in needed:
+                continue
+            built_from = input_closure(INPUTS[input_name])
+            results[f"load:{input_name}@{cells}"] = _measure(
+                lambda context, input_name=input_name: load_input(context, input_name), repeat,
+                lambda built_from=built_from: new_context(built_from))
+
+        for check in checks:
+            preload = input_closure(check.inputs)
+            output = io.StringIO()
+
+            def run(context, check=check):
+                with contextlib.redirect_stdout(output):
+                    check.run(context)
+                output.seek(0)
+                output.truncate()
+
+            results[f"{check.name}@{cells}"] = _measure(run, repeat, lambda preload=preload: new_context(preload))
+    finally:
+        for context in contexts:
+            context.close()
+    return results
+
+
+def load_baselines(baseline_file):
+    if not baseline_file.exists():
+        return {}
+    with open(baseline_file) as f:
+        return json.load(f)
+
+
+def save_baselines(baseline_file, baselines):
+    baseline_file.parent.mkdir(parents=True, exist_ok=True)
+    tmp_file = baseline_file.with_name(baseline_file.name + ".tmp")
+    with open(tmp_file, "w") as f:
+        json.dump(baselines, f, indent=2, sort_keys=True)
+        f.write("\n")
+    tmp_file.replace(baseline_file)
+
+
+def compare_results(results, baseline, tolerance, memory_tolerance):
+    """Print a result table against the baseline and return the keys that regressed"""
+    regressions = []
+    print(f"\n{'BENCHMARK':<28} {'MEDIAN':>10} {'P95':>10} {'PEAK':>10} {'TIME Δ':>8} {'MEM Δ':>8}")
+    print("-" * 80)
+    for key, measured in results.items():
+        base = baseline.get(key)
+        time_change = memory_change = ""
+        regressed = False
+        if base:
+            if base['median'] > 0:
+                time_change = f"{(measured['median'] / base['median'] - 1) * 100:+.0f}%"
+            if base['peak_bytes'] > 0:
+                memory_change = f"{(measured['peak_bytes'] / base['peak_bytes'] - 1) * 100:+.0f}%"
+            if (measured['median'] > base['median'] * (1 + tolerance / 100)
+                    and measured['median'] - base['median'] > MIN_TIME_DELTA):
+                regressed = True
+            if (measured['peak_bytes'] > base['peak_bytes'] * (1 + memory_tolerance / 100)
+                    and measured['peak_bytes'] - base['peak_bytes'] > MIN_MEMORY_DELTA):
+                regressed = True
+        print(f"{key:<28} {measured['median'] * 1000:>8.1f}ms {measured['p95'] * 1000:>8.1f}ms "
+              f"{measured['peak_bytes'] / (1024 * 1024):>8.1f}MB {time_change:>8} {memory_change:>8}"
+              + ("  ❌" if regressed else ""))
+        if regressed:
+            regressions.append(key)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the autocheck checks against per-machine baselines")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help=f"Comma separated cell counts (default: {DEFAULT_SIZES})")
+    parser.add_argument("--checks", help="Comma separated checks to benchmark (default: all)")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="Timed runs per benchmark")
+    parser.add_argument("--corpus", help="Directory to keep the generated corpus in (default: a temporary directory)")
+    parser.add_argument("--baseline-file", default=str(BASELINE_FILE), help="JSON file with the baselines")
+    parser.add_argument("--update-baseline", action="store_true", help="Record this run as the machine's baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Allowed slowdown over the baseline median, in percent")
+    parser.add_argument("--memory-tolerance", type=float, default=DEFAULT_MEMORY_TOLERANCE,
+                        help="Allowed growth over the baseline peak memory, in percent")
+    parser.add_argument("--styles", action="store_true", help="Include the style comparison in the content check")
+
+    args = parser.parse_args()
+
+    try:
+        checks = select_checks(args.checks)
+        sizes = [parse_size(size) for size in args.sizes.split(",") if size.strip()]
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 1
+
+    with contextlib.ExitStack() as stack:
+        if args.corpus:
+            corpus_dir = Path(args.corpus)
+            corpus_dir.mkdir(parents=True, exist_ok=True)
+        else:
+            corpus_dir = Path(stack.enter_context(tempfile.TemporaryDirectory(prefix="bench-corpus-")))
+
+        results = {}
+        for cells in sizes:
+            print(f"Benchmarking {cells} cells...", flush=True)
+            results.update(bench_size(corpus_dir, cells, checks, args.repeat, ignore_styles=not args.styles))
+
+    baseline_file = Path(args.baseline_file)
+    baselines = load_baselines(baseline_file)
+    machine = machine_id()
+    baseline = baselines.get(machine, {}).get('results', {})
+
+    regressions = compare_results(results, baseline, args.tolerance, args.memory_tolerance)
+
+    if args.update_baseline:
+        entry = baselines.setdefault(machine, {'results': {}})
+        entry['results'].update(results)
+        entry['repeat'] = args.repeat
+        entry['recorded'] = time.strftime("%Y-%m-%dT%H:%M:%S")
+        save_baselines(baseline_file, baselines)
+        print(f"\n✅ Baseline for {machine} saved to {baseline_file}")
+        return 0
+
+    if not baseline:
+        print(f"\n⚠️ No baseline for {machine}; run with --update-baseline to record one")
+        return 0
+    if regressions:
+        print(f"\n❌ {len(regressions)} benchmarks regressed beyond the tolerance: {', '.join(regressions)}")
+        return 1
+    print("\n✅ No benchmark regressed beyond the tolerance")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
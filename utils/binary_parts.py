@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Binary part comparison for the autocheck tool.
+
+Images under xl/media/ and VBA projects such as xl/vbaProject.bin are
+compared by streaming both members in fixed-size chunks straight out of the
+archives, so a large image is never held in memory whole. A differing part
+is reported with the offset of its first differing byte and the digests of
+both sides. Image dimensions are decoded from the file headers, and the
+extents pictures are drawn at are read from the drawing parts, so a picture
+that was inserted or scaled wrongly is reported as such.
+"""
+
+import collections
+import hashlib
+import struct
+import xml.etree.ElementTree as ET
+
+try:
+    from utils.xlsx_parts import NS, qname
+    from utils.xlsx_source import CHUNK_SIZE
+except ModuleNotFoundError:
+    from xlsx_parts import NS, qname
+    from xlsx_source import CHUNK_SIZE
+
+XDR = 'http://schemas.openxmlformats.org/drawingml/2006/spreadsheetDrawing'
+
+BinaryDifference = collections.namedtuple(
+    'BinaryDifference', ['name', 'offset', 'gen_size', 'ref_size', 'gen_digest', 'ref_digest'])
+
+Picture = collections.namedtuple('Picture', ['name', 'target', 'cx', 'cy'])
+
+
+def is_binary_part(name):
+    """Return True for parts that hold binary data rather than XML: media and .bin parts"""
+    return name.startswith('xl/media/') or name.endswith('.bin')
+
+
+def _fixed_chunks(xlsx_zip, name, chunk_size):
+    """Yield a member's content in chunks of exactly chunk_size bytes, except the last"""
+    with xlsx_zip.open(name) as member:
+        while True:
+            chunk = member.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+
+def compare_binary_member(gen_zip, ref_zip, name, chunk_size=CHUNK_SIZE):
+    """Stream a member of both archives and return a BinaryDifference, or None if they are identical.
+
+    Both members are hashed chunk by chunk while their chunks are compared,
+    so only two chunks are in memory at a time.
+    """
+    gen_hash, ref_hash = hashlib.sha256(), hashlib.sha256()
+    gen_chunks = _fixed_chunks(gen_zip, name, chunk_size)
+    ref_chunks = _fixed_chunks(ref_zip, name, chunk_size)
+    offset = 0
+    first_difference = None
+
+    while True:
+        gen_chunk = next(gen_chunks, b'')
+        ref_chunk = next(ref_chunks, b'')
+        if not gen_chunk and not ref_chunk:
+            break
+        gen_hash.update(gen_chunk)
+        ref_hash.update(ref_chunk)
+        if first_difference is None and gen_chunk != ref_chunk:
+            common = min(len(gen_chunk), len(ref_chunk))
+            mismatch = next((index for index in range(common) if gen_chunk[index] != ref_chunk[index]), common)
+            first_difference = offset + mismatch
+        offset += max(len(gen_chunk), len(ref_chunk))
+
+    if first_difference is None:
+        return None
+    return BinaryDifference(name, first_difference,
+                            gen_zip.getinfo(name).file_size, ref_zip.getinfo(name).file_size,
+                            gen_hash.hexdigest(), ref_hash.hexdigest())
+
+
+def _jpeg_size(stream):
+    """Walk the JPEG markers up to the first start-of-frame and return its (width, height)"""
+    while True:
+        byte = stream.read(1)
+        while byte and byte != b'\xff':
+            byte = stream.read(1)
+        marker = stream.read(1)
+        while marker == b'\xff':
+            marker = stream.read(1)
+        if not byte or not marker:
+            return None
+        code = marker[0]
+        if code == 0xd9:
+            # End of image before any frame
+            return None
+        if code in (0xd8, 0x01) or 0xd0 <= code <= 0xd7:
+            # Markers without a length
+            continue
+        length_bytes = stream.read(2)
+        if len(length_bytes) < 2:
+            return None
+        length = struct.unpack('>H', length_bytes)[0]
+        if 0xc0 <= code <= 0xcf and code not in (0xc4, 0xc8, 0xcc):
+            frame = stream.read(5)
+            if len(frame) < 5:
+                return None
+            height, width = struct.unpack('>HH', frame[1:5])
+            return width, height
+        stream.read(length - 2)
+
+
+def image_size(stream):
+    """Decode the (width, height) in pixels of a PNG, GIF, BMP or JPEG image from its header.
+
+    Only the header is read from the stream; None is returned for other formats.
+    """
+    header = stream.read(26)
+    if header.startswith(b'\x89PNG\r\n\x1a\n') and len(header) >= 24:
+        return struct.unpack('>II', header[16:24])
+    if header[:6] in (b'GIF87a', b'GIF89a') and len(header) >= 10:
+        return struct.unpack('<HH', header[6:10])
+    if header.startswith(b'BM') and len(header) >= 26:
+        width, height = struct.unpack('<ii', header[18:26])
+        return width, abs(height)
+    if header.startswith(b'\xff\xd8'):
+        # Walk the segments that follow the SOI marker
+        return _jpeg_size(_Prefixed(header[2:], stream))
+    return None
+
+
+class _Prefixed:
+    """A minimal reader that returns already read bytes before the rest of a stream"""
+
+    def __init__(self, prefix, stream):
+        self._prefix = prefix
+        self._stream = stream
+
+    def read(self, size):
+        if self._prefix:
+            data, self._prefix = self._prefix[:size], self._prefix[size:]
+            if len(data) < size:
+                data += self._stream.read(size - len(data))
+            return data
+        return self._stream.read(size)
+
+
+def member_image_size(xlsx_zip, name):
+    """Decode the pixel size of an image member, reading only its header"""
+    with xlsx_zip.open(name) as member:
+        return image_size(member)
+
+
+def drawing_pictures(xlsx_zip, drawing_part, rels):
+    """List the pictures of a drawing part in document order, with the media part each one shows"""
+    with xlsx_zip.open(drawing_part) as file:
+        root = ET.parse(file).getroot()
+
+    pictures = []
+    for pic in root.iter(f"{{{XDR}}}pic"):
+        properties = pic.find(f"{{{XDR}}}nvPicPr/{{{XDR}}}cNvPr")
+        blip = pic.find(f"{{{XDR}}}blipFill/{{{NS['a']}}}blip")
+        extent = pic.find(f"{{{XDR}}}spPr/{{{NS['a']}}}xfrm/{{{NS['a']}}}ext")
+        target = None
+        if blip is not None:
+            target = rels.get(blip.get(qname('r', 'embed')), (None, None))[1]
+        pictures.append(Picture(
+            properties.get('name') if properties is not None else None,
+            target,
+            int(extent.get('cx', 0)) if extent is not None else None,
+            int(extent.get('cy', 0)) if extent is not None else None))
+    return pictures
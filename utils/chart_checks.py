@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Chart and chartsheet comparison for the autocheck tool.
+
+Each xl/charts/chartN.xml part is parsed once into a small tree of plots,
+series and axes, where every node carries a digest of its XML subtree.
+Charts are compared top-down: identical digests end the comparison for that
+node, so only the series or axis that actually changed is examined further.
+"""
+
+import hashlib
+import collections
+import xml.etree.ElementTree as ET
+
+try:
+    from utils.xlsx_parts import NS, qname, list_sheets, read_rels
+    from utils.xlsx_source import resolve_generated, resolve_reference, open_archive, source_exists, source_label
+except ModuleNotFoundError:
+    from xlsx_parts import NS, qname, list_sheets, read_rels
+    from xlsx_source import resolve_generated, resolve_reference, open_archive, source_exists, source_label
+
+# Series children that hold a data reference (c:f) rather than formatting
+SERIES_REFERENCES = ('tx', 'cat', 'val', 'xVal', 'yVal', 'bubbleSize')
+
+# Workbooks whose chart trees are kept, least recently used first
+CHART_CACHE_SIZE = 64
+_chart_trees = collections.OrderedDict()
+
+
+def _local(tag):
+    return tag.rsplit('}', 1)[-1]
+
+
+def _digest(element, digests):
+    """Digest of an element subtree, computed bottom-up and stored in digests"""
+    hasher = hashlib.blake2b(digest_size=16)
+    hasher.update(element.tag.encode())
+    for key, value in sorted(element.attrib.items()):
+        hasher.update(f"\x01{key}={value}".encode())
+    hasher.update(f"\x02{(element.text or '').strip()}".encode())
+    for child in element:
+        hasher.update(_digest(child, digests))
+    digest = hasher.digest()
+    digests[element] = digest
+    return digest
+
+
+def _reference(element):
+    """Return the c:f formula of a series reference, or its literal values"""
+    formula = element.find('.//c:f', NS)
+    if formula is not None:
+        return formula.text or ""
+    values = [value.text or "" for value in element.iter(qname('c', 'v'))]
+    return "{" + ",".join(values) + "}"
+
+
+def _children(element, digests, skip=(), skip_suffix=()):
+    """Map child local names (numbered when repeated) to their digests"""
+    children = {}
+    for child in element:
+        name = _local(child.tag)
+        if name in skip or (skip_suffix and name.endswith(skip_suffix)):
+            continue
+        key = name
+        count = 2
+        while key in children:
+            key = f"{name}[{count}]"
+            count += 1
+        children[key] = digests[child]
+    return children
+
+
+def parse_chart(data):
+    """Normalize a chart part into a digest tree of plots, series and axes"""
+    root = ET.fromstring(data)
+    digests = {}
+    tree = {'digest': _digest(root, digests), 'plots': [], 'axes': [], 'chart': {}}
+
+    chart = root.find('c:chart', NS)
+    plot_area = chart.find('c:plotArea', NS) if chart is not None else None
+    if chart is not None:
+        tree['chart'] = _children(chart, digests, skip=('plotArea',))
+
+    if plot_area is not None:
+        # Layout, fill and data table settings of the plot area itself
+        tree['chart'].update({f"plotArea/{name}": digest for name, digest
+                              in _children(plot_area, digests, skip_suffix=('Chart', 'Ax')).items()})
+        for element in plot_area:
+            name = _local(element.tag)
+            if name.endswith('Chart'):
+                series = []
+                for ser in element.findall('c:ser', NS):
+                    series.append({
+                        'digest': digests[ser],
+                        'refs': {_local(child.tag): _reference(child) for child in ser
+                                 if _local(child.tag) in SERIES_REFERENCES},
+                        'parts': _children(ser, digests, skip=SERIES_REFERENCES),
+                    })
+                tree['plots'].append({
+                    'type': name,
+                    'digest': digests[element],
+                    'settings': _children(element, digests, skip=('ser',)),
+                    'series': series,
+                })
+            elif name.endswith('Ax'):
+                tree['axes'].append({'type': name, 'digest': digests[element],
+                                     'parts': _children(element, digests)})
+
+    return tree
+
+
+def load_chart_trees(xlsx_zip):
+    """Parse every chart part in an open archive into {part: digest tree}"""
+    return {name: parse_chart(xlsx_zip.read(name)) for name in xlsx_zip.namelist()
+            if name.startswith('xl/charts/chart') and name.endswith('.xml')}
+
+
+def cached_chart_trees(xlsx_zip):
+    """Return the chart digest trees of an open archive, reused for any archive with the same content"""
+    key = xlsx_zip.digest()
+    trees = _chart_trees.get(key)
+    if trees is None:
+        trees = _chart_trees[key] = load_chart_trees(xlsx_zip)
+        while len(_chart_trees) > CHART_CACHE_SIZE:
+            _chart_trees.popitem(last=False)
+    else:
+        _chart_trees.move_to_end(key)
+    return trees
+
+
+def clear_chart_cache():
+    """Forget every cached chart tree, e.g. between benchmark runs"""
+    _chart_trees.clear()
+
+
+def chart_hosts(xlsx_zip):
+    """Map chart parts to the name of the sheet or chartsheet that displays them"""
+    hosts = {}
+    for sheet_name, sheet_part, _ in list_sheets(xlsx_zip):
+        for rel_type, target in read_rels(xlsx_zip, sheet_part).values():
+            if rel_type != 'drawing':
+                continue
+            for chart_type, chart_part in read_rels(xlsx_zip, target).values():
+                if chart_type == 'chart':
+                    hosts[chart_part] = sheet_name
+    return hosts
+
+
+def _diff_children(example_name, where, gen_children, ref_children):
+    has_differences = False
+    for name in list(ref_children) + [name for name in gen_children if name not in ref_children]:
+        if name not in gen_children:
+            print(f"[{example_name}] ⚠️ {where}: missing c:{name}")
+        elif name not in ref_children:
+            print(f"[{example_name}] ⚠️ {where}: extra c:{name}")
+        elif gen_children[name] != ref_children[name]:
+            print(f"[{example_name}] ⚠️ {where}: c:{name} differs")
+        else:
+            continue
+        has_differences = True
+    return has_differences
+
+
+def compare_chart_trees(example_name, label, gen_tree, ref_tree):
+    """Compare two chart digest trees and print findings at series and axis level"""
+    if gen_tree['digest'] == ref_tree['digest']:
+        return False
+
+    has_differences = _diff_children(example_name, label, gen_tree['chart'], ref_tree['chart'])
+
+    gen_plots, ref_plots = gen_tree['plots'], ref_tree['plots']
+    if len(gen_plots) != len(ref_plots):
+        print(f"[{example_name}] ⚠️ {label}: {len(gen_plots)} plots, reference has {len(ref_plots)}")
+        has_differences = True
+
+    for plot_number, (gen_plot, ref_plot) in enumerate(zip(gen_plots, ref_plots), 1):
+        if gen_plot['digest'] == ref_plot['digest']:
+            continue
+        where = f"{label} plot {plot_number} ({ref_plot['type']})"
+        if gen_plot['type'] != ref_plot['type']:
+            print(f"[{example_name}] ⚠️ {where}: generated chart type is {gen_plot['type']}")
+            has_differences = True
+            continue
+        if _diff_children(example_name, where, gen_plot['settings'], ref_plot['settings']):
+            has_differences = True
+
+        if len(gen_plot['series']) != len(ref_plot['series']):
+            print(f"[{example_name}] ⚠️ {where}: {len(gen_plot['series'])} series, "
+                  f"reference has {len(ref_plot['series'])}")
+            has_differences = True
+
+        for series_number, (gen_ser, ref_ser) in enumerate(zip(gen_plot['series'], ref_plot['series']), 1):
+            if gen_ser['digest'] == ref_ser['digest']:
+                continue
+            series_where = f"{where} series {series_number}"
+            reported = False
+            for name in SERIES_REFERENCES:
+                gen_ref, ref_ref = gen_ser['refs'].get(name), ref_ser['refs'].get(name)
+                if gen_ref != ref_ref:
+                    print(f"[{example_name}] ⚠️ {series_where}: c:{name} range differs")
+                    print(f"  Reference: {ref_ref}")
+                    print(f"  Generated: {gen_ref}")
+                    reported = True
+            if _diff_children(example_name, series_where, gen_ser['parts'], ref_ser['parts']):
+                reported = True
+            if not reported:
+                print(f"[{example_name}] ⚠️ {series_where}: cached series values differ")
+            has_differences = True
+
+    gen_axes, ref_axes = gen_tree['axes'], ref_tree['axes']
+    if [axis['type'] for axis in gen_axes] != [axis['type'] for axis in ref_axes]:
+        print(f"[{example_name}] ⚠️ {label}: axes {[axis['type'] for axis in gen_axes]}, "
+              f"reference has {[axis['type'] for axis in ref_axes]}")
+        has_differences = True
+    else:
+        for axis_number, (gen_axis, ref_axis) in enumerate(zip(gen_axes, ref_axes), 1):
+            if gen_axis['digest'] != ref_axis['digest']:
+                where = f"{label} axis {axis_number} ({ref_axis['type']})"
+                _diff_children(example_name, where, gen_axis['parts'], ref_axis['parts'])
+                has_differences = True
+
+    if not has_differences:
+        # Digests differ only in something outside c:chart, such as print settings
+        print(f"[{example_name}] ⚠️ {label}: chart part differs outside the plot area")
+    return True
+
+
+def check_charts(example_name, reference_dir, generated=None, reference=None):
+    """Check that charts and chartsheets match the reference file"""
+    file_to_check = resolve_generated(example_name, generated)
+    ref_to_check = resolve_reference(example_name, reference_dir, reference)
+
+    if not source_exists(ref_to_check):
+        print(f"[{example_name}] ⚠️ Reference file not found: {source_label(ref_to_check)}")
+        return False
+
+    try:
+        has_differences = False
+
+        with open_archive(file_to_check) as gen_zip, open_archive(ref_to_check) as ref_zip:
+            gen_trees = cached_chart_trees(gen_zip)
+            ref_trees = cached_chart_trees(ref_zip)
+
+            hosts = chart_hosts(ref_zip)
+
+            for part in sorted(ref_trees.keys() | gen_trees.keys()):
+                label = f"{part.rsplit('/', 1)[-1]}"
+                if part in hosts:
+                    label += f" on '{hosts[part]}'"
+                if part not in gen_trees:
+                    print(f"[{example_name}] ⚠️ Generated file is missing chart {label}")
+                    has_differences = True
+                elif part not in ref_trees:
+                    print(f"[{example_name}] ⚠️ Generated file has extra chart {label}")
+                    has_differences = True
+                elif compare_chart_trees(example_name, label, gen_trees[part], ref_trees[part]):
+                    has_differences = True
+
+            # Chartsheets carry their own view and protection settings
+            gen_chartsheets = {name: part for name, part, kind in list_sheets(gen_zip) if kind == 'chartsheet'}
+            for sheet_name, part, kind in list_sheets(ref_zip):
+                if kind != 'chartsheet' or sheet_name not in gen_chartsheets:
+                    continue
+                digests = {}
+                gen_digest = _digest(ET.fromstring(gen_zip.read(gen_chartsheets[sheet_name])), digests)
+                ref_digest = _digest(ET.fromstring(ref_zip.read(part)), digests)
+                if gen_digest != ref_digest:
+                    print(f"[{example_name}] ⚠️ Chartsheet '{sheet_name}' settings differ")
+                    has_differences = True
+
+        return not has_differences
+
+    except Exception as e:
+        print(f"[{example_name}] ❌ Error checking charts: {e}")
+        return False
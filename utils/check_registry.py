@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""
+Check registry for the autocheck tool.
+
+Every check is registered once, together with the inputs it reads. A
+CheckContext builds those inputs on first use and run_checks() releases
+each one after the last selected check that needs it, so running a subset
+of the checks only loads what that subset reads: formulas and xml never
+open the reference file, and only the optional openpyxl check loads a
+workbook into openpyxl; the other checks share the compact sheets of the
+lightweight reader.
+
+Given a ResultCache, run_checks() replays the stored result of a check
+whose generated file, reference, options and code are unchanged instead of
+running it.
+"""
+
+import io
+import sys
+import contextlib
+import collections
+
+import openpyxl
+
+try:
+    from utils.excel_checks import (
+        check_formulas,
+        check_string_null_termination,
+        check_xml_content,
+        check_binary_compatibility,
+        check_row_visibility
+    )
+    from utils.range_checks import check_range_rules
+    from utils.chart_checks import check_charts, clear_chart_cache
+    from utils.comment_checks import check_comments
+    from utils.file_comparison import compare_with_reference, styles_compared, mark_autochecked
+    from utils.snapshots import check_snapshot
+    from utils.xlsx_source import XlsxArchive, reference_path
+    from utils.xlsx_reader import XlsxWorkbook, check_against_openpyxl
+except ModuleNotFoundError:
+    from excel_checks import (
+        check_formulas,
+        check_string_null_termination,
+        check_xml_content,
+        check_binary_compatibility,
+        check_row_visibility
+    )
+    from range_checks import check_range_rules
+    from chart_checks import check_charts, clear_chart_cache
+    from comment_checks import check_comments
+    from file_comparison import compare_with_reference, styles_compared, mark_autochecked
+    from snapshots import check_snapshot
+    from xlsx_source import XlsxArchive, reference_path
+    from xlsx_reader import XlsxWorkbook, check_against_openpyxl
+
+Check = collections.namedtuple('Check', ['name', 'title', 'summary', 'inputs', 'run', 'default',
+                                         'version', 'cacheable', 'replay'])
+
+# Inputs a check can declare, with the inputs each one is built from:
+#   archive    the generated workbook as an XlsxArchive
+#   reference  the reference workbook as an XlsxArchive, or its path if it is missing
+#   workbook   the generated workbook read by the lightweight reader (an XlsxWorkbook)
+#   styles     (generated, reference) XlsxWorkbooks, or None when styles are not compared
+#   openpyxl   the generated workbook loaded by openpyxl
+INPUTS = {
+    'archive': (),
+    'reference': (),
+    'workbook': ('archive',),
+    'styles': ('workbook', 'reference'),
+    'openpyxl': ('archive',),
+}
+
+# Registered checks in the order they run
+CHECKS = {}
+
+
+def register_check(name, title, summary, inputs, run, default=True, version=1, cacheable=True, replay=None):
+    """Register a check; run(context) returns True when the check passes.
+
+    Checks registered with default=False only run when named in --checks.
+    Bump version when a check's results change for reasons the result
+    cache cannot see. Checks that read anything besides their inputs are
+    registered with cacheable=False; replay(context, passed) redoes the
+    side effects of a check whose result came from the cache.
+    """
+    unknown = [input_name for input_name in inputs if input_name not in INPUTS]
+    if unknown:
+        raise ValueError(f"Check {name} declares unknown inputs: {', '.join(unknown)}")
+    CHECKS[name] = Check(name, title, summary, tuple(inputs), run, default, version, cacheable, replay)
+
+
+def input_closure(inputs):
+    """Return the given inputs together with everything they are built from"""
+    closure = []
+    pending = list(inputs)
+    while pending:
+        input_name = pending.pop()
+        if input_name not in closure:
+            closure.append(input_name)
+            pending.extend(INPUTS[input_name])
+    return closure
+
+
+def select_checks(names=None):
+    """Return the registered checks named in a comma separated list, in run order.
+
+    Without names, the checks that run by default are returned.
+    """
+    if not names:
+        return [check for check in CHECKS.values() if check.default]
+    requested = [name.strip() for name in names.split(",") if name.strip()]
+    unknown = [name for name in requested if name not in CHECKS]
+    if unknown:
+        raise ValueError(f"Unknown checks: {', '.join(unknown)} (available: {', '.join(CHECKS)})")
+    return [check for name, check in CHECKS.items() if name in requested]
+
+
+class CheckContext:
+    """The inputs of one example's checks, each built the first time a check asks for it.
+
+    An XlsxArchive passed in as generated or reference, e.g. one opened
+    ahead of time by a prefetcher, is used as is and left open for its owner.
+    """
+
+    def __init__(self, example_name, generated, reference_dir, results_dir, project_root,
+                 ignore_styles=False, quiet=False, reference=None, max_findings=None):
+        self.example_name = example_name
+        self.generated = generated
+        self.reference_source = reference
+        self.reference_dir = reference_dir
+        self.results_dir = results_dir
+        self.project_root = project_root
+        self.ignore_styles = ignore_styles
+        self.quiet = quiet
+        self.max_findings = max_findings
+        self._inputs = {}
+        self._digests = {}
+
+    def get(self, input_name):
+        if input_name not in self._inputs:
+            self._inputs[input_name] = getattr(self, f"_load_{input_name}")()
+        return self._inputs[input_name]
+
+    @property
+    def archive(self):
+        return self.get('archive')
+
+    @property
+    def reference(self):
+        return self.get('reference')
+
+    @property
+    def workbook(self):
+        return self.get('workbook')
+
+    @property
+    def styles(self):
+        return self.get('styles')
+
+    @property
+    def openpyxl(self):
+        return self.get('openpyxl')
+
+    def digest(self, input_name):
+        """SHA-256 of the archive or reference, or None for a missing reference; kept after release"""
+        if input_name not in self._digests:
+            source = self.get(input_name)
+            self._digests[input_name] = source.digest() if isinstance(source, XlsxArchive) else None
+        return self._digests[input_name]
+
+    def loaded(self):
+        """Names of the inputs that are currently built"""
+        return list(self._inputs)
+
+    def _load_archive(self):
+        if isinstance(self.generated, XlsxArchive):
+            return self.generated
+        return XlsxArchive(self.generated)
+
+    def _load_reference(self):
+        if isinstance(self.reference_source, XlsxArchive):
+            return self.reference_source
+        path = reference_path(self.example_name, self.reference_dir)
+        if not path.exists():
+            # The checks report the missing reference themselves
+            return path
+        return XlsxArchive(path)
+
+    def _load_workbook(self):
+        return XlsxWorkbook(self.archive)
+
+    def _load_styles(self):
+        if not styles_compared(self.example_name, self.ignore_styles):
+            return None
+        if not isinstance(self.reference, XlsxArchive):
+            return None
+        return self.workbook, XlsxWorkbook(self.reference)
+
+    def _load_openpyxl(self):
+        return openpyxl.load_workbook(self.archive.reader())
+
+    def release(self, input_name):
+        """Drop an input, closing it if it is an archive this context opened"""
+        value = self._inputs.pop(input_name, None)
+        if isinstance(value, XlsxArchive) and value not in (self.generated, self.reference_source):
+            value.close()
+
+    def close(self):
+        for input_name in list(self._inputs):
+            self.release(input_name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def clear_caches():
+    """Drop results the checks cache across calls, so the next run starts cold"""
+    clear_chart_cache()
+
+
+def cache_key(context, check, cache):
+    """The key of a check's result in cache, or None if the check is not cached"""
+    if cache is None or not check.cacheable:
+        return None
+    needs = input_closure(check.inputs)
+    return cache.key(check, context.example_name,
+                     context.digest('archive'),
+                     context.digest('reference') if 'reference' in needs else None,
+                     {'ignore_styles': context.ignore_styles, 'max_findings': context.max_findings,
+                      'quiet': context.quiet})
+
+
+def run_check(context, check, cache=None):
+    """Run one check, or replay its result from cache; returns True when it passes"""
+    key = cache_key(context, check, cache)
+    if key is None:
+        return check.run(context)
+
+    cached = cache.get(key)
+    if cached is not None:
+        passed, output = cached
+        sys.stdout.write(output)
+        if check.replay is not None:
+            check.replay(context, passed)
+        return passed
+
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        passed = check.run(context)
+    sys.stdout.write(output.getvalue())
+    cache.put(key, passed, output.getvalue())
+    return passed
+
+
+def run_checks(context, checks, announce=True, cache=None):
+    """Run checks in order and return {check name: passed}.
+
+    Each input is released as soon as no remaining check needs it. With a
+    ResultCache, results are looked up there first and stored there after.
+    """
+    last_use = {}
+    for index, check in enumerate(checks):
+        needs = input_closure(check.inputs)
+        if cache is not None and check.cacheable:
+            # The key reads the digest of the generated file
+            needs.append('archive')
+        for input_name in needs:
+            last_use[input_name] = index
+
+    results = {}
+    for index, check in enumerate(checks):
+        if announce:
+            print(f"[{context.example_name}] {check.title}...")
+        results[check.name] = run_check(context, check, cache)
+        for input_name, last in last_use.items():
+            if last == index:
+                context.release(input_name)
+    return results
+
+
+register_check(
+    "formulas", "Checking formulas", "Formula Check", ('workbook',),
+    lambda context: check_formulas(context.workbook, context.example_name))
+register_check(
+    "strings", "Checking string null-termination", "String Null-Termination", ('workbook',),
+    lambda context: check_string_null_termination(context.workbook, context.example_name))
+register_check(
+    "xml", "Checking XML content", "XML Check", ('archive',),
+    lambda context: check_xml_content(context.example_name, generated=context.archive))
+register_check(
+    "binary", "Checking binary compatibility", "Binary Compatibility", ('archive', 'reference'),
+    lambda context: check_binary_compatibility(context.example_name, context.reference_dir,
+                                               generated=context.archive, reference=context.reference))
+register_check(
+    "rows", "Checking row visibility", "Row Visibility", ('archive', 'reference'),
+    lambda context: check_row_visibility(context.example_name, context.reference_dir,
+                                         generated=context.archive, reference=context.reference,
+                                         max_findings=context.max_findings))
+register_check(
+    "ranges", "Checking range rules", "Range Rules", ('archive', 'reference'),
+    lambda context: check_range_rules(context.example_name, context.reference_dir,
+                                      generated=context.archive, reference=context.reference))
+register_check(
+    "charts", "Checking charts", "Charts", ('archive', 'reference'),
+    lambda context: check_charts(context.example_name, context.reference_dir,
+                                 generated=context.archive, reference=context.reference))
+register_check(
+    "comments", "Checking comments", "Comments", ('archive', 'reference'),
+    lambda context: check_comments(context.example_name, context.reference_dir,
+                                   generated=context.archive, reference=context.reference,
+                                   max_findings=context.max_findings))
+register_check(
+    "content", "Comparing with reference file", "Content Check", ('archive', 'reference', 'styles'),
+    lambda context: compare_with_reference(context.example_name, context.reference_dir, context.results_dir,
+                                           context.project_root, quiet=context.quiet,
+                                           ignore_styles=context.ignore_styles, generated=context.archive,
+                                           reference=context.reference, styles=context.styles,
+                                           max_findings=context.max_findings),
+    replay=lambda context, passed: mark_autochecked(context.example_name, context.results_dir,
+                                                    context.project_root, passed, quiet=True))
+register_check(
+    "snapshot", "Comparing with reference snapshot", "Snapshot Check", ('archive',),
+    lambda context: check_snapshot(context.example_name, context.reference_dir.parent / "reference-snapshots",
+                                   generated=context.archive, ignore_styles=context.ignore_styles,
+                                   max_findings=context.max_findings),
+    # The result also depends on the snapshot file, which the cache key does not cover
+    default=False, cacheable=False)
+register_check(
+    "openpyxl", "Cross-checking the reader with openpyxl", "openpyxl Cross-Check", ('workbook', 'openpyxl'),
+    lambda context: check_against_openpyxl(context.workbook, context.openpyxl, context.example_name,
+                                           max_findings=context.max_findings),
+    default=False)
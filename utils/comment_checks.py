@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Comment and VML drawing comparison for the autocheck tool.
+
+Cell comments live in xl/commentsN.xml, and the boxes they are shown in,
+like form buttons, are shapes in xl/drawings/vmlDrawingN.vml. Both parts of
+the generated and the reference sheet are streamed once and keyed by the
+cell each comment or shape is anchored to; the reference entries are put
+in a dictionary and the generated ones are joined against it, so each
+sheet costs time linear in the number of comments. Missing and extra
+comments and shapes are reported, as are changed text, authors,
+formatting, visibility, box geometry and button macros.
+"""
+
+import collections
+import re
+import xml.etree.ElementTree as ET
+
+try:
+    from utils.xlsx_parts import NS, qname, parse_cell_ref, column_letters, list_sheets, read_rels, canonical_xml
+    from utils.xlsx_source import resolve_generated, resolve_reference, open_archive, source_exists, source_label
+    from utils.findings import Findings
+except ModuleNotFoundError:
+    from xlsx_parts import NS, qname, parse_cell_ref, column_letters, list_sheets, read_rels, canonical_xml
+    from xlsx_source import resolve_generated, resolve_reference, open_archive, source_exists, source_label
+    from findings import Findings
+
+VML = 'urn:schemas-microsoft-com:vml'
+EXCEL = 'urn:schemas-microsoft-com:office:excel'
+
+Comment = collections.namedtuple('Comment', ['author', 'text', 'formatting'])
+
+# A VML shape: its ObjectType (Note, Button, ...), whether x:Visible shows it, its
+# x:Anchor as a tuple of ints, its (width, height) from the CSS style, and
+# the macro it runs
+Shape = collections.namedtuple('Shape', ['kind', 'visible', 'anchor', 'size', 'macro'])
+
+STYLE_RE = re.compile(r'\s*([\w-]+)\s*:\s*([^;]*)')
+
+
+def read_comments(xlsx_zip, part):
+    """Read a comments part as {(row, col): Comment}, clearing each comment once it is read"""
+    authors = []
+    comments = {}
+    with xlsx_zip.open(part) as file:
+        for _, element in ET.iterparse(file, events=('end',)):
+            if element.tag == qname('s', 'author'):
+                authors.append(element.text or "")
+            elif element.tag == qname('s', 'comment'):
+                runs = element.findall('.//s:t', NS)
+                formatting = tuple(canonical_xml(properties) for properties in element.iter(qname('s', 'rPr')))
+                author_id = int(element.get('authorId', 0))
+                author = authors[author_id] if author_id < len(authors) else None
+                comments[parse_cell_ref(element.get('ref'))] = Comment(
+                    author, "".join(run.text or "" for run in runs), formatting)
+                element.clear()
+    return comments
+
+
+def _shape_size(style):
+    properties = dict(STYLE_RE.findall(style or ""))
+    return properties.get('width'), properties.get('height')
+
+
+def read_vml_shapes(xlsx_zip, part):
+    """Read a VML drawing as {(kind, row, col, number): Shape}.
+
+    Notes are keyed by the cell of their comment (x:Row and x:Column);
+    shapes without one, such as buttons, by the top left cell of x:Anchor.
+    number counts the shapes of a kind at the same cell in document order,
+    so two buttons anchored at one cell are both compared.
+    """
+    shapes = {}
+    with xlsx_zip.open(part) as file:
+        for _, element in ET.iterparse(file, events=('end',)):
+            if element.tag != f"{{{VML}}}shape":
+                continue
+            data = element.find(f"{{{EXCEL}}}ClientData")
+            if data is None:
+                element.clear()
+                continue
+            kind = data.get('ObjectType', '')
+
+            def value(tag):
+                child = data.find(f"{{{EXCEL}}}{tag}")
+                return None if child is None else (child.text or "").strip()
+
+            anchor_text = value('Anchor')
+            anchor = tuple(int(item) for item in anchor_text.split(',')) if anchor_text else ()
+            row, col = value('Row'), value('Column')
+            if row is not None and col is not None:
+                cell = (int(row) + 1, int(col) + 1)
+            elif len(anchor) >= 3:
+                cell = (anchor[2] + 1, anchor[0] + 1)
+            else:
+                cell = (0, 0)
+            visible = data.find(f"{{{EXCEL}}}Visible") is not None
+            number = 1
+            while (kind,) + cell + (number,) in shapes:
+                number += 1
+            shapes[(kind,) + cell + (number,)] = Shape(kind, visible, anchor, _shape_size(element.get('style')), value('FmlaMacro'))
+            element.clear()
+    return shapes
+
+
+def _sheet_parts(xlsx_zip, sheet_part):
+    """Return the (comments part, VML drawing part) of a worksheet, either of which may be None"""
+    parts = {rel_type: target for rel_type, target in read_rels(xlsx_zip, sheet_part).values()}
+    return parts.get('comments'), parts.get('vmlDrawing')
+
+
+def _cell(row, col):
+    return f"{column_letters(col)}{row}"
+
+
+def _shape_where(sheet_name, kind, row, col, number):
+    where = f"{kind.lower() or 'shape'} box at {sheet_name}!{_cell(row, col)}"
+    return f"{where} (#{number})" if number > 1 else where
+
+
+def compare_comments(findings, sheet_name, gen_comments, ref_comments):
+    """Join generated comments against the reference ones by cell and report the differences"""
+    has_differences = False
+    ref_comments = dict(ref_comments)
+    for position in sorted(gen_comments):
+        if findings.exhausted:
+            return True
+        gen = gen_comments[position]
+        ref = ref_comments.pop(position, None)
+        where = f"comment at {sheet_name}!{_cell(*position)}"
+        if ref is None:
+            findings.count()
+            findings.warn(f"Extra {where}: {gen.text!r}", details=False)
+            has_differences = True
+            continue
+        for field, label in (('text', "Text"), ('author', "Author"), ('formatting', "Formatting")):
+            if getattr(gen, field) != getattr(ref, field):
+                findings.count()
+                findings.warn(f"{label} of {where} differs:", getattr(ref, field), getattr(gen, field),
+                              details=field != 'formatting')
+                has_differences = True
+
+    for position in sorted(ref_comments):
+        if findings.exhausted:
+            return True
+        findings.count()
+        findings.warn(f"Missing comment at {sheet_name}!{_cell(*position)}: {ref_comments[position].text!r}",
+                      details=False)
+        has_differences = True
+    return has_differences
+
+
+def compare_shapes(findings, sheet_name, gen_shapes, ref_shapes):
+    """Join generated VML shapes against the reference ones by kind and cell and report the differences"""
+    has_differences = False
+    ref_shapes = dict(ref_shapes)
+    for key in sorted(gen_shapes):
+        if findings.exhausted:
+            return True
+        gen = gen_shapes[key]
+        ref = ref_shapes.pop(key, None)
+        where = _shape_where(sheet_name, *key)
+        if ref is None:
+            findings.count()
+            findings.warn(f"Extra {where}", details=False)
+            has_differences = True
+            continue
+        if gen.visible != ref.visible:
+            findings.count()
+            findings.warn(f"The {where} is {'shown' if gen.visible else 'hidden'}, "
+                          f"reference is {'shown' if ref.visible else 'hidden'}", details=False)
+            has_differences = True
+        if gen.anchor != ref.anchor or gen.size != ref.size:
+            findings.count()
+            findings.warn(f"Geometry of the {where} differs:",
+                          f"anchor {ref.anchor}, size {ref.size[0]} by {ref.size[1]}",
+                          f"anchor {gen.anchor}, size {gen.size[0]} by {gen.size[1]}")
+            has_differences = True
+        if gen.macro != ref.macro:
+            findings.count()
+            findings.warn(f"Macro of the {where} differs:", ref.macro, gen.macro)
+            has_differences = True
+
+    for key in sorted(ref_shapes):
+        if findings.exhausted:
+            return True
+        findings.count()
+        findings.warn(f"Missing {_shape_where(sheet_name, *key)}", details=False)
+        has_differences = True
+    return has_differences
+
+
+def check_comments(example_name, reference_dir, generated=None, reference=None, max_findings=None):
+    """Check that cell comments, their boxes and VML buttons match the reference"""
+    file_to_check = resolve_generated(example_name, generated)
+    ref_to_check = resolve_reference(example_name, reference_dir, reference)
+
+    if not source_exists(ref_to_check):
+        print(f"[{example_name}] ⚠️ Reference file not found: {source_label(ref_to_check)}")
+        return False
+
+    try:
+        has_differences = False
+
+        with open_archive(file_to_check) as gen_zip, open_archive(ref_to_check) as ref_zip, \
+                Findings(example_name, max_findings) as findings:
+            gen_sheets = {name: part for name, part, kind in list_sheets(gen_zip) if kind == 'worksheet'}
+            ref_sheets = {name: part for name, part, kind in list_sheets(ref_zip) if kind == 'worksheet'}
+
+            # Missing and extra sheets are reported by the other checks
+            for sheet_name, ref_part in ref_sheets.items():
+                if sheet_name not in gen_sheets or findings.exhausted:
+                    continue
+                gen_comments_part, gen_vml_part = _sheet_parts(gen_zip, gen_sheets[sheet_name])
+                ref_comments_part, ref_vml_part = _sheet_parts(ref_zip, ref_part)
+
+                gen_comments = read_comments(gen_zip, gen_comments_part) if gen_comments_part in gen_zip else {}
+                ref_comments = read_comments(ref_zip, ref_comments_part) if ref_comments_part in ref_zip else {}
+                if compare_comments(findings, sheet_name, gen_comments, ref_comments):
+                    has_differences = True
+
+                gen_shapes = read_vml_shapes(gen_zip, gen_vml_part) if gen_vml_part in gen_zip else {}
+                ref_shapes = read_vml_shapes(ref_zip, ref_vml_part) if ref_vml_part in ref_zip else {}
+                if compare_shapes(findings, sheet_name, gen_shapes, ref_shapes):
+                    has_differences = True
+
+            findings.stopped_note()
+
+        return not has_differences
+
+    except Exception as e:
+        print(f"[{example_name}] ❌ Error checking comments: {e}")
+        return False
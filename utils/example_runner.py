@@ -1,11 +1,45 @@
 #!/usr/bin/env python3
 """
 Example running utilities for the autocheck tool.
+
+Examples are run under a monitor: each run gets a private temporary
+directory (TMP, TMPDIR and TEMP point into it), and while it runs its
+temporary files are sampled on a separate thread, including files that
+were already unlinked but are still open, as libxlsxwriter's are. The
+calling thread blocks until the example exits, so the wall time is exact;
+its I/O counters are then read from /proc/<pid>/io before the process is
+reaped, and its CPU time and peak RSS come from its rusage. Optional
+resource limits are set on the example process only, with prlimit() right
+after it is spawned, since a preexec_fn is not safe in a threaded process.
 """
 
+import os
+import sys
+import time
+import shutil
+import threading
+import tempfile
 import subprocess
+import collections
 from pathlib import Path
 
+try:
+    import resource
+except ImportError:
+    resource = None
+
+RunStats = collections.namedtuple('RunStats', [
+    'returncode', 'wall_time', 'user_time', 'system_time', 'peak_rss',
+    'read_bytes', 'write_bytes', 'tmp_peak_bytes', 'tmp_files'])
+
+# Limits for an example process: address space and largest file in MB, CPU time in seconds
+ResourceLimits = collections.namedtuple('ResourceLimits', ['memory_mb', 'cpu_seconds', 'file_size_mb'])
+
+# How often temporary files are sampled while an example runs
+SAMPLE_INTERVAL = 0.01
+
+MB = 1024 * 1024
+
 
 def get_relative_path(path, project_root):
     """Convert a path to be relative to the project root if possible"""
@@ -16,6 +50,187 @@ def get_relative_path(path, project_root):
         return path
 
 
+def _set_limits(pid, limits):
+    """Apply limits to a running process"""
+    if limits.memory_mb:
+        size = limits.memory_mb * MB
+        resource.prlimit(pid, resource.RLIMIT_AS, (size, size))
+    if limits.cpu_seconds:
+        # SIGXCPU at the soft limit names the cause; the hard limit kills outright
+        resource.prlimit(pid, resource.RLIMIT_CPU, (limits.cpu_seconds, limits.cpu_seconds + 1))
+    if limits.file_size_mb:
+        size = limits.file_size_mb * MB
+        resource.prlimit(pid, resource.RLIMIT_FSIZE, (size, size))
+
+
+def _tmp_usage(pid, tmp_dir, ignored=()):
+    """Return {(device, inode): size} of the temporary files a process has, open or on disk.
+
+    Files whose (device, inode) is in ignored, such as the ones capturing
+    the output, are left out.
+    """
+    files = {}
+    for root, _, names in os.walk(tmp_dir):
+        for name in names:
+            try:
+                info = os.lstat(os.path.join(root, name))
+            except OSError:
+                continue
+            files[(info.st_dev, info.st_ino)] = info.st_size
+
+    # Files unlinked right after creation, as tmpfile() does, only show up as open descriptors
+    fd_dir = f"/proc/{pid}/fd"
+    try:
+        descriptors = os.listdir(fd_dir)
+    except OSError:
+        return files
+    for fd in descriptors:
+        try:
+            target = os.readlink(os.path.join(fd_dir, fd))
+            if not (target.startswith(tmp_dir) or target.startswith(tempfile.gettempdir())
+                    or target.endswith(" (deleted)")):
+                continue
+            info = os.stat(os.path.join(fd_dir, fd))
+        except OSError:
+            continue
+        key = (info.st_dev, info.st_ino)
+        if os.path.isfile(os.path.join(fd_dir, fd)) and key not in ignored:
+            files[key] = info.st_size
+    return files
+
+
+def _read_io(pid):
+    """Return the (read, write) byte counters of a process, including I/O served from the page cache"""
+    try:
+        with open(f"/proc/{pid}/io") as f:
+            counters = dict(line.split(": ") for line in f.read().splitlines() if ": " in line)
+        return int(counters['rchar']), int(counters['wchar'])
+    except (OSError, KeyError, ValueError):
+        return None, None
+
+
+def _read_peak_rss(pid):
+    """Return the high-water mark of a running process's RSS in bytes, or None"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+class _Sampler(threading.Thread):
+    """Samples the temporary files and RSS of a running process until stopped"""
+
+    def __init__(self, pid, tmp_dir, ignored):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.tmp_dir = tmp_dir
+        self.ignored = ignored
+        self.stopped = threading.Event()
+        self.tmp_peak_bytes = 0
+        self.tmp_files = 0
+        self.peak_rss = None
+
+    def run(self):
+        while True:
+            usage = _tmp_usage(self.pid, self.tmp_dir, self.ignored)
+            self.tmp_peak_bytes = max(self.tmp_peak_bytes, sum(usage.values()))
+            self.tmp_files = max(self.tmp_files, len(usage))
+            self.peak_rss = max(self.peak_rss or 0, _read_peak_rss(self.pid) or 0) or None
+            if self.stopped.wait(SAMPLE_INTERVAL):
+                break
+
+    def stop(self):
+        """Stop sampling; must be called before the process is reaped and its pid can be reused"""
+        self.stopped.set()
+        self.join()
+
+
+def run_monitored(cmd, limits=None, cwd=None):
+    """Run a command under the monitor and return (RunStats, stdout, stderr)"""
+    if limits and not hasattr(resource, 'prlimit'):
+        print("⚠️ Resource limits need prlimit(), which this platform lacks; running without them")
+        limits = None
+    tmp_dir = tempfile.mkdtemp(prefix="example-tmp-")
+    env = dict(os.environ, TMP=tmp_dir, TMPDIR=tmp_dir, TEMP=tmp_dir)
+    read_bytes = write_bytes = None
+
+    try:
+        with tempfile.TemporaryFile() as out, tempfile.TemporaryFile() as err:
+            start = time.perf_counter()
+            process = subprocess.Popen(cmd, stdout=out, stderr=err, env=env, cwd=cwd)
+            if limits:
+                try:
+                    _set_limits(process.pid, limits)
+                except OSError:
+                    process.kill()
+                    process.wait()
+                    raise
+            captured = {(info.st_dev, info.st_ino) for info in (os.fstat(out.fileno()), os.fstat(err.fileno()))}
+            sampler = _Sampler(process.pid, tmp_dir, captured)
+            sampler.start()
+            try:
+                if hasattr(os, 'waitid'):
+                    # Wait for the exit without reaping, so the zombie's counters can still be read
+                    os.waitid(os.P_PID, process.pid, os.WEXITED | os.WNOWAIT)
+                    wall_time = time.perf_counter() - start
+                    read_bytes, write_bytes = _read_io(process.pid)
+                    sampler.stop()
+                    _, status, rusage = os.wait4(process.pid, 0)
+                else:
+                    _, status, rusage = os.wait4(process.pid, 0)
+                    wall_time = time.perf_counter() - start
+            finally:
+                sampler.stop()
+            process.returncode = os.waitstatus_to_exitcode(status)
+
+            out.seek(0)
+            err.seek(0)
+            stdout = out.read().decode(errors='replace')
+            stderr = err.read().decode(errors='replace')
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    # The sampled high-water mark is reset by exec; ru_maxrss also counts the
+    # interpreter's pages the child had before exec, so it is only a fallback.
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+    peak_rss = sampler.peak_rss or (rusage.ru_maxrss if sys.platform == 'darwin' else rusage.ru_maxrss * 1024)
+    stats = RunStats(process.returncode, wall_time, rusage.ru_utime, rusage.ru_stime, peak_rss,
+                     read_bytes, write_bytes, sampler.tmp_peak_bytes, sampler.tmp_files)
+    return stats, stdout, stderr
+
+
+def describe_exit(returncode):
+    """Describe how a process ended, naming the signal when it was killed"""
+    if returncode >= 0:
+        return f"exit code {returncode}"
+    try:
+        import signal
+        return f"killed by {signal.Signals(-returncode).name}"
+    except ValueError:
+        return f"killed by signal {-returncode}"
+
+
+def _megabytes(size):
+    return "-" if size is None else f"{size / MB:.1f}"
+
+
+def print_run_stats(run_stats):
+    """Print the resource use of every example run, as recorded by run_example()"""
+    if not run_stats:
+        return
+    print("\n=== Example Runs ===")
+    print(f"{'EXAMPLE':<32} {'READ MB':>8} {'WRITE MB':>9} {'TMP MB':>7} {'TMP FILES':>9} "
+          f"{'PEAK RSS MB':>11} {'CPU S':>6} {'WALL S':>6}")
+    for example_name, stats in run_stats:
+        print(f"{example_name:<32} {_megabytes(stats.read_bytes):>8} {_megabytes(stats.write_bytes):>9} "
+              f"{_megabytes(stats.tmp_peak_bytes):>7} {stats.tmp_files:>9} {_megabytes(stats.peak_rss):>11} "
+              f"{stats.user_time + stats.system_time:>6.2f} {stats.wall_time:>6.2f}")
+
+
 def build_example(example_name, project_root, quiet=False, build_all=False):
     """Build the example and return True if successful"""
     if not quiet:
@@ -39,8 +254,13 @@ def build_example(example_name, project_root, quiet=False, build_all=False):
     return True
 
 
-def run_example(example_name, project_root, quiet=False):
-    """Run the example to generate the Excel file"""
+def run_example(example_name, project_root, quiet=False, limits=None, run_stats=None):
+    """Run the example to generate the Excel file.
+
+    The run is monitored; its RunStats are appended to run_stats as
+    (example name, stats) when a list is given. limits is an optional
+    ResourceLimits for the example process.
+    """
     if not quiet:
         print(f"Running example to generate Excel file: {example_name}.xlsx")
     example_bin = project_root / "zig-out" / "bin" / example_name
@@ -49,11 +269,13 @@ def run_example(example_name, project_root, quiet=False):
         print(f"❌ Executable not found at {get_relative_path(example_bin, project_root)}")
         return False
     
-    result = subprocess.run([str(example_bin)], capture_output=True, text=True)
+    stats, _, stderr = run_monitored([str(example_bin)], limits=limits)
+    if run_stats is not None:
+        run_stats.append((example_name, stats))
     
-    if result.returncode != 0:
-        print(f"❌ Example execution failed for {example_name}")
-        print(result.stderr)
+    if stats.returncode != 0:
+        print(f"❌ Example execution failed for {example_name} ({describe_exit(stats.returncode)})")
+        print(stderr)
         return False
     
     # Check for both .xlsx and .xlsm files
@@ -9,105 +9,105 @@ import zipfile
 from pathlib import Path
 
 try:
-    import openpyxl
-    from openpyxl.utils.exceptions import InvalidFileException
-except ImportError:
-    print("Error: This script requires openpyxl. Install with: pip install openpyxl")
-    import sys
-    sys.exit(1)
+    from utils.xlsx_parts import list_sheets, column_letters, read_rels
+    from utils.binary_parts import is_binary_part, compare_binary_member, member_image_size, drawing_pictures
+    from utils.part_sizes import part_sizes, compare_part_sizes, largest_changes
+    from utils.shared_strings import StringInterner, SharedStringsIndex
+    from utils.xlsx_source import resolve_generated, resolve_reference, open_archive, members_equal, source_size, source_label, source_exists
+    from utils.findings import Findings, RangeCollector, row_range
+    from utils.xlsx_reader import SHARED_STRING, STRING, ERROR, FORMULA, coordinate
+except ModuleNotFoundError:
+    from xlsx_parts import list_sheets, column_letters, read_rels
+    from binary_parts import is_binary_part, compare_binary_member, member_image_size, drawing_pictures
+    from part_sizes import part_sizes, compare_part_sizes, largest_changes
+    from shared_strings import StringInterner, SharedStringsIndex
+    from xlsx_source import resolve_generated, resolve_reference, open_archive, members_equal, source_size, source_label, source_exists
+    from findings import Findings, RangeCollector, row_range
+    from xlsx_reader import SHARED_STRING, STRING, ERROR, FORMULA, coordinate
 
 
 def check_formulas(workbook, example_name):
-    """Check for common formula issues in the workbook"""
+    """Check for common formula issues in the workbook (an XlsxWorkbook)"""
     issues_found = False
     
-    for sheet_name in workbook.sheetnames:
-        sheet = workbook[sheet_name]
-        
-        # Skip chartsheets as they don't have rows/cells
-        if isinstance(sheet, openpyxl.chartsheet.Chartsheet):
-            continue
+    # Chartsheets are skipped as they don't have rows/cells; array formulas
+    # are left out like openpyxl, which does not give them as text
+    for sheet in workbook.worksheets():
+        sheet_name = sheet.name
+        for row_idx, col_idx, _, value in workbook.iter_values(sheet, kinds=(FORMULA,)):
+            where = coordinate(row_idx, col_idx)
             
-        for row_idx, row in enumerate(sheet.rows, 1):
-            for col_idx, cell in enumerate(row, 1):
-                # Check for formula cells
-                if cell.value and isinstance(cell.value, str) and cell.value.startswith('='):
-                    # Check for circular references
-                    # This is a basic check - it only catches obvious self-references
-                    cell_col_letter = openpyxl.utils.get_column_letter(col_idx)
-                    cell_ref = f"{cell_col_letter}{row_idx}"
-                    
-                    if cell_ref in cell.value:
-                        print(f"[{example_name}] ⚠️ Potential circular reference in {sheet_name}!{cell.coordinate}: {cell.value} references its own cell {cell_ref}")
-                        issues_found = True
-                    
-                    # Check for SUM ranges that might include the formula cell itself
-                    sum_match = re.search(r'SUM\(([A-Z]+)(\d+):([A-Z]+)(\d+)\)', cell.value)
-                    if sum_match:
-                        start_col, start_row, end_col, end_row = sum_match.groups()
-                        start_row, end_row = int(start_row), int(end_row)
-                        
-                        if (cell_col_letter >= start_col and cell_col_letter <= end_col and 
-                            row_idx >= start_row and row_idx <= end_row):
-                            print(f"[{example_name}] ⚠️ Formula range includes its own cell in {sheet_name}!{cell.coordinate}: {cell.value}")
-                            issues_found = True
-                    
-                    # Check for null-termination issues (common in the Zig libxlsxwriter wrapper)
-                    if cell.value.endswith('\x00'):
-                        print(f"[{example_name}] ⚠️ Formula contains null terminator at the end in {sheet_name}!{cell.coordinate}: {cell.value}")
-                        issues_found = True
-                    
-                    # Check for other common formula syntax issues
-                    if ':' in cell.value and not re.search(r'[A-Z]+\d+:[A-Z]+\d+', cell.value):
-                        print(f"[{example_name}] ⚠️ Potentially malformed range in formula at {sheet_name}!{cell.coordinate}: {cell.value}")
-                        issues_found = True
+            # Check for circular references
+            # This is a basic check - it only catches obvious self-references
+            cell_col_letter = column_letters(col_idx)
+            cell_ref = f"{cell_col_letter}{row_idx}"
+            
+            if cell_ref in value:
+                print(f"[{example_name}] ⚠️ Potential circular reference in {sheet_name}!{where}: {value} references its own cell {cell_ref}")
+                issues_found = True
+            
+            # Check for SUM ranges that might include the formula cell itself
+            sum_match = re.search(r'SUM\(([A-Z]+)(\d+):([A-Z]+)(\d+)\)', value)
+            if sum_match:
+                start_col, start_row, end_col, end_row = sum_match.groups()
+                start_row, end_row = int(start_row), int(end_row)
+                
+                if (cell_col_letter >= start_col and cell_col_letter <= end_col and 
+                    row_idx >= start_row and row_idx <= end_row):
+                    print(f"[{example_name}] ⚠️ Formula range includes its own cell in {sheet_name}!{where}: {value}")
+                    issues_found = True
+            
+            # Check for null-termination issues (common in the Zig libxlsxwriter wrapper)
+            if value.endswith('\x00'):
+                print(f"[{example_name}] ⚠️ Formula contains null terminator at the end in {sheet_name}!{where}: {value}")
+                issues_found = True
+            
+            # Check for other common formula syntax issues
+            if ':' in value and not re.search(r'[A-Z]+\d+:[A-Z]+\d+', value):
+                print(f"[{example_name}] ⚠️ Potentially malformed range in formula at {sheet_name}!{where}: {value}")
+                issues_found = True
     
     return not issues_found
 
 
 def check_string_null_termination(workbook, example_name=None):
-    """Check for issues with string null termination"""
+    """Check for issues with string null termination in the workbook (an XlsxWorkbook)"""
     issues_found = False
+    prefix = f"[{example_name}] " if example_name else ""
     
-    for sheet_name in workbook.sheetnames:
-        sheet = workbook[sheet_name]
-        
-        # Skip chartsheets as they don't have rows/cells
-        if isinstance(sheet, openpyxl.chartsheet.Chartsheet):
-            continue
+    # Shared strings are located by a byte scan; only the suspicious ones are decoded
+    suspicious = workbook.suspicious_strings()
+    
+    for sheet in workbook.worksheets():
+        cells = sheet.cells
+        for index in range(len(cells)):
+            kind = cells.kinds[index]
+            if kind not in (SHARED_STRING, STRING, ERROR, FORMULA):
+                continue
+            if kind == SHARED_STRING and cells.values[index] not in suspicious:
+                continue
+            value = workbook.value(kind, cells.values[index])
+            where = coordinate(cells.rows[index], cells.cols[index])
             
-        for row in sheet.rows:
-            for cell in row:
-                # Check for string cells with null terminators
-                if isinstance(cell.value, str):
-                    if '\x00' in cell.value:
-                        if example_name:
-                            print(f"[{example_name}] ⚠️ Cell {cell.coordinate} contains null character: {repr(cell.value)}")
-                        else:
-                            print(f"⚠️ Cell {cell.coordinate} contains null character: {repr(cell.value)}")
-                        issues_found = True
-                    
-                    # Check for truncated strings (potential null termination issues)
-                    if cell.value.endswith('...') or cell.value.endswith('…'):
-                        if example_name:
-                            print(f"[{example_name}] ⚠️ Cell {cell.coordinate} might be truncated: {cell.value}")
-                        else:
-                            print(f"⚠️ Cell {cell.coordinate} might be truncated: {cell.value}")
-                        issues_found = True
+            # Check for string cells with null terminators
+            if '\x00' in value:
+                print(f"{prefix}⚠️ Cell {where} contains null character: {repr(value)}")
+                issues_found = True
+            
+            # Check for truncated strings (potential null termination issues)
+            if value.endswith('...') or value.endswith('…'):
+                print(f"{prefix}⚠️ Cell {where} might be truncated: {value}")
+                issues_found = True
     
     return not issues_found
 
 
-def check_xml_content(example_name):
+def check_xml_content(example_name, generated=None):
     """Check the XML content of the xlsx/xlsm file for encoding issues in memory"""
-    generated_file = Path(f"{example_name}.xlsx")
-    generated_macro_file = Path(f"{example_name}.xlsm")
-    
-    # Use the macro file if it exists, otherwise use the regular file
-    file_to_check = generated_macro_file if generated_macro_file.exists() else generated_file
+    file_to_check = resolve_generated(example_name, generated)
     
     try:
-        with zipfile.ZipFile(file_to_check, 'r') as xlsx_zip:
+        with open_archive(file_to_check) as xlsx_zip:
             # Get list of all XML files in the workbook
             sheet_files = [name for name in xlsx_zip.namelist() 
                          if name.startswith('xl/worksheets/sheet') and name.endswith('.xml')]
@@ -147,69 +147,99 @@ def check_xml_content(example_name):
                         print(f"[{example_name}] ❌ XML parsing error in {sheet_file}: {e}")
                         return False
             
-            # Check for specific string table entries (shared strings)
-            if 'xl/sharedStrings.xml' in xlsx_zip.namelist():
-                with xlsx_zip.open('xl/sharedStrings.xml') as file:
-                    try:
-                        tree = ET.parse(file)
-                        root = tree.getroot()
-                        
-                        ns = {'s': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'}
-                        strings = root.findall(".//s:t", ns)
-                        
-                        for string in strings:
-                            string_text = string.text or ""
-                            
-                            # Check for null characters in shared strings
-                            if '\x00' in string_text:
-                                print(f"[{example_name}] ⚠️ Shared string contains null characters: {repr(string_text)}")
-                            
-                            # Check for potentially malformed strings
-                            if string_text.endswith('...') or string_text.endswith('…'):
-                                print(f"[{example_name}] ⚠️ Shared string might be truncated: {string_text}")
+            # Check shared string entries; only the suspicious ones are decoded
+            shared_strings = SharedStringsIndex(xlsx_zip, StringInterner())
+            try:
+                for index, reason in shared_strings.suspicious():
+                    string_text = shared_strings.text(index)
                     
-                    except ET.ParseError as e:
-                        print(f"[{example_name}] ❌ XML parsing error in sharedStrings.xml: {e}")
-                        return False
+                    # Check for null characters in shared strings
+                    if reason == 'null':
+                        print(f"[{example_name}] ⚠️ Shared string contains null characters: {repr(string_text)}")
+                    
+                    # Check for potentially malformed strings
+                    elif string_text.endswith('...') or string_text.endswith('…'):
+                        print(f"[{example_name}] ⚠️ Shared string might be truncated: {string_text}")
+            
+            except ET.ParseError as e:
+                print(f"[{example_name}] ❌ XML parsing error in sharedStrings.xml: {e}")
+                return False
     
     except zipfile.BadZipFile:
-        print(f"[{example_name}] ❌ File is not a valid ZIP/XLSX file: {generated_file.name}")
+        print(f"[{example_name}] ❌ File is not a valid ZIP/XLSX file: {source_label(file_to_check)}")
         return False
     
     return True
 
 
-def check_binary_compatibility(example_name, reference_dir):
+def _pixels(dimensions):
+    return f"{dimensions[0]}x{dimensions[1]} pixels" if dimensions else "of unknown size"
+
+
+def compare_drawing_pictures(example_name, gen_zip, ref_zip, drawing_part):
+    """Compare the pictures of a drawing part: the image each one shows and the extent it is drawn at"""
+    has_differences = False
+    gen_pictures = drawing_pictures(gen_zip, drawing_part, read_rels(gen_zip, drawing_part))
+    ref_pictures = drawing_pictures(ref_zip, drawing_part, read_rels(ref_zip, drawing_part))
+
+    if len(gen_pictures) != len(ref_pictures):
+        print(f"[{example_name}] ⚠️ {drawing_part} has {len(gen_pictures)} pictures, reference has {len(ref_pictures)}")
+        has_differences = True
+
+    for gen_picture, ref_picture in zip(gen_pictures, ref_pictures):
+        label = f"Picture '{ref_picture.name}' in {drawing_part}"
+        if (gen_picture.cx, gen_picture.cy) != (ref_picture.cx, ref_picture.cy):
+            print(f"[{example_name}] ⚠️ {label} is drawn at {gen_picture.cx}x{gen_picture.cy} EMU, "
+                  f"reference is {ref_picture.cx}x{ref_picture.cy} EMU")
+            has_differences = True
+        gen_image = gen_picture.target if gen_picture.target in gen_zip else None
+        ref_image = ref_picture.target if ref_picture.target in ref_zip else None
+        # Images under the same name were already compared byte for byte
+        if gen_image and ref_image and gen_image != ref_image:
+            gen_dimensions = member_image_size(gen_zip, gen_image)
+            ref_dimensions = member_image_size(ref_zip, ref_image)
+            if gen_dimensions != ref_dimensions:
+                print(f"[{example_name}] ⚠️ {label} shows an image of {_pixels(gen_dimensions)}, "
+                      f"reference is {_pixels(ref_dimensions)}")
+                has_differences = True
+
+    return has_differences
+
+
+def check_binary_compatibility(example_name, reference_dir, generated=None, reference=None):
     """Check for binary compatibility issues that might not be visible in the content"""
-    generated_file = Path(f"{example_name}.xlsx")
-    generated_macro_file = Path(f"{example_name}.xlsm")
-    reference_file = reference_dir / f"{example_name}.xlsx"
-    reference_macro_file = reference_dir / f"{example_name}.xlsm"
-    
-    # Use the macro files if they exist, otherwise use the regular files
-    file_to_check = generated_macro_file if generated_macro_file.exists() else generated_file
-    ref_to_check = reference_macro_file if reference_macro_file.exists() else reference_file
+    file_to_check = resolve_generated(example_name, generated)
+    ref_to_check = resolve_reference(example_name, reference_dir, reference)
     
-    if not ref_to_check.exists():
-        print(f"[{example_name}] ⚠️ Reference file not found: {ref_to_check}")
+    if not source_exists(ref_to_check):
+        print(f"[{example_name}] ⚠️ Reference file not found: {source_label(ref_to_check)}")
         return False
     
     try:
         has_differences = False
         
         # Compare file sizes - significant differences might indicate issues
-        gen_size = file_to_check.stat().st_size
-        ref_size = ref_to_check.stat().st_size
+        gen_size = source_size(file_to_check)
+        ref_size = source_size(ref_to_check)
         size_diff_percent = abs(gen_size - ref_size) / max(gen_size, ref_size) * 100
         
-        if size_diff_percent > 10:  # More than 10% size difference
-            print(f"[{example_name}] ⚠️ File size differs significantly: {gen_size} vs {ref_size} bytes ({size_diff_percent:.2f}% difference)")
-            has_differences = True
-        
-        # Check internal file structure using zipfile
-        with zipfile.ZipFile(file_to_check, 'r') as gen_zip, zipfile.ZipFile(ref_to_check, 'r') as ref_zip:
+        # Check internal file structure from the central directory
+        with open_archive(file_to_check) as gen_zip, open_archive(ref_to_check) as ref_zip:
             gen_files = set(gen_zip.namelist())
             ref_files = set(ref_zip.namelist())
+            gen_sizes = part_sizes(gen_zip)
+            ref_sizes = part_sizes(ref_zip)
+            
+            if size_diff_percent > 10:  # More than 10% size difference
+                print(f"[{example_name}] ⚠️ File size differs significantly: {gen_size} vs {ref_size} bytes ({size_diff_percent:.2f}% difference)")
+                changes = ", ".join(f"{name} {change:+d}" for name, change in largest_changes(gen_sizes, ref_sizes))
+                print(f"  Largest changes in compressed size: {changes}")
+                has_differences = True
+            
+            # Hold every part to its byte budget against the reference
+            for problem in compare_part_sizes(gen_sizes, ref_sizes):
+                print(f"[{example_name}] ⚠️ {problem}")
+                has_differences = True
             
             # Check for missing files
             missing_files = ref_files - gen_files
@@ -226,13 +256,33 @@ def check_binary_compatibility(example_name, reference_dir):
             # Compare contents of important files
             for file_name in ['xl/workbook.xml', 'xl/styles.xml']:
                 if file_name in gen_files and file_name in ref_files:
-                    with gen_zip.open(file_name) as gen_file, ref_zip.open(file_name) as ref_file:
-                        gen_content = gen_file.read()
-                        ref_content = ref_file.read()
-                        
-                        if gen_content != ref_content:
-                            print(f"[{example_name}] ⚠️ Content of {file_name} differs")
-                            has_differences = True
+                    if not members_equal(gen_zip, ref_zip, file_name):
+                        print(f"[{example_name}] ⚠️ Content of {file_name} differs")
+                        has_differences = True
+            
+            # Compare images and VBA projects byte for byte, streaming them in chunks
+            for file_name in sorted(gen_files & ref_files):
+                if not is_binary_part(file_name):
+                    continue
+                difference = compare_binary_member(gen_zip, ref_zip, file_name)
+                if difference is None:
+                    continue
+                print(f"[{example_name}] ⚠️ Content of {file_name} differs from byte {difference.offset}: "
+                      f"{difference.gen_size} vs {difference.ref_size} bytes "
+                      f"(sha256 {difference.gen_digest[:12]} vs {difference.ref_digest[:12]})")
+                has_differences = True
+                if file_name.startswith('xl/media/'):
+                    gen_dimensions = member_image_size(gen_zip, file_name)
+                    ref_dimensions = member_image_size(ref_zip, file_name)
+                    if gen_dimensions != ref_dimensions:
+                        print(f"[{example_name}] ⚠️ Image {file_name} is {_pixels(gen_dimensions)}, "
+                              f"reference is {_pixels(ref_dimensions)}")
+            
+            # Compare the size each picture is drawn at, which shows scaling bugs
+            for file_name in sorted(gen_files & ref_files):
+                if file_name.startswith('xl/drawings/') and file_name.endswith('.xml'):
+                    if compare_drawing_pictures(example_name, gen_zip, ref_zip, file_name):
+                        has_differences = True
         
         return not has_differences
     
@@ -241,78 +291,220 @@ def check_binary_compatibility(example_name, reference_dir):
         return False
 
 
-def check_row_visibility(example_name, reference_dir):
-    """Check that row visibility states match between generated and reference files"""
-    generated_file = Path(f"{example_name}.xlsx")
-    generated_macro_file = Path(f"{example_name}.xlsm")
-    reference_file = reference_dir / f"{example_name}.xlsx"
-    reference_macro_file = reference_dir / f"{example_name}.xlsm"
-    
-    # Use the macro files if they exist, otherwise use the regular files
-    file_to_check = generated_macro_file if generated_macro_file.exists() else generated_file
-    ref_to_check = reference_macro_file if reference_macro_file.exists() else reference_file
+# Row height Excel uses when a sheet has no sheetFormatPr defaultRowHeight
+DEFAULT_ROW_HEIGHT = 15.0
+
+
+def iter_sheet_rows(stream, sheet_format):
+    """Incrementally scan a worksheet stream and yield (row, hidden, height) per <row>.
+
+    Only the attributes of <row> elements are looked at; cell content is
+    discarded as soon as each row ends. sheet_format is filled in as the
+    parser reaches it with the sheetFormatPr defaults and a list of
+    (min, max, width, hidden) tuples for the <col> elements, all of which
+    precede sheetData, so it is complete by the time the first row is yielded.
+    """
+    sheet_format.setdefault('height', DEFAULT_ROW_HEIGHT)
+    sheet_format.setdefault('hidden', False)
+    sheet_format.setdefault('cols', [])
+
+    ns = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+    parser = ET.XMLPullParser(events=('start', 'end'))
+    sheet_data = None
+    last_row = 0
+
+    for chunk in iter(lambda: stream.read(64 * 1024), b''):
+        parser.feed(chunk)
+        for event, element in parser.read_events():
+            tag = element.tag
+            if event == 'start':
+                if tag == ns + 'sheetData':
+                    sheet_data = element
+                elif tag == ns + 'sheetFormatPr':
+                    sheet_format['height'] = float(element.get('defaultRowHeight', DEFAULT_ROW_HEIGHT))
+                    sheet_format['hidden'] = element.get('zeroHeight') in ('1', 'true')
+                elif tag == ns + 'col':
+                    width = element.get('width')
+                    sheet_format['cols'].append((
+                        int(element.get('min')),
+                        int(element.get('max')),
+                        float(width) if width is not None else None,
+                        element.get('hidden') in ('1', 'true'),
+                    ))
+            elif tag == ns + 'row':
+                # The r attribute is optional; without it rows are sequential
+                last_row = int(element.get('r', last_row + 1))
+                height = element.get('ht')
+                yield (
+                    last_row,
+                    element.get('hidden') in ('1', 'true'),
+                    float(height) if height is not None else sheet_format['height'],
+                )
+                if sheet_data is not None:
+                    sheet_data.clear()
+    parser.close()
+
+
+def _col_segments(gen_cols, ref_cols):
+    """Split both column lists on a shared set of boundaries.
+
+    Yields (first, last, gen_attrs, ref_attrs) where the attrs are
+    (width, hidden) tuples, or (None, False) for columns without a <col> entry.
+    """
+    bounds = sorted({col[0] for col in gen_cols + ref_cols} | {col[1] + 1 for col in gen_cols + ref_cols})
+
+    def attrs_at(cols, column):
+        for first, last, width, hidden in cols:
+            if first <= column <= last:
+                return width, hidden
+        return None, False
+
+    for first, next_first in zip(bounds, bounds[1:]):
+        yield first, next_first - 1, attrs_at(gen_cols, first), attrs_at(ref_cols, first)
+
+
+def compare_sheet_rows(example_name, sheet_name, gen_stream, ref_stream, findings=None):
+    """Merge-join the rows of two worksheet streams and report visibility and height mismatches.
+
+    Mismatching rows are reported as runs through findings, which stops the
+    comparison once its budget is spent.
+    """
+    gen_format, ref_format = {}, {}
+    return compare_rows(example_name, sheet_name, iter_sheet_rows(gen_stream, gen_format), gen_format,
+                        iter_sheet_rows(ref_stream, ref_format), ref_format, findings)
+
+
+def compare_rows(example_name, sheet_name, gen_rows, gen_format, ref_rows, ref_format, findings=None):
+    """Merge-join two sequences of (row, hidden, height) and compare the sheets' row and column formats.
+
+    The formats are dicts as filled in by iter_sheet_rows(); they only need
+    to be complete once the first row has been taken from each sequence.
+    """
+    own_findings = findings is None
+    if own_findings:
+        findings = Findings(example_name)
+    has_differences = False
+    gen_rows = iter(gen_rows)
+    ref_rows = iter(ref_rows)
+    gen_row = next(gen_rows, None)
+    ref_row = next(ref_rows, None)
+
+    visibility = RangeCollector(findings, lambda kind: f"Row visibility mismatch in sheet '{sheet_name}'",
+                                location=row_range, unit="rows")
+    heights = RangeCollector(findings, lambda kind: f"Row height mismatch in sheet '{sheet_name}'",
+                             location=row_range, unit="rows")
+
+    while (gen_row is not None or ref_row is not None) and not findings.exhausted:
+        # Rows without a <row> element on one side take that sheet's defaults
+        if ref_row is None or (gen_row is not None and gen_row[0] < ref_row[0]):
+            row, gen_hidden, gen_height = gen_row
+            ref_hidden, ref_height = ref_format['hidden'], ref_format['height']
+            gen_row = next(gen_rows, None)
+        elif gen_row is None or ref_row[0] < gen_row[0]:
+            row, ref_hidden, ref_height = ref_row
+            gen_hidden, gen_height = gen_format['hidden'], gen_format['height']
+            ref_row = next(ref_rows, None)
+        else:
+            row, gen_hidden, gen_height = gen_row
+            _, ref_hidden, ref_height = ref_row
+            gen_row = next(gen_rows, None)
+            ref_row = next(ref_rows, None)
+
+        if ref_hidden != gen_hidden:
+            visibility.add(row, 1, gen_hidden, 'hidden' if ref_hidden else 'visible',
+                           'hidden' if gen_hidden else 'visible')
+            has_differences = True
+
+        if abs(ref_height - gen_height) > 0.1:  # Allow small floating point differences
+            heights.add(row, 1, None, ref_height, gen_height)
+            has_differences = True
+
+    visibility.close()
+    heights.close()
+
+    # Sheet-wide defaults are only known once the whole sheet has been read
+    if not findings.exhausted:
+        if ref_format['hidden'] != gen_format['hidden']:
+            findings.count()
+            findings.warn(f"Default row visibility mismatch in sheet '{sheet_name}':",
+                          'hidden' if ref_format['hidden'] else 'visible',
+                          'hidden' if gen_format['hidden'] else 'visible')
+            has_differences = True
+
+        if abs(ref_format['height'] - gen_format['height']) > 0.1:
+            findings.count()
+            findings.warn(f"Default row height mismatch in sheet '{sheet_name}':",
+                          ref_format['height'], gen_format['height'])
+            has_differences = True
+
+        for first, last, (gen_width, gen_hidden), (ref_width, ref_hidden) in _col_segments(gen_format['cols'], ref_format['cols']):
+            columns = column_letters(first) if first == last else f"{column_letters(first)}:{column_letters(last)}"
+            if ref_hidden != gen_hidden:
+                findings.count()
+                findings.warn(f"Column visibility mismatch in sheet '{sheet_name}' at columns {columns}:",
+                              'hidden' if ref_hidden else 'visible', 'hidden' if gen_hidden else 'visible')
+                has_differences = True
+            if (ref_width is None) != (gen_width is None) or (ref_width is not None and abs(ref_width - gen_width) > 0.01):
+                findings.count()
+                findings.warn(f"Column width mismatch in sheet '{sheet_name}' at columns {columns}:",
+                              'default' if ref_width is None else ref_width,
+                              'default' if gen_width is None else gen_width)
+                has_differences = True
+
+    if own_findings:
+        findings.flush()
+    return has_differences
+
+
+def check_row_visibility(example_name, reference_dir, generated=None, reference=None, max_findings=None):
+    """Check that row and column visibility and sizes match between generated and reference files.
+
+    With max_findings set, the check stops once that many mismatches are found.
+    """
+    file_to_check = resolve_generated(example_name, generated)
+    ref_to_check = resolve_reference(example_name, reference_dir, reference)
     
-    if not ref_to_check.exists():
-        print(f"[{example_name}] ⚠️ Reference file not found: {ref_to_check}")
+    if not source_exists(ref_to_check):
+        print(f"[{example_name}] ⚠️ Reference file not found: {source_label(ref_to_check)}")
         return False
     
+    findings = Findings(example_name, max_findings)
     try:
         has_differences = False
         
-        # Load both workbooks
-        gen_wb = openpyxl.load_workbook(file_to_check)
-        ref_wb = openpyxl.load_workbook(ref_to_check)
-        
-        # Compare each sheet
-        for sheet_name in ref_wb.sheetnames:
-            if sheet_name not in gen_wb.sheetnames:
-                print(f"[{example_name}] ⚠️ Generated file is missing sheet: {sheet_name}")
-                has_differences = True
-                continue
+        with findings, open_archive(file_to_check) as gen_zip, open_archive(ref_to_check) as ref_zip:
+            gen_sheets = {name: (part, kind) for name, part, kind in list_sheets(gen_zip)}
+            ref_sheets = {name: (part, kind) for name, part, kind in list_sheets(ref_zip)}
             
-            ref_sheet = ref_wb[sheet_name]
-            gen_sheet = gen_wb[sheet_name]
-            
-            # Skip chartsheets as they don't have rows
-            if isinstance(ref_sheet, openpyxl.chartsheet.Chartsheet) or isinstance(gen_sheet, openpyxl.chartsheet.Chartsheet):
-                continue
-            
-            # Get the maximum row number to check
-            max_row = max(ref_sheet.max_row, gen_sheet.max_row)
-            
-            # Check each row's visibility
-            for row in range(1, max_row + 1):
-                # Get row dimensions, defaulting to visible if not set
-                ref_dim = ref_sheet.row_dimensions.get(row)
-                gen_dim = gen_sheet.row_dimensions.get(row)
-                
-                ref_hidden = ref_dim.hidden if ref_dim and ref_dim.hidden is not None else False
-                gen_hidden = gen_dim.hidden if gen_dim and gen_dim.hidden is not None else False
-                
-                if ref_hidden != gen_hidden:
-                    print(f"[{example_name}] ⚠️ Row visibility mismatch in sheet '{sheet_name}' at row {row}:")
-                    print(f"  Reference: {'hidden' if ref_hidden else 'visible'}")
-                    print(f"  Generated: {'hidden' if gen_hidden else 'visible'}")
+            # Compare each sheet
+            for sheet_name, (ref_part, ref_kind) in ref_sheets.items():
+                if findings.exhausted:
+                    break
+                if sheet_name not in gen_sheets:
+                    findings.warn(f"Generated file is missing sheet: {sheet_name}", details=False)
                     has_differences = True
+                    continue
                 
-                # Also check row heights if they differ significantly
-                ref_height = ref_dim.height if ref_dim and ref_dim.height is not None else 15
-                gen_height = gen_dim.height if gen_dim and gen_dim.height is not None else 15
+                gen_part, gen_kind = gen_sheets[sheet_name]
                 
-                if abs(ref_height - gen_height) > 0.1:  # Allow small floating point differences
-                    print(f"[{example_name}] ⚠️ Row height mismatch in sheet '{sheet_name}' at row {row}:")
-                    print(f"  Reference: {ref_height}")
-                    print(f"  Generated: {gen_height}")
+                # Skip chartsheets as they don't have rows
+                if ref_kind != 'worksheet' or gen_kind != 'worksheet':
+                    continue
+                
+                with gen_zip.open(gen_part) as gen_stream, ref_zip.open(ref_part) as ref_stream:
+                    if compare_sheet_rows(example_name, sheet_name, gen_stream, ref_stream, findings):
+                        has_differences = True
+            
+            # Check for extra sheets in generated file
+            for sheet_name in gen_sheets:
+                if sheet_name not in ref_sheets:
+                    findings.warn(f"Generated file has extra sheet: {sheet_name}", details=False)
                     has_differences = True
-        
-        # Check for extra sheets in generated file
-        for sheet_name in gen_wb.sheetnames:
-            if sheet_name not in ref_wb.sheetnames:
-                print(f"[{example_name}] ⚠️ Generated file has extra sheet: {sheet_name}")
-                has_differences = True
+            
+            findings.stopped_note()
         
         return not has_differences
     
     except Exception as e:
         print(f"[{example_name}] ❌ Error checking row visibility: {e}")
-        return False 
\ No newline at end of file
+        return False
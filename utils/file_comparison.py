@@ -4,8 +4,21 @@ File comparison utilities for the autocheck tool.
 """
 
 from pathlib import Path
-import openpyxl
-from openpyxl.utils.exceptions import InvalidFileException
+
+try:
+    from utils.xlsx_parts import list_sheets, iter_sheet_cells
+    from utils.xlsx_source import resolve_generated, resolve_reference, open_archive, source_exists, source_label
+    from utils.shared_strings import StringInterner, SharedStringsIndex
+    from utils.findings import Findings, RangeCollector
+    from utils.formula_tokens import expand_formula, formula_text, formulas_equal
+    from utils.xlsx_reader import XlsxWorkbook, compare_style_ids, iter_style_pairs, unescape
+except ModuleNotFoundError:
+    from xlsx_parts import list_sheets, iter_sheet_cells
+    from xlsx_source import resolve_generated, resolve_reference, open_archive, source_exists, source_label
+    from shared_strings import StringInterner, SharedStringsIndex
+    from findings import Findings, RangeCollector
+    from formula_tokens import expand_formula, formula_text, formulas_equal
+    from xlsx_reader import XlsxWorkbook, compare_style_ids, iter_style_pairs, unescape
 
 passed_autocheck_file = "autochecked"
 
@@ -18,79 +31,233 @@ def get_relative_path(path, project_root):
         return path
 
 
-def compare_with_reference(example_name, reference_dir, results_dir, project_root, quiet=False, ignore_styles=False):
-    """Compare the generated Excel file with the reference file"""
-    generated_file = Path(f"{example_name}.xlsx")
-    generated_macro_file = Path(f"{example_name}.xlsm")
-    reference_file = reference_dir / f"{example_name}.xlsx"
-    reference_macro_file = reference_dir / f"{example_name}.xlsm"
+def _sheet_values(stream, strings, interner):
+    """Yield ((row, col), value) for every cell of a worksheet that has a value or formula.
+
+    Values are small tuples: ('s', interned id, index or text) for strings,
+    ('f', formula, array range) for formulas, and (type, parsed value)
+    for everything else. Shared formulas are expanded lazily from their master.
+    """
+    shared_masters = {}
+    for row, col, cell_type, value, formula in iter_sheet_cells(stream):
+        if formula is not None:
+            yield (row, col), ('f',) + expand_formula(formula, row, col, shared_masters, lazy=True)
+        elif value is None:
+            continue
+        elif cell_type == 's':
+            index = int(value)
+            yield (row, col), ('s', strings.id(index), index)
+        elif cell_type == 'inlineStr':
+            yield (row, col), ('s', interner.intern_text(value), value)
+        elif cell_type == 'n':
+            yield (row, col), ('n', float(value))
+        elif cell_type == 'b':
+            yield (row, col), ('b', value == '1')
+        else:
+            yield (row, col), (cell_type, value)
+
+
+def _string_text(value, strings):
+    """Decode a string value: shared entries are only decoded here, on demand"""
+    return strings.text(value[2]) if isinstance(value[2], int) else value[2]
+
+
+def _values_equal(gen_value, ref_value, gen_strings, ref_strings):
+    if gen_value is None or ref_value is None:
+        return gen_value is ref_value
+    if gen_value[0] == 's' and ref_value[0] == 's':
+        # Equal ids mean equal entries; otherwise compare the plain text,
+        # since rich and plain or inline and shared strings can still match
+        return (gen_value[1] == ref_value[1]
+                or _string_text(gen_value, gen_strings) == _string_text(ref_value, ref_strings))
+    if gen_value[0] == 'f' and ref_value[0] == 'f':
+        # Formulas are equal when their normalized syntax trees are
+        return gen_value[2] == ref_value[2] and formulas_equal(gen_value[1], ref_value[1])
+    return gen_value == ref_value
+
+
+def _display_value(value, strings):
+    if value is None:
+        return None
+    if value[0] == 's':
+        # Shown decoded, as Excel would; the comparison itself is on the raw text
+        return unescape(_string_text(value, strings))
+    if value[0] == 'f':
+        text = formula_text(value[1])
+        return f"{{={text}}}" if value[2] else f"={text}"
+    if value[0] == 'n' and value[1].is_integer():
+        return int(value[1])
+    return value[1]
+
+
+def compare_sheet_values(example_name, sheet_name, gen_stream, gen_strings, ref_stream, ref_strings, interner,
+                         findings=None):
+    """Merge-join the cells of two worksheets in row-major order and report value mismatches.
+
+    Mismatching cells are reported as ranges through findings, which stops
+    the comparison once its budget is spent.
+    """
+    own_findings = findings is None
+    if own_findings:
+        findings = Findings(example_name)
+    has_differences = False
+    gen_cells = _sheet_values(gen_stream, gen_strings, interner)
+    ref_cells = _sheet_values(ref_stream, ref_strings, interner)
+    gen_cell = next(gen_cells, None)
+    ref_cell = next(ref_cells, None)
+
+    with RangeCollector(findings, lambda kind: f"Value mismatch in sheet '{sheet_name}'") as mismatches:
+        while (gen_cell is not None or ref_cell is not None) and not findings.exhausted:
+            if ref_cell is None or (gen_cell is not None and gen_cell[0] < ref_cell[0]):
+                position, gen_value, ref_value = gen_cell[0], gen_cell[1], None
+                gen_cell = next(gen_cells, None)
+            elif gen_cell is None or ref_cell[0] < gen_cell[0]:
+                position, gen_value, ref_value = ref_cell[0], None, ref_cell[1]
+                ref_cell = next(ref_cells, None)
+            else:
+                position, gen_value, ref_value = gen_cell[0], gen_cell[1], ref_cell[1]
+                gen_cell = next(gen_cells, None)
+                ref_cell = next(ref_cells, None)
+
+            if not _values_equal(gen_value, ref_value, gen_strings, ref_strings):
+                mismatches.add(position[0], position[1], 'value',
+                               _display_value(ref_value, ref_strings), _display_value(gen_value, gen_strings))
+                has_differences = True
+
+    if own_findings:
+        findings.flush()
+    return has_differences
+
+
+# Style components the content check compares
+COMPARED_STYLES = ('Font', 'Fill', 'Border', 'Alignment')
+
+
+def compare_sheet_styles(example_name, sheet_name, gen_wb, ref_wb, findings=None, style_cache=None):
+    """Compare the font, fill, border and alignment of every cell of a sheet in two XlsxWorkbooks.
+
+    Styles are compared by the digests of their components, once per pair
+    of style ids; pass the same style_cache for every sheet of a workbook.
+    """
+    own_findings = findings is None
+    if own_findings:
+        findings = Findings(example_name)
+    if style_cache is None:
+        style_cache = {}
+    has_differences = False
+
+    gen_sheet, ref_sheet = gen_wb[sheet_name], ref_wb[sheet_name]
+    with RangeCollector(findings, lambda kind: f"{kind} mismatch in sheet '{sheet_name}'", details=False) as mismatches:
+        for row, col, gen_style, ref_style in iter_style_pairs(gen_sheet.cells, ref_sheet.cells):
+            if findings.exhausted:
+                break
+            for kind in compare_style_ids(gen_wb.styles, ref_wb.styles, gen_style, ref_style, style_cache):
+                if kind in COMPARED_STYLES:
+                    mismatches.add(row, col, kind)
+                    has_differences = True
+
+    if own_findings:
+        findings.flush()
+    return has_differences
+
+
+def styles_compared(example_name, ignore_styles):
+    """Only compare styles if explicitly requested and not a chartsheet example"""
+    return not ignore_styles and example_name != "chartsheet"
+
+
+def mark_autochecked(example_name, results_dir, project_root, passed, quiet=False):
+    """Create or remove the example's autochecked file, depending on whether its content check passed"""
+    # Create results directory if it doesn't exist
+    example_results_dir = results_dir / example_name
+    example_results_dir.mkdir(parents=True, exist_ok=True)
     
-    # Use the macro files if they exist, otherwise use the regular files
-    file_to_check = generated_macro_file if generated_macro_file.exists() else generated_file
-    ref_to_check = reference_macro_file if reference_macro_file.exists() else reference_file
+    # Create or remove autochecked file based on results
+    autochecked_file = example_results_dir / passed_autocheck_file
+    if passed:
+        autochecked_file.touch()
+        if not quiet:
+            print(f"✅ Created autochecked file at {get_relative_path(autochecked_file, project_root)}")
+    else:
+        if autochecked_file.exists():
+            autochecked_file.unlink()
+        if not quiet:
+            print(f"❌ Removed autochecked file due to differences")
+
+
+def compare_with_reference(example_name, reference_dir, results_dir, project_root, quiet=False, ignore_styles=False,
+                           generated=None, reference=None, styles=None, max_findings=None):
+    """Compare the generated Excel file with the reference file.
+
+    generated may be a path, the bytes of an xlsx file, a binary file
+    object or an XlsxArchive; by default the example's file in the current
+    directory is used. Cell values are compared straight from the sheet XML
+    through a shared-strings index, and styles through the lightweight
+    reader. styles may pass in already read (generated, reference)
+    XlsxWorkbooks to compare styles with. With max_findings set, the comparison
+    stops once that many mismatches are found.
+    """
+    file_to_check = resolve_generated(example_name, generated)
+    ref_to_check = resolve_reference(example_name, reference_dir, reference)
     
-    if not ref_to_check.exists():
-        print(f"[{example_name}] ⚠️ Reference file not found: {ref_to_check}")
+    if not source_exists(ref_to_check):
+        print(f"[{example_name}] ⚠️ Reference file not found: {source_label(ref_to_check)}")
         return False
     
+    findings = Findings(example_name, max_findings)
     try:
         has_differences = False
         
-        # Load both workbooks
-        gen_wb = openpyxl.load_workbook(file_to_check)
-        ref_wb = openpyxl.load_workbook(ref_to_check)
+        compare_styles = styles_compared(example_name, ignore_styles)
         
-        # Compare each sheet
-        for sheet_name in ref_wb.sheetnames:
-            if sheet_name not in gen_wb.sheetnames:
-                print(f"[{example_name}] ⚠️ Generated file is missing sheet: {sheet_name}")
-                has_differences = True
-                continue
+        with findings, open_archive(file_to_check) as gen_zip, open_archive(ref_to_check) as ref_zip:
+            # String ids are interned across both files so equal strings compare as equal ints
+            interner = StringInterner()
+            gen_strings = SharedStringsIndex(gen_zip, interner)
+            ref_strings = SharedStringsIndex(ref_zip, interner)
             
-            ref_sheet = ref_wb[sheet_name]
-            gen_sheet = gen_wb[sheet_name]
+            gen_sheets = {name: (part, kind) for name, part, kind in list_sheets(gen_zip)}
+            ref_sheets = {name: (part, kind) for name, part, kind in list_sheets(ref_zip)}
             
-            # Skip chartsheets as they don't have rows/cells
-            if isinstance(ref_sheet, openpyxl.chartsheet.Chartsheet) or isinstance(gen_sheet, openpyxl.chartsheet.Chartsheet):
-                continue
+            if compare_styles:
+                if styles is not None:
+                    gen_wb, ref_wb = styles
+                else:
+                    gen_wb, ref_wb = XlsxWorkbook(gen_zip), XlsxWorkbook(ref_zip)
+                style_cache = {}
             
-            # Get the maximum row and column numbers to check
-            max_row = max(ref_sheet.max_row, gen_sheet.max_row)
-            max_col = max(ref_sheet.max_column, gen_sheet.max_column)
-            
-            # Compare cell values
-            for row in range(1, max_row + 1):
-                for col in range(1, max_col + 1):
-                    ref_cell = ref_sheet.cell(row=row, column=col)
-                    gen_cell = gen_sheet.cell(row=row, column=col)
-                    
-                    # Compare values
-                    if ref_cell.value != gen_cell.value:
-                        print(f"[{example_name}] ⚠️ Value mismatch in sheet '{sheet_name}' at {ref_cell.coordinate}:")
-                        print(f"  Reference: {ref_cell.value}")
-                        print(f"  Generated: {gen_cell.value}")
+            # Compare each sheet
+            for sheet_name, (ref_part, ref_kind) in ref_sheets.items():
+                if findings.exhausted:
+                    break
+                if sheet_name not in gen_sheets:
+                    findings.warn(f"Generated file is missing sheet: {sheet_name}", details=False)
+                    has_differences = True
+                    continue
+                
+                gen_part, gen_kind = gen_sheets[sheet_name]
+                
+                # Skip chartsheets as they don't have rows/cells
+                if ref_kind != 'worksheet' or gen_kind != 'worksheet':
+                    continue
+                
+                # Compare cell values
+                with gen_zip.open(gen_part) as gen_stream, ref_zip.open(ref_part) as ref_stream:
+                    if compare_sheet_values(example_name, sheet_name, gen_stream, gen_strings,
+                                            ref_stream, ref_strings, interner, findings):
                         has_differences = True
-                    
-                    # Only compare styles if explicitly requested and not a chartsheet example
-                    if not ignore_styles and example_name != "chartsheet":
-                        if ref_cell.font != gen_cell.font:
-                            print(f"[{example_name}] ⚠️ Font mismatch in sheet '{sheet_name}' at {ref_cell.coordinate}")
-                            has_differences = True
-                        if ref_cell.fill != gen_cell.fill:
-                            print(f"[{example_name}] ⚠️ Fill mismatch in sheet '{sheet_name}' at {ref_cell.coordinate}")
-                            has_differences = True
-                        if ref_cell.border != gen_cell.border:
-                            print(f"[{example_name}] ⚠️ Border mismatch in sheet '{sheet_name}' at {ref_cell.coordinate}")
-                            has_differences = True
-                        if ref_cell.alignment != gen_cell.alignment:
-                            print(f"[{example_name}] ⚠️ Alignment mismatch in sheet '{sheet_name}' at {ref_cell.coordinate}")
-                            has_differences = True
-        
-        # Check for extra sheets in generated file
-        for sheet_name in gen_wb.sheetnames:
-            if sheet_name not in ref_wb.sheetnames:
-                print(f"[{example_name}] ⚠️ Generated file has extra sheet: {sheet_name}")
-                has_differences = True
+                
+                if compare_styles and not findings.exhausted:
+                    if compare_sheet_styles(example_name, sheet_name, gen_wb, ref_wb, findings, style_cache):
+                        has_differences = True
+            
+            # Check for extra sheets in generated file
+            for sheet_name in gen_sheets:
+                if sheet_name not in ref_sheets:
+                    findings.warn(f"Generated file has extra sheet: {sheet_name}", details=False)
+                    has_differences = True
+            
+            findings.stopped_note()
         
         # Report any differences found
         if has_differences:
@@ -99,23 +266,9 @@ def compare_with_reference(example_name, reference_dir, results_dir, project_roo
         else:
             if not quiet:
                 print("✅ Generated file matches reference file content" + 
-                     (" (ignoring styles)" if ignore_styles or example_name == "chartsheet" else ""))
-        
-        # Create results directory if it doesn't exist
-        example_results_dir = results_dir / example_name
-        example_results_dir.mkdir(parents=True, exist_ok=True)
+                     (" (ignoring styles)" if not compare_styles else ""))
         
-        # Create or remove autochecked file based on results
-        autochecked_file = example_results_dir / passed_autocheck_file
-        if not has_differences:
-            autochecked_file.touch()
-            if not quiet:
-                print(f"✅ Created autochecked file at {get_relative_path(autochecked_file, project_root)}")
-        else:
-            if autochecked_file.exists():
-                autochecked_file.unlink()
-            if not quiet:
-                print(f"❌ Removed autochecked file due to differences")
+        mark_autochecked(example_name, results_dir, project_root, not has_differences, quiet)
         
         return not has_differences
     
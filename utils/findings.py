@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Findings reporting for the autocheck tool.
+
+Checks that compare a workbook cell by cell or row by row report through
+a Findings writer instead of printing each mismatch. Mismatches are
+collected into rectangular ranges, so a shifted column is reported as one
+"A2:A50000 (49999 cells)" finding rather than as 49999 of them, and all
+lines are written out in one go when the check is done. A check can be
+given a budget of findings: once it is spent the check already knows it
+fails, so it stops scanning.
+"""
+
+import sys
+
+try:
+    from utils.xlsx_parts import column_letters
+except ModuleNotFoundError:
+    from xlsx_parts import column_letters
+
+
+class Findings:
+    """Buffered output of one check, with an optional budget of findings.
+
+    Every mismatch passed to count() uses up one finding of the budget;
+    exhausted tells the check to stop. Lines are kept until flush(), which
+    writes them to the current sys.stdout with a single write.
+    """
+
+    def __init__(self, example_name, max_findings=None):
+        self.example_name = example_name
+        self.max_findings = max_findings
+        self.found = 0
+        self._lines = []
+
+    @property
+    def exhausted(self):
+        return self.max_findings is not None and self.found >= self.max_findings
+
+    def count(self, number=1):
+        self.found += number
+
+    def warn(self, message, reference=None, generated=None, details=True):
+        """Add a "[example] ⚠️ message" line, followed by the reference and generated values if details is set"""
+        self._lines.append(f"[{self.example_name}] ⚠️ {message}")
+        if details:
+            self._lines.append(f"  Reference: {reference}")
+            self._lines.append(f"  Generated: {generated}")
+
+    def stopped_note(self):
+        """Note that the check stopped early, if it did"""
+        if self.exhausted:
+            self._lines.append(f"[{self.example_name}] ⚠️ Stopped after {self.found} findings (--max-findings)")
+
+    def flush(self):
+        if self._lines:
+            sys.stdout.write("\n".join(self._lines) + "\n")
+            self._lines.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.flush()
+
+
+def cell_range(first_row, first_col, last_row, last_col):
+    """Format a cell or a rectangle of cells, e.g. A2 or A2:C9"""
+    first = f"{column_letters(first_col)}{first_row}"
+    if (first_row, first_col) == (last_row, last_col):
+        return first
+    return f"{first}:{column_letters(last_col)}{last_row}"
+
+
+def row_range(first_row, first_col, last_row, last_col):
+    """Format a row or a run of rows, e.g. row 2 or rows 2:9"""
+    return f"row {first_row}" if first_row == last_row else f"rows {first_row}:{last_row}"
+
+
+class RangeCollector:
+    """Collects mismatches, given in row-major order, into rectangular ranges.
+
+    Consecutive mismatches of the same kind within a row form a run, and
+    runs over the same columns in consecutive rows are merged into one
+    rectangle. Each range is reported once it can no longer grow, with the
+    reference and generated values of its first cell as a sample.
+    """
+
+    def __init__(self, findings, message, location=cell_range, unit="cells", details=True):
+        """message(kind) names a mismatch kind, e.g. "Value mismatch in sheet 'Sheet1'"."""
+        self.findings = findings
+        self.message = message
+        self.location = location
+        self.unit = unit
+        self.details = details
+        self._row = None
+        # Runs in the current row: [first_col, last_col, kind, sample], and the latest one of each kind
+        self._runs = []
+        self._last_run = {}
+        # Open rectangles by (first_col, last_col, kind): [first_row, last_row, sample]
+        self._open = {}
+
+    def add(self, row, col, kind, reference=None, generated=None):
+        self.findings.count()
+        if row != self._row:
+            self._end_row()
+            self._row = row
+        run = self._last_run.get(kind)
+        if run is not None and run[1] == col - 1:
+            run[1] = col
+            return
+        run = [col, col, kind, (reference, generated)]
+        self._runs.append(run)
+        self._last_run[kind] = run
+
+    def _end_row(self):
+        if self._row is None:
+            return
+        for first_col, last_col, kind, sample in self._runs:
+            key = (first_col, last_col, kind)
+            rectangle = self._open.get(key)
+            if rectangle is not None and rectangle[1] == self._row - 1:
+                rectangle[1] = self._row
+            else:
+                if rectangle is not None:
+                    self._report(key, rectangle)
+                self._open[key] = [self._row, self._row, sample]
+        self._runs = []
+        self._last_run = {}
+        # Rectangles that did not continue into this row are complete
+        for key, rectangle in list(self._open.items()):
+            if rectangle[1] != self._row:
+                self._report(key, rectangle)
+                del self._open[key]
+
+    def _report(self, key, rectangle):
+        first_col, last_col, kind = key
+        first_row, last_row, (reference, generated) = rectangle
+        where = self.location(first_row, first_col, last_row, last_col)
+        size = (last_row - first_row + 1) * (last_col - first_col + 1)
+        if size == 1:
+            message = f"{self.message(kind)} at {where}"
+        else:
+            first = self.location(first_row, first_col, first_row, first_col)
+            message = f"{self.message(kind)} at {where} ({size} {self.unit}), first at {first}"
+        self.findings.warn(message + (":" if self.details else ""), reference, generated, details=self.details)
+
+    def close(self):
+        """Report every range still open"""
+        self._end_row()
+        self._row = None
+        for key, rectangle in sorted(self._open.items(), key=lambda item: (item[1][0], item[0][0])):
+            self._report(key, rectangle)
+        self._open.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
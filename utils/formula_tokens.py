@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Formula normalization for the autocheck tool.
+
+Formulas are compared by a normalized syntax tree instead of by their text,
+so formulas that Excel treats as the same compare equal even when they are
+written differently: future-function prefixes such as _xlfn., _xlws. and
+_xlpm. (used by dynamic array and LAMBDA formulas) are dropped, function
+and reference names are upper-cased, numbers are compared by value and
+insignificant whitespace is ignored. Trees are memoized by formula text,
+so a formula repeated down a column is only parsed once.
+
+Shared formulas are expanded lazily: a cell that only refers to the master
+formula of its <f t="shared" si="..."> group is kept as a SharedFormula and
+only translated to its own text when it has to be displayed or when it is
+compared with a formula that is not from an equivalent group.
+"""
+
+import re
+import functools
+
+from openpyxl.formula import Tokenizer
+from openpyxl.formula.tokenizer import Token
+from openpyxl.formula.translate import Translator
+
+try:
+    from utils.xlsx_parts import column_letters
+except ModuleNotFoundError:
+    from xlsx_parts import column_letters
+
+FUTURE_PREFIX = re.compile(r'_xl(?:fn|ws|pm)\.', re.IGNORECASE)
+
+# Formulas kept by the caches; a column of distinct formulas larger than this
+# is still correct, only parsed again
+CACHE_SIZE = 8192
+
+
+def strip_prefixes(text):
+    """Remove the _xlfn., _xlws. and _xlpm. prefixes Excel adds to newer function and parameter names"""
+    return FUTURE_PREFIX.sub('', text)
+
+
+def _operand(token):
+    if token.subtype == Token.NUMBER:
+        try:
+            return ('num', float(token.value))
+        except ValueError:
+            return ('num', token.value)
+    if token.subtype == Token.TEXT:
+        return ('text', token.value)
+    return (token.subtype.lower(), strip_prefixes(token.value).upper())
+
+
+def _is_intersection(items, index):
+    """A space between two operands is Excel's intersection operator, not whitespace"""
+    if index == 0 or index + 1 >= len(items):
+        return False
+    before, after = items[index - 1], items[index + 1]
+    return (before.type == Token.OPERAND or before.subtype == Token.CLOSE) and \
+           (after.type == Token.OPERAND or after.subtype == Token.OPEN)
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def normalize_formula(text):
+    """Return the normalized syntax tree of a formula as nested tuples.
+
+    Calls are ('call', NAME, arguments), parentheses ('group', items) and
+    array constants ('array', rows); each argument, item list and row is a
+    tuple of nodes. Text that cannot be tokenized normalizes to
+    ('raw', text), which only equals the same text.
+    """
+    if text is None:
+        return None
+    try:
+        items = Tokenizer(text if text.startswith('=') else f"={text}").items
+    except Exception:
+        return ('raw', text)
+
+    # Each open node is [kind, name, finished parts, current part]
+    stack = [['root', None, [], []]]
+    for index, token in enumerate(items):
+        node = stack[-1]
+        if token.type == Token.WSPACE:
+            if _is_intersection(items, index):
+                node[3].append(('op', ' '))
+        elif token.type == Token.OPERAND:
+            node[3].append(_operand(token))
+        elif token.subtype == Token.OPEN:
+            if token.type == Token.FUNC:
+                stack.append(['call', strip_prefixes(token.value[:-1]).upper(), [], []])
+            else:
+                stack.append(['array' if token.type == Token.ARRAY else 'group', None, [], []])
+        elif token.subtype == Token.CLOSE:
+            if len(stack) == 1:
+                return ('raw', text)
+            kind, name, parts, current = stack.pop()
+            if kind == 'group':
+                tree = ('group', tuple(current))
+            else:
+                # An empty argument list is no arguments, not one empty argument
+                if current or parts:
+                    parts.append(tuple(current))
+                tree = (kind, name, tuple(parts)) if kind == 'call' else (kind, tuple(parts))
+            stack[-1][3].append(tree)
+        elif token.type == Token.SEP:
+            if node[0] == 'array' and token.subtype == Token.ROW:
+                node[2].append(('row',) + tuple(node[3]))
+            else:
+                node[2].append(tuple(node[3]))
+            node[3] = []
+        else:
+            node[3].append(('op', token.value))
+
+    if len(stack) != 1:
+        return ('raw', text)
+    return tuple(stack[0][3])
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def translate_shared(master_text, origin_row, origin_col, row, col):
+    """Translate the master formula of a shared group to the text it has at another cell"""
+    origin = f"{column_letters(origin_col)}{origin_row}"
+    return Translator(f"={master_text}", origin=origin).translate_formula(f"{column_letters(col)}{row}")[1:]
+
+
+class SharedFormula:
+    """A cell of a shared formula group, whose own text is only worked out when it is needed"""
+
+    __slots__ = ('master', 'origin_row', 'origin_col', 'row', 'col')
+
+    def __init__(self, master, origin_row, origin_col, row, col):
+        self.master = master
+        self.origin_row = origin_row
+        self.origin_col = origin_col
+        self.row = row
+        self.col = col
+
+    @property
+    def offset(self):
+        return (self.row - self.origin_row, self.col - self.origin_col)
+
+    @property
+    def text(self):
+        return translate_shared(self.master, self.origin_row, self.origin_col, self.row, self.col)
+
+    def __repr__(self):
+        return f"SharedFormula({self.text!r})"
+
+
+def formula_text(formula):
+    """The text of a formula given either as text or as a SharedFormula"""
+    return formula.text if isinstance(formula, SharedFormula) else formula
+
+
+def formulas_equal(gen_formula, ref_formula):
+    """Compare two formulas, given as text or SharedFormula, by their normalized trees.
+
+    Two cells of shared groups at the same offset from equivalent masters
+    are equal without translating either of them.
+    """
+    if isinstance(gen_formula, SharedFormula) and isinstance(ref_formula, SharedFormula):
+        if gen_formula.offset == ref_formula.offset and \
+                normalize_formula(gen_formula.master) == normalize_formula(ref_formula.master):
+            return True
+    gen_text, ref_text = formula_text(gen_formula), formula_text(ref_formula)
+    return gen_text == ref_text or normalize_formula(gen_text) == normalize_formula(ref_text)
+
+
+def expand_formula(formula, row, col, shared_masters, lazy=False):
+    """Return the (formula, array range) of a cell's formula.
+
+    Shared formulas are expanded from their master, which is remembered in
+    shared_masters when it is seen; with lazy, the cells that refer to a
+    master are returned as SharedFormula and only translated when their
+    text is needed. Array range is None for other formulas.
+    """
+    text, attrs = formula
+    if attrs.get('t') == 'shared':
+        si = attrs.get('si')
+        if text:
+            shared_masters[si] = (text, row, col)
+        elif si in shared_masters:
+            text = SharedFormula(*shared_masters[si], row, col)
+            if not lazy:
+                text = text.text
+    array_ref = attrs.get('ref') if attrs.get('t') == 'array' else None
+    return text, array_ref
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Per-part size analysis for the autocheck tool.
+
+Sizes and compression methods are read from the zip central directory
+only, so no part is decompressed. Each part of a generated workbook is
+compared with the same part of its reference and held to a byte budget:
+a part may only grow past the reference by its budget's percentage plus a
+fixed slack, so bloat in styles.xml or sharedStrings.xml shows up in the
+checks rather than in download sizes.
+
+Common usage:
+  python3 utils/part_sizes.py hello.xlsx testing/reference-xls/hello.xlsx   # Compare two workbooks part by part
+  python3 utils/part_sizes.py hello.xlsx                                    # Sizes of one workbook
+"""
+
+import sys
+import fnmatch
+import argparse
+import collections
+import zipfile
+from pathlib import Path
+
+# Add the project root to sys.path to allow imports to work both when run as a module
+# and directly
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+try:
+    from utils.xlsx_source import open_archive
+except ModuleNotFoundError:
+    from xlsx_source import open_archive
+
+PartSize = collections.namedtuple('PartSize', ['compressed', 'uncompressed', 'method'])
+
+# Byte budgets as (pattern, allowed growth in percent, slack in bytes), first match wins.
+# The budget applies to the uncompressed size, relative to the reference part.
+PART_BUDGETS = [
+    ('xl/styles.xml', 5, 256),
+    ('xl/sharedStrings.xml', 5, 256),
+    ('xl/worksheets/*.xml', 10, 1024),
+    ('xl/media/*', 0, 0),
+    ('*.bin', 0, 0),
+    ('*', 25, 1024),
+]
+
+METHOD_NAMES = {
+    zipfile.ZIP_STORED: "stored",
+    zipfile.ZIP_DEFLATED: "deflated",
+    zipfile.ZIP_BZIP2: "bzip2",
+    zipfile.ZIP_LZMA: "lzma",
+}
+
+
+def part_sizes(xlsx_zip):
+    """Return {part name: PartSize} from the central directory of an archive"""
+    return {info.filename: PartSize(info.compress_size, info.file_size, info.compress_type)
+            for info in xlsx_zip.infolist()}
+
+
+def part_budget(name, budgets=PART_BUDGETS):
+    """Return the (percent, slack) budget for a part"""
+    for pattern, percent, slack in budgets:
+        if fnmatch.fnmatchcase(name, pattern):
+            return percent, slack
+    return None
+
+
+def method_name(method):
+    return METHOD_NAMES.get(method, f"method {method}")
+
+
+def compare_part_sizes(gen_sizes, ref_sizes, budgets=PART_BUDGETS):
+    """Compare the parts both workbooks have and return a list of problems as strings.
+
+    A part is over budget when its uncompressed size exceeds the reference's
+    by more than the budget allows. Parts stored with a different
+    compression method than the reference are reported as well.
+    """
+    problems = []
+    for name in sorted(set(gen_sizes) & set(ref_sizes)):
+        gen, ref = gen_sizes[name], ref_sizes[name]
+        budget = part_budget(name, budgets)
+        if budget is not None:
+            percent, slack = budget
+            limit = ref.uncompressed + ref.uncompressed * percent // 100 + slack
+            if gen.uncompressed > limit:
+                problems.append(f"{name} is {gen.uncompressed} bytes, over its budget of {limit} "
+                                f"(reference {ref.uncompressed} bytes + {percent}% + {slack})")
+        if gen.method != ref.method:
+            problems.append(f"{name} is {method_name(gen.method)}, reference is {method_name(ref.method)}")
+    return problems
+
+
+def largest_changes(gen_sizes, ref_sizes, count=3):
+    """Return the parts whose compressed size changed most, as (name, change in bytes)"""
+    changes = []
+    for name in set(gen_sizes) | set(ref_sizes):
+        gen = gen_sizes[name].compressed if name in gen_sizes else 0
+        ref = ref_sizes[name].compressed if name in ref_sizes else 0
+        if gen != ref:
+            changes.append((name, gen - ref))
+    changes.sort(key=lambda change: -abs(change[1]))
+    return changes[:count]
+
+
+def print_size_table(gen_sizes, ref_sizes=None):
+    """Print every part with its sizes and, given a reference, the change per part"""
+    names = sorted(set(gen_sizes) | set(ref_sizes or {}))
+    if ref_sizes is None:
+        print(f"{'PART':<40} {'COMPRESSED':>11} {'SIZE':>11} METHOD")
+    else:
+        print(f"{'PART':<40} {'COMPRESSED':>11} {'SIZE':>11} {'REF SIZE':>11} {'CHANGE':>9} METHOD")
+    print("-" * 100)
+    for name in names:
+        gen = gen_sizes.get(name)
+        ref = (ref_sizes or {}).get(name)
+        compressed = str(gen.compressed) if gen else "-"
+        size = str(gen.uncompressed) if gen else "-"
+        method = method_name(gen.method) if gen else method_name(ref.method)
+        if ref_sizes is None:
+            print(f"{name:<40} {compressed:>11} {size:>11} {method}")
+            continue
+        ref_size = str(ref.uncompressed) if ref else "-"
+        if gen and ref:
+            change = f"{gen.uncompressed - ref.uncompressed:+d}"
+        else:
+            change = "added" if gen else "missing"
+        print(f"{name:<40} {compressed:>11} {size:>11} {ref_size:>11} {change:>9} {method}")
+
+    total_compressed = sum(size.compressed for size in gen_sizes.values())
+    total = sum(size.uncompressed for size in gen_sizes.values())
+    print("-" * 100)
+    print(f"{'Total':<40} {total_compressed:>11} {total:>11}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show the size of every part of a workbook, compared with a reference")
+    parser.add_argument("workbook", help="Workbook to analyse")
+    parser.add_argument("reference", nargs="?", help="Reference workbook to compare with and hold to the budgets")
+
+    args = parser.parse_args()
+
+    try:
+        with open_archive(Path(args.workbook)) as gen_zip:
+            gen_sizes = part_sizes(gen_zip)
+        ref_sizes = None
+        if args.reference:
+            with open_archive(Path(args.reference)) as ref_zip:
+                ref_sizes = part_sizes(ref_zip)
+    except (OSError, zipfile.BadZipFile) as e:
+        print(f"Error: {e}")
+        return 1
+
+    print_size_table(gen_sizes, ref_sizes)
+
+    if ref_sizes is None:
+        return 0
+    problems = compare_part_sizes(gen_sizes, ref_sizes)
+    if problems:
+        print()
+        for problem in problems:
+            print(f"⚠️ {problem}")
+        return 1
+    print("\n✅ All parts are within their budgets")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
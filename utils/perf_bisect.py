@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Find the commit that made an example slower or its output bigger.
+
+A metric is either the run time of an example binary or the uncompressed
+size of a part of the workbook it writes. `git bisect run` is driven in a
+temporary git worktree, so the working tree you are in is never touched.
+At each step the example is built and the metric measured; run times are
+measured repeatedly and judged by their median, and more runs are taken
+while the median is within the noise of the threshold. Commits that do not
+build are skipped.
+
+Common usage:
+  python3 utils/perf_bisect.py --good v0.3.0 --metric time:chart_working_with_example --threshold 0.25
+  python3 utils/perf_bisect.py --good HEAD~40 --metric size:chart_area:xl/styles.xml --threshold 4096
+  python3 utils/perf_bisect.py measure --metric time:hello --threshold 0.05   # Judge the current checkout once
+"""
+
+import os
+import sys
+import argparse
+import tempfile
+import statistics
+import subprocess
+from pathlib import Path
+
+# Add the project root to sys.path to allow imports to work both when run as a module
+# and directly
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+try:
+    from utils.example_runner import build_example, run_monitored
+    from utils.part_sizes import part_sizes
+    from utils.xlsx_source import open_archive
+except ModuleNotFoundError:
+    from example_runner import build_example, run_monitored
+    from part_sizes import part_sizes
+    from xlsx_source import open_archive
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+# Exit codes understood by `git bisect run`
+GOOD, BAD, SKIP, ABORT = 0, 1, 125, 128
+
+DEFAULT_REPEAT = 5
+MAX_REPEAT = 15
+
+
+def parse_metric(metric):
+    """Split a metric into (kind, example name, part); part is only set for size metrics"""
+    kind, _, rest = metric.partition(':')
+    if kind == 'time' and rest:
+        return kind, rest, None
+    example_name, _, part = rest.partition(':')
+    if kind == 'size' and example_name and part:
+        return kind, example_name, part
+    raise ValueError(f"Unknown metric '{metric}': use time:<example> or size:<example>:<part>")
+
+
+def run_once(example_bin, run_dir):
+    """Run an example binary in run_dir and return its stats, or None if it failed.
+
+    The wall time in the stats is taken when the monitor's blocking wait
+    returns, not when a poll notices the exit, so short runs are not
+    rounded up to the sampling interval.
+    """
+    stats, _, _ = run_monitored([str(example_bin)], cwd=run_dir)
+    return stats if stats.returncode == 0 else None
+
+
+def measure_size(example_bin, run_dir, part):
+    if run_once(example_bin, run_dir) is None:
+        return None
+    for path in sorted(Path(run_dir).iterdir()):
+        if path.suffix in ('.xlsx', '.xlsm'):
+            with open_archive(path) as xlsx_zip:
+                size = part_sizes(xlsx_zip).get(part)
+            return size.uncompressed if size else 0
+    return None
+
+
+def judge_times(example_bin, run_dir, threshold, repeat=DEFAULT_REPEAT, max_repeat=MAX_REPEAT):
+    """Time repeated runs and return (median, is_bad), or (None, None) if a run failed.
+
+    The median is compared with the threshold once it is further from it
+    than the median absolute deviation of the runs; while it is not, more
+    runs are taken, up to max_repeat.
+    """
+    times = []
+    while True:
+        while len(times) < repeat:
+            stats = run_once(example_bin, run_dir)
+            if stats is None:
+                return None, None
+            times.append(stats.wall_time)
+        median = statistics.median(times)
+        spread = statistics.median(abs(time - median) for time in times)
+        if abs(median - threshold) > spread or len(times) >= max_repeat:
+            return median, median > threshold
+        repeat = min(len(times) + DEFAULT_REPEAT, max_repeat)
+
+
+def measure(metric, threshold, repeat=DEFAULT_REPEAT, project_root=None):
+    """Build and measure the checkout in project_root (default: the current directory).
+
+    Returns GOOD, BAD or SKIP, or ABORT when nothing can be built at all.
+    """
+    kind, example_name, part = parse_metric(metric)
+    project_root = Path(project_root or Path.cwd())
+    try:
+        built = build_example(example_name, project_root, quiet=True)
+    except OSError as e:
+        print(f"❌ Cannot build examples: {e}")
+        return ABORT
+    if not built:
+        print(f"⚠️ {example_name} does not build here, skipping")
+        return SKIP
+    example_bin = project_root / "zig-out" / "bin" / example_name
+
+    with tempfile.TemporaryDirectory(prefix="perf-bisect-") as run_dir:
+        if kind == 'size':
+            value = measure_size(example_bin, run_dir, part)
+            is_bad = value is not None and value > threshold
+        else:
+            value, is_bad = judge_times(example_bin, run_dir, threshold, repeat)
+
+    if value is None:
+        print(f"⚠️ {example_name} did not run or write a workbook here, skipping")
+        return SKIP
+    print(f"{metric} = {value:.4g} ({'over' if is_bad else 'within'} the threshold of {threshold:g})")
+    return BAD if is_bad else GOOD
+
+
+def git(*args, cwd=PROJECT_ROOT, check=True):
+    return subprocess.run(["git", *args], cwd=cwd, check=check, capture_output=True, text=True)
+
+
+def bisect(good, bad, metric, threshold, repeat):
+    """Bisect between good and bad in a temporary worktree; return the first bad commit or None"""
+    with tempfile.TemporaryDirectory(prefix="perf-bisect-worktree-") as scratch:
+        worktree = Path(scratch) / "tree"
+        git("worktree", "add", "--detach", str(worktree), bad)
+        try:
+            git("bisect", "start", bad, good, cwd=worktree)
+            # This script is run from the tree it was started from, so every step uses the same measurement
+            # Its output is streamed as the bisect goes, and kept to find the verdict
+            process = subprocess.Popen(
+                ["git", "bisect", "run", sys.executable, str(Path(__file__).resolve()), "measure",
+                 "--metric", metric, "--threshold", str(threshold), "--repeat", str(repeat)],
+                cwd=worktree, env=dict(os.environ, PYTHONUNBUFFERED="1"),
+                stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+            found = False
+            for line in process.stdout:
+                print(line, end="", flush=True)
+                found = found or "is the first bad commit" in line
+            found = process.wait() == 0 and found
+            first_bad = git("rev-parse", "--verify", "-q", "refs/bisect/bad", cwd=worktree, check=False).stdout.strip()
+            git("bisect", "reset", cwd=worktree, check=False)
+            return first_bad if found else None
+        finally:
+            git("worktree", "remove", "--force", str(worktree), check=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bisect the commit that pushed a metric over a threshold")
+    parser.add_argument("command", nargs="?", choices=["bisect", "measure"], default="bisect",
+                        help="bisect (default) or measure the current checkout for git bisect run")
+    parser.add_argument("--metric", required=True,
+                        help="time:<example> for the run time in seconds, size:<example>:<part> for a part's size in bytes")
+    parser.add_argument("--threshold", type=float, required=True, help="Values above this are bad")
+    parser.add_argument("--good", help="A commit where the metric is within the threshold")
+    parser.add_argument("--bad", default="HEAD", help="A commit where the metric is over the threshold (default: HEAD)")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT,
+                        help=f"Runs per measurement of a time metric (default: {DEFAULT_REPEAT})")
+
+    args = parser.parse_args()
+
+    try:
+        parse_metric(args.metric)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 1
+
+    if args.command == "measure":
+        return measure(args.metric, args.threshold, args.repeat)
+
+    if not args.good:
+        print("Error: --good is required to bisect")
+        return 1
+    try:
+        first_bad = bisect(args.good, args.bad, args.metric, args.threshold, args.repeat)
+    except subprocess.CalledProcessError as e:
+        print(f"Error: git {' '.join(e.cmd[1:])} failed: {e.stderr.strip()}")
+        return 1
+    if first_bad is None:
+        print("❌ Bisect did not find a first bad commit")
+        return 1
+    print(f"\nFirst bad commit: {git('log', '-1', '--format=%h %s', first_bad).stdout.strip()}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
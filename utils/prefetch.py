@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Prefetching of example workbooks for the autocheck tool.
+
+While the checks of one example run, background threads read the generated
+and reference workbooks of the next few examples into memory and inflate
+their XML parts, so the checks find them ready instead of waiting for the
+disk and for zlib. Reading and decompressing release the GIL, so this
+overlaps well with the checks; only a bounded number of examples is held
+ahead at any time.
+"""
+
+import collections
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from utils.xlsx_source import XlsxArchive, generated_path, reference_path
+except ModuleNotFoundError:
+    from xlsx_source import XlsxArchive, generated_path, reference_path
+
+# Examples opened ahead of the one being checked
+DEFAULT_DEPTH = 2
+
+PrefetchedSources = collections.namedtuple('PrefetchedSources', ['generated', 'reference'])
+
+
+def _open_inflated(path):
+    archive = XlsxArchive(path, preload=True)
+    try:
+        archive.inflate()
+    except BaseException:
+        archive.close()
+        raise
+    return archive
+
+
+def load_example_sources(example_name, reference_dir):
+    """Open an example's generated and reference workbooks in memory.
+
+    Either is None when its file does not exist.
+    """
+    generated_file = generated_path(example_name)
+    reference_file = reference_path(example_name, reference_dir)
+    generated = _open_inflated(generated_file) if generated_file.exists() else None
+    try:
+        reference = _open_inflated(reference_file) if reference_file.exists() else None
+    except BaseException:
+        if generated is not None:
+            generated.close()
+        raise
+    return PrefetchedSources(generated, reference)
+
+
+class ExamplePrefetcher:
+    """Opens the workbooks of a known sequence of examples ahead of time.
+
+    Examples are loaded in order, at most depth of them ahead of the one
+    taken last. take() hands over an example's sources, waiting for them if
+    they are not ready yet; the caller closes them. Errors raised while
+    loading are raised again from take().
+    """
+
+    def __init__(self, example_names, reference_dir, depth=DEFAULT_DEPTH):
+        self.reference_dir = reference_dir
+        self.depth = max(1, depth)
+        self._pending = collections.deque(example_names)
+        self._loading = collections.OrderedDict()
+        self._pool = ThreadPoolExecutor(max_workers=self.depth, thread_name_prefix="prefetch")
+        self._fill()
+
+    def _fill(self):
+        while self._pending and len(self._loading) < self.depth:
+            example_name = self._pending.popleft()
+            self._loading[example_name] = self._pool.submit(load_example_sources, example_name, self.reference_dir)
+
+    def take(self, example_name):
+        """Return the PrefetchedSources of an example"""
+        future = self._loading.pop(example_name, None)
+        if future is None:
+            # Not scheduled (anymore), e.g. taken out of order: load it now
+            if example_name in self._pending:
+                self._pending.remove(example_name)
+            self._fill()
+            return load_example_sources(example_name, self.reference_dir)
+        self._fill()
+        return future.result()
+
+    def skip(self, example_name):
+        """Drop an example that will not be taken, closing anything already loaded for it"""
+        if example_name in self._pending:
+            self._pending.remove(example_name)
+        future = self._loading.pop(example_name, None)
+        if future is not None:
+            _discard(future)
+        self._fill()
+
+    def close(self):
+        self._pending.clear()
+        for future in self._loading.values():
+            _discard(future)
+        self._loading.clear()
+        self._pool.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _discard(future):
+    if future.cancel():
+        return
+    try:
+        sources = future.result()
+    except Exception:
+        return
+    for archive in sources:
+        if archive is not None:
+            archive.close()
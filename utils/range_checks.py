@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Range-scoped rule comparison for the autocheck tool.
+
+Conditional formats, data validations, merged ranges and autofilters are all
+stored as rules that cover one or more rectangles (the sqref/ref attributes).
+Rather than expanding those rectangles into individual cells, each sheet's
+rules are kept as rectangle lists and compared with a row sweep, so the cost
+depends on the number of ranges and not on the number of cells they cover.
+"""
+
+import heapq
+import xml.etree.ElementTree as ET
+
+try:
+    from utils.xlsx_parts import NS, qname, parse_sqref, format_range_ref, list_sheets, canonical_xml
+    from utils.xlsx_source import resolve_generated, resolve_reference, open_archive, source_exists, source_label
+except ModuleNotFoundError:
+    from xlsx_parts import NS, qname, parse_sqref, format_range_ref, list_sheets, canonical_xml
+    from xlsx_source import resolve_generated, resolve_reference, open_archive, source_exists, source_label
+
+# Rule kinds whose ranges must never overlap each other within one sheet
+NON_OVERLAPPING_KINDS = ('mergeCell', 'dataValidation')
+
+
+def _rule_label(kind, element):
+    """Build a short human readable description of a rule element"""
+    if kind == 'mergeCell':
+        return "merged range"
+    if kind == 'autoFilter':
+        return "autofilter"
+
+    parts = [element.get('type', '')]
+    if element.get('operator'):
+        parts.append(element.get('operator'))
+    formulas = [child.text or "" for child in element
+                if child.tag in (qname('s', 'formula'), qname('s', 'formula1'), qname('s', 'formula2'))]
+    if formulas:
+        parts.append(", ".join(formulas))
+    return f"{kind} {' '.join(part for part in parts if part)}"
+
+
+def _rule_signature(element, range_attr):
+    """Canonical form of a rule element with its range attribute removed"""
+    stripped = ET.Element(element.tag, {key: value for key, value in element.attrib.items() if key != range_attr})
+    stripped.text = element.text
+    stripped.extend(list(element))
+    return canonical_xml(stripped)
+
+
+def read_range_rules(xlsx_zip, sheet_part):
+    """Read the range-scoped rules of one worksheet.
+
+    Returns {(kind, signature): (label, [rectangles])}. Rows are cleared as
+    they are parsed, so sheetData never has to be held in memory.
+    """
+    rules = {}
+
+    def add(kind, signature, label, rects):
+        entry = rules.setdefault((kind, signature), (label, []))
+        entry[1].extend(rects)
+
+    with xlsx_zip.open(sheet_part) as file:
+        for _, element in ET.iterparse(file, events=('end',)):
+            tag = element.tag
+            if tag == qname('s', 'row'):
+                element.clear()
+            elif tag == qname('s', 'conditionalFormatting'):
+                rects = parse_sqref(element.get('sqref'))
+                for rule in element.findall('s:cfRule', NS):
+                    add('conditionalFormatting', _rule_signature(rule, None),
+                        _rule_label('conditionalFormatting', rule), rects)
+            elif tag == qname('s', 'dataValidation'):
+                add('dataValidation', _rule_signature(element, 'sqref'),
+                    _rule_label('dataValidation', element), parse_sqref(element.get('sqref')))
+            elif tag == qname('s', 'mergeCell'):
+                add('mergeCell', '', _rule_label('mergeCell', element), parse_sqref(element.get('ref')))
+            elif tag == qname('s', 'autoFilter'):
+                add('autoFilter', _rule_signature(element, 'ref'),
+                    _rule_label('autoFilter', element), parse_sqref(element.get('ref')))
+    return rules
+
+
+def _bands(rects, bounds):
+    """Split the union of rectangles into row bands on the given boundaries.
+
+    bounds is a sorted list of row numbers that includes every r1 and r2 + 1
+    of the rectangles. Returns {band start row: merged column intervals}.
+    """
+    by_start = sorted(rects)
+    active = []  # heap of (row2, col1, col2)
+    bands = {}
+    next_rect = 0
+
+    for band_start in bounds[:-1]:
+        while next_rect < len(by_start) and by_start[next_rect][0] <= band_start:
+            row1, col1, row2, col2 = by_start[next_rect]
+            heapq.heappush(active, (row2, col1, col2))
+            next_rect += 1
+        while active and active[0][0] < band_start:
+            heapq.heappop(active)
+        if not active:
+            continue
+
+        merged = []
+        for col1, col2 in sorted((col1, col2) for _, col1, col2 in active):
+            if merged and col1 <= merged[-1][1] + 1:
+                merged[-1][1] = max(merged[-1][1], col2)
+            else:
+                merged.append([col1, col2])
+        bands[band_start] = merged
+    return bands
+
+
+def _subtract_intervals(intervals, removed):
+    """Subtract one sorted list of column intervals from another"""
+    result = []
+    index = 0
+    for col1, col2 in intervals:
+        start = col1
+        while index < len(removed) and removed[index][1] < start:
+            index += 1
+        scan = index
+        while scan < len(removed) and removed[scan][0] <= col2:
+            if removed[scan][0] > start:
+                result.append((start, removed[scan][0] - 1))
+            start = max(start, removed[scan][1] + 1)
+            scan += 1
+        if start <= col2:
+            result.append((start, col2))
+    return result
+
+
+def coverage_difference(rects, removed):
+    """Return the part of rects not covered by removed, as disjoint rectangles"""
+    if not rects:
+        return []
+    bounds = sorted({rect[0] for rect in rects + removed} | {rect[2] + 1 for rect in rects + removed})
+    bands = _bands(rects, bounds)
+    removed_bands = _bands(removed, bounds) if removed else {}
+
+    # Collapse consecutive bands with identical leftovers back into rectangles
+    open_rects = {}
+    result = []
+    for band_start in bounds[:-1]:
+        leftover = _subtract_intervals(bands.get(band_start, []), removed_bands.get(band_start, []))
+        still_open = {}
+        for interval in leftover:
+            still_open[interval] = open_rects.pop(interval, band_start)
+        for (col1, col2), row1 in open_rects.items():
+            result.append((row1, col1, band_start - 1, col2))
+        open_rects = still_open
+    for (col1, col2), row1 in open_rects.items():
+        result.append((row1, col1, bounds[-1] - 1, col2))
+    return sorted(result)
+
+
+def find_overlaps(rects):
+    """Find pairs of rectangles that share at least one cell, using a row sweep"""
+    overlaps = []
+    active = []  # rectangles whose row span may still reach the current row
+    for rect in sorted(rects):
+        active = [other for other in active if other[2] >= rect[0]]
+        for other in active:
+            if other[1] <= rect[3] and rect[1] <= other[3]:
+                overlaps.append((other, rect))
+        active.append(rect)
+    return overlaps
+
+
+def _cell_count(rects):
+    return sum((row2 - row1 + 1) * (col2 - col1 + 1) for row1, col1, row2, col2 in rects)
+
+
+def _format_rects(rects, limit=5):
+    labels = [format_range_ref(rect) for rect in rects[:limit]]
+    if len(rects) > limit:
+        labels.append(f"... {len(rects) - limit} more")
+    return " ".join(labels)
+
+
+def compare_range_rules(example_name, sheet_name, gen_rules, ref_rules):
+    """Compare the rule coverage of one sheet and print any findings"""
+    has_differences = False
+
+    for key in sorted(ref_rules.keys() | gen_rules.keys()):
+        label = (ref_rules.get(key) or gen_rules[key])[0]
+        gen_rects = gen_rules.get(key, (label, []))[1]
+        ref_rects = ref_rules.get(key, (label, []))[1]
+
+        missing = coverage_difference(ref_rects, gen_rects)
+        extra = coverage_difference(gen_rects, ref_rects)
+        if missing:
+            print(f"[{example_name}] ⚠️ Missing {label} coverage in sheet '{sheet_name}': "
+                  f"{_format_rects(missing)} ({_cell_count(missing)} cells)")
+            has_differences = True
+        if extra:
+            print(f"[{example_name}] ⚠️ Extra {label} coverage in sheet '{sheet_name}': "
+                  f"{_format_rects(extra)} ({_cell_count(extra)} cells)")
+            has_differences = True
+
+    for kind in NON_OVERLAPPING_KINDS:
+        gen_rects = [rect for (rule_kind, _), (_, rects) in gen_rules.items() if rule_kind == kind for rect in rects]
+        for first, second in find_overlaps(gen_rects):
+            print(f"[{example_name}] ⚠️ Overlapping {kind} ranges in sheet '{sheet_name}': "
+                  f"{format_range_ref(first)} and {format_range_ref(second)}")
+            has_differences = True
+
+    return has_differences
+
+
+def check_range_rules(example_name, reference_dir, generated=None, reference=None):
+    """Check that conditional formats, validations, merges and autofilters match the reference"""
+    file_to_check = resolve_generated(example_name, generated)
+    ref_to_check = resolve_reference(example_name, reference_dir, reference)
+
+    if not source_exists(ref_to_check):
+        print(f"[{example_name}] ⚠️ Reference file not found: {source_label(ref_to_check)}")
+        return False
+
+    try:
+        has_differences = False
+
+        with open_archive(file_to_check) as gen_zip, open_archive(ref_to_check) as ref_zip:
+            gen_sheets = {name: part for name, part, kind in list_sheets(gen_zip) if kind == 'worksheet'}
+            ref_sheets = {name: part for name, part, kind in list_sheets(ref_zip) if kind == 'worksheet'}
+
+            # Missing and extra sheets are reported by the other checks
+            for sheet_name, ref_part in ref_sheets.items():
+                if sheet_name not in gen_sheets:
+                    continue
+                gen_rules = read_range_rules(gen_zip, gen_sheets[sheet_name])
+                ref_rules = read_range_rules(ref_zip, ref_part)
+                if compare_range_rules(example_name, sheet_name, gen_rules, ref_rules):
+                    has_differences = True
+
+        return not has_differences
+
+    except Exception as e:
+        print(f"[{example_name}] ❌ Error checking range rules: {e}")
+        return False
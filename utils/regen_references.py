@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Regenerate the reference workbooks from the C examples.
+
+The libxlsxwriter checkout and the C examples in testing/c-examples/ are
+copied to a scratch directory and built there with `make -j`, so the
+checkout itself is never touched. The binaries are then run concurrently,
+each in a directory of its own that holds the images and VBA project the
+examples load. Every workbook they write is fingerprinted from its
+snapshot, and a reference is only rewritten, together with its snapshot,
+when its fingerprint changed. The creation time in docProps/ is left out
+of the fingerprint, so rerunning an unchanged library rewrites nothing.
+
+A reference is never replaced by a workbook that lost media, embedded
+objects or a VBA project the reference has, or by the output of an example
+that wrote to stderr; those are reported as refused instead.
+
+Common usage:
+  python3 utils/regen_references.py --libxlsxwriter ~/src/libxlsxwriter               # Regenerate every reference
+  python3 utils/regen_references.py --libxlsxwriter ~/src/libxlsxwriter hello chart   # Regenerate some references
+  python3 utils/regen_references.py --libxlsxwriter ~/src/libxlsxwriter --dry-run     # Only list what would change
+"""
+
+import os
+import sys
+import shutil
+import argparse
+import tempfile
+import subprocess
+import concurrent.futures
+from pathlib import Path
+
+# Add the project root to sys.path to allow imports to work both when run as a module
+# and directly
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+try:
+    from utils.example_runner import run_monitored, describe_exit
+    from utils.snapshots import build_snapshot, snapshot_fingerprint, snapshot_path, write_snapshot, SNAPSHOT_DIR
+    from utils.file_comparison import get_relative_path
+    from utils.xlsx_source import open_archive
+except ModuleNotFoundError:
+    from example_runner import run_monitored, describe_exit
+    from snapshots import build_snapshot, snapshot_fingerprint, snapshot_path, write_snapshot, SNAPSHOT_DIR
+    from file_comparison import get_relative_path
+    from xlsx_source import open_archive
+
+PROJECT_ROOT = Path(__file__).parent.parent
+C_EXAMPLES_DIR = PROJECT_ROOT / "testing" / "c-examples"
+REFERENCE_DIR = PROJECT_ROOT / "testing" / "reference-xls"
+
+WORKBOOK_SUFFIXES = (".xlsx", ".xlsm")
+
+# Parts whose loss means an example ran without a file it loads
+LOADED_PART_PREFIXES = ("xl/media/", "xl/embeddings/", "xl/vbaProject.bin")
+
+
+def example_data_files():
+    """The files besides sources and the Makefile that the C examples load by relative path"""
+    return sorted(path for path in C_EXAMPLES_DIR.iterdir()
+                  if path.is_file() and path.suffix != ".c" and path.name != "Makefile")
+
+
+def build_c_examples(example_names, libxlsxwriter_dir, build_dir, jobs):
+    """Build a copy of libxlsxwriter and the given C examples in build_dir.
+
+    Returns the path of the library copy, or None if either build fails.
+    """
+    library_dir = build_dir / "libxlsxwriter"
+    shutil.copytree(libxlsxwriter_dir, library_dir, symlinks=True, ignore=shutil.ignore_patterns(".git"))
+    library = subprocess.run(["make", f"-j{jobs}", "-C", str(library_dir)], capture_output=True, text=True)
+    if library.returncode != 0:
+        print("❌ Building libxlsxwriter failed")
+        print(library.stderr)
+        return None
+
+    shutil.copy(C_EXAMPLES_DIR / "Makefile", build_dir / "Makefile")
+    for example_name in example_names:
+        shutil.copy(C_EXAMPLES_DIR / f"{example_name}.c", build_dir / f"{example_name}.c")
+    examples = subprocess.run(
+        ["make", f"-j{jobs}", "-C", str(build_dir),
+         f"INC_DIR={library_dir / 'include'}",
+         f"LIBXLSXWRITER={library_dir / 'src' / 'libxlsxwriter.a'}"] + list(example_names),
+        capture_output=True, text=True)
+    if examples.returncode != 0:
+        print("❌ Building the C examples failed")
+        print(examples.stderr)
+        return None
+    return library_dir
+
+
+def run_c_example(example_name, build_dir):
+    """Run a built C example in a directory of its own; return (example name, workbooks written, error)"""
+    run_dir = build_dir / "runs" / example_name
+    run_dir.mkdir(parents=True)
+    # Examples open their images and VBA project by relative path
+    for data_file in example_data_files():
+        (run_dir / data_file.name).symlink_to(data_file.resolve())
+    stats, _, stderr = run_monitored([str(build_dir / example_name)], cwd=run_dir)
+    if stats.returncode != 0:
+        return example_name, [], f"{describe_exit(stats.returncode)}: {stderr.strip()}"
+    if stderr.strip():
+        return example_name, [], f"wrote to stderr: {stderr.strip()}"
+    workbooks = sorted(path for path in run_dir.iterdir() if path.suffix in WORKBOOK_SUFFIXES)
+    if not workbooks:
+        return example_name, [], "no workbook written"
+    return example_name, workbooks, None
+
+
+def lost_parts(workbook, reference):
+    """Return the media, embedding and VBA parts the reference has and the regenerated workbook lacks"""
+    with open_archive(workbook) as new_zip, open_archive(reference) as ref_zip:
+        return sorted(name for name in ref_zip.namelist()
+                      if name.startswith(LOADED_PART_PREFIXES) and name not in new_zip)
+
+
+def compare_with_reference(workbook, reference_dir):
+    """Return "new", "changed", "unchanged" or "refused" for a regenerated workbook, and its snapshot"""
+    snapshot = build_snapshot(workbook)
+    reference = reference_dir / workbook.name
+    if not reference.exists():
+        return "new", snapshot
+    if snapshot_fingerprint(snapshot) == snapshot_fingerprint(build_snapshot(reference)):
+        return "unchanged", snapshot
+    missing = lost_parts(workbook, reference)
+    if missing:
+        print(f"{workbook.name} ❌ Lost {', '.join(missing)}; keeping the reference")
+        return "refused", snapshot
+    return "changed", snapshot
+
+
+def regenerate(example_names, libxlsxwriter_dir, reference_dir, snapshot_dir, jobs, dry_run=False):
+    """Rebuild, rerun and compare the C examples; return {status: [workbook names]}"""
+    outcome = {"new": [], "changed": [], "unchanged": [], "refused": [], "failed": []}
+    with tempfile.TemporaryDirectory(prefix="regen-references-") as build_dir:
+        build_dir = Path(build_dir)
+        if build_c_examples(example_names, libxlsxwriter_dir, build_dir, jobs) is None:
+            outcome["failed"] = list(example_names)
+            return outcome
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as executor:
+            runs = [executor.submit(run_c_example, example_name, build_dir) for example_name in example_names]
+            for future in concurrent.futures.as_completed(runs):
+                example_name, workbooks, error = future.result()
+                if error is not None:
+                    print(f"{example_name} ❌ {error}")
+                    outcome["failed"].append(example_name)
+                    continue
+                for workbook in workbooks:
+                    status, snapshot = compare_with_reference(workbook, reference_dir)
+                    outcome[status].append(workbook.name)
+                    if status in ("unchanged", "refused") or dry_run:
+                        continue
+                    shutil.copy(workbook, reference_dir / workbook.name)
+                    snapshot['source'] = str(get_relative_path((reference_dir / workbook.name).resolve(),
+                                                               PROJECT_ROOT.resolve()))
+                    write_snapshot(snapshot, snapshot_path(workbook.stem, snapshot_dir))
+    return outcome
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Regenerate the reference workbooks from the C examples")
+    parser.add_argument("examples", nargs="*", help="C examples to regenerate (default: all of them)")
+    parser.add_argument("--libxlsxwriter", required=True, help="Path to a libxlsxwriter checkout to build against")
+    parser.add_argument("--jobs", "-j", type=int, default=os.cpu_count() or 1,
+                        help="Parallel build jobs and example runs (default: number of CPUs)")
+    parser.add_argument("--dry-run", action="store_true", help="Only report which references would change")
+    parser.add_argument("--reference-dir", default=str(REFERENCE_DIR), help="Directory with the reference workbooks")
+    parser.add_argument("--snapshot-dir", default=str(SNAPSHOT_DIR), help="Directory with the reference snapshots")
+
+    args = parser.parse_args()
+
+    libxlsxwriter_dir = Path(args.libxlsxwriter).resolve()
+    if not (libxlsxwriter_dir / "include" / "xlsxwriter.h").exists():
+        print(f"Error: {libxlsxwriter_dir} is not a libxlsxwriter checkout")
+        return 1
+
+    example_names = args.examples or sorted(path.stem for path in C_EXAMPLES_DIR.glob("*.c"))
+    missing = [name for name in example_names if not (C_EXAMPLES_DIR / f"{name}.c").exists()]
+    if missing:
+        print(f"Error: C examples not found: {', '.join(missing)}")
+        return 1
+
+    outcome = regenerate(example_names, libxlsxwriter_dir, Path(args.reference_dir), Path(args.snapshot_dir),
+                         max(1, args.jobs), dry_run=args.dry_run)
+
+    verb = "would be" if args.dry_run else "were"
+    print(f"\n{len(outcome['unchanged'])} references unchanged")
+    for status in ("changed", "new"):
+        if outcome[status]:
+            print(f"\n=== References that {verb} {'updated' if status == 'changed' else 'added'} ===")
+            for name in sorted(outcome[status]):
+                print(f"- {name}")
+    if outcome["refused"]:
+        print(f"\n❌ {len(outcome['refused'])} references kept because the new workbook lost parts: "
+              f"{', '.join(sorted(outcome['refused']))}")
+    if outcome["failed"]:
+        print(f"\n❌ {len(outcome['failed'])} examples failed: {', '.join(sorted(outcome['failed']))}")
+    if outcome["refused"] or outcome["failed"]:
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
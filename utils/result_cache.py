@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Memoized check results for the autocheck tool.
+
+A check's result only depends on the generated workbook, the reference it
+is compared with, the options it is run with and the code of the check. The
+cache keys each result by the SHA-256 of the generated file, the SHA-256
+of the reference (for checks that read one), the check's name and version
+stamp and those options, and stores whether the check passed together
+with everything it printed. A hit replays the stored findings without
+opening a single part of either workbook.
+
+Every entry is a small JSON file, written to a temporary name and renamed
+into place, so several autocheck processes or --jobs workers can share one
+cache directory. A hit refreshes the entry's modification time; once the
+cache grows past its size limit, the entries used longest ago are evicted.
+"""
+
+import os
+import json
+import hashlib
+import tempfile
+import contextlib
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+DEFAULT_CACHE_DIR = PROJECT_ROOT / "testing" / ".check-cache"
+DEFAULT_CACHE_MB = 256
+
+CACHE_VERSION = 1
+
+# Entries are written under this prefix and renamed into place
+TMP_PREFIX = ".entry-"
+
+# Modules whose code is folded into every check's version stamp
+UTILS_DIR = Path(__file__).parent
+
+
+def code_stamp(directory=UTILS_DIR):
+    """Digest of the check code, so editing any checker invalidates the results it produced"""
+    digest = hashlib.sha256()
+    for path in sorted(Path(directory).glob("*.py")):
+        digest.update(path.name.encode())
+        digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """A directory of check results, bounded to max_bytes by least recent use"""
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_CACHE_MB * 1024 * 1024):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.stamp = code_stamp()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, check, example_name, generated_digest, reference_digest, options):
+        """The cache key of one check run; options is a dict of what else the result depends on"""
+        material = json.dumps([CACHE_VERSION, self.stamp, check.name, check.version, example_name,
+                               generated_digest, reference_digest, sorted(options.items())])
+        return hashlib.sha256(material.encode()).hexdigest()
+
+    def _path(self, key):
+        return self.directory / key[:2] / f"{key}.json"
+
+    def get(self, key):
+        """Return (passed, output) for a key, or None on a miss"""
+        path = self._path(key)
+        try:
+            with open(path) as file:
+                entry = json.load(file)
+            os.utime(path)
+        except (OSError, ValueError):
+            # Missing, evicted by another process meanwhile, or cut short
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry["passed"], entry["output"]
+
+    def put(self, key, passed, output):
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(prefix=TMP_PREFIX, suffix=".json", dir=path.parent)
+        try:
+            with os.fdopen(fd, "w") as file:
+                json.dump({"passed": passed, "output": output}, file)
+            os.replace(tmp_name, path)
+        except BaseException:
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(tmp_name)
+            raise
+
+    def evict(self):
+        """Remove the least recently used entries until the cache fits max_bytes; return how many went"""
+        entries = []
+        for path in self.directory.glob("*/*.json"):
+            # Another process may be about to rename this one into place
+            if path.name.startswith(TMP_PREFIX):
+                continue
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+                removed += 1
+            except FileNotFoundError:
+                # Another process evicted it first
+                pass
+            total -= size
+        return removed
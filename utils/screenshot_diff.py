@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+Automated screenshot comparison for manual verification.
+
+verify.py captures the reference workbook and the generated workbook side
+by side in comparison_<example>.png: the reference window fills the left
+half and the generated window the right half. This module splits such a
+capture (or takes any pair of renders), lines the halves up vertically,
+scores them tile by tile and writes a heat map of the differing tiles, so
+reviewers only have to look at the examples that get flagged.
+
+Common usage:
+  python3 utils/screenshot_diff.py                          # Triage every comparison screenshot
+  python3 utils/screenshot_diff.py hello tutorial2          # Triage some examples
+  python3 utils/screenshot_diff.py --pair ref.png gen.png   # Compare two separate renders
+"""
+
+import sys
+import argparse
+import collections
+from pathlib import Path
+
+try:
+    import numpy as np
+    from PIL import Image
+except ImportError:
+    # verify.py imports this module optionally and copes with it missing
+    if __name__ != "__main__":
+        raise
+    print("Error: This script requires numpy and Pillow. Install with: pip install numpy pillow")
+    sys.exit(1)
+
+ROOT_DIR = Path(__file__).parent.parent
+RESULTS_DIR = ROOT_DIR / "testing" / "results"
+
+# Tile edge length in pixels
+DEFAULT_TILE = 64
+
+# A tile is flagged when its score exceeds the threshold; scores are
+# 1 - SSIM for the ssim metric and the mean absolute difference for mad
+DEFAULT_THRESHOLD = {'ssim': 0.3, 'mad': 0.05}
+
+# Window chrome in the captures verify.py takes: the title bar and ribbon
+# at the top of each half, the sheet tabs and status bar at the bottom and
+# the vertical scroll bar on the right
+DEFAULT_IGNORE_TOP = 140
+DEFAULT_IGNORE_BOTTOM = 60
+DEFAULT_IGNORE_RIGHT = 32
+
+# Images are box-downsampled by this factor before scoring, so text that is
+# antialiased or positioned a pixel differently does not count as a difference
+DEFAULT_SCALE = 4
+
+# Largest vertical offset between the halves that alignment will search,
+# e.g. for a notification bar shown in only one of the windows
+DEFAULT_MAX_SHIFT = 48
+
+# SSIM stabilizing constants for intensities in [0, 1]
+SSIM_C1 = 0.01 ** 2
+SSIM_C2 = 0.03 ** 2
+
+# scores holds one value per tile; top is the row of the generated image at
+# which the first row of tiles starts, and shift and tile are in pixels of
+# the original images
+DiffResult = collections.namedtuple('DiffResult', ['scores', 'flagged', 'shift', 'top', 'tile', 'threshold', 'metric'])
+
+
+def load_gray(image_file):
+    """Load an image as a float32 grayscale array with values in [0, 1]"""
+    with Image.open(image_file) as img:
+        return np.asarray(img.convert('L'), dtype=np.float32) / 255.0
+
+
+def split_halves(image):
+    """Split a side-by-side capture into its (reference, generated) halves"""
+    half = image.shape[1] // 2
+    return image[:, :half], image[:, half:half * 2]
+
+
+def downsample(image, scale):
+    """Box-downsample an image by an integer factor, dropping partial edge blocks"""
+    if scale <= 1:
+        return image
+    height, width = image.shape[0] // scale, image.shape[1] // scale
+    return image[:height * scale, :width * scale].reshape(height, scale, width, scale).mean(axis=(1, 3))
+
+
+def best_shift(reference, generated, max_shift):
+    """Find the vertical offset of generated against reference.
+
+    The rows of both images are reduced to their mean intensity and the
+    profiles are matched at every offset up to max_shift, which is cheap
+    enough to run at full resolution. The result is positive when the
+    generated content sits lower.
+    """
+    ref_profile = reference.mean(axis=1)[:, None]
+    gen_profile = generated.mean(axis=1)[:, None]
+    best, best_error = 0, None
+    for shift in sorted(range(-max_shift, max_shift + 1), key=abs):
+        ref_rows, gen_rows = _overlap(ref_profile, gen_profile, shift)
+        if not len(ref_rows):
+            continue
+        error = float(np.mean(np.abs(ref_rows - gen_rows)))
+        if best_error is None or error < best_error - 1e-9:
+            best, best_error = shift, error
+    return best
+
+
+def _overlap(reference, generated, shift):
+    """Crop both images to the rows and columns they share at the given shift"""
+    height = min(reference.shape[0], generated.shape[0])
+    width = min(reference.shape[1], generated.shape[1])
+    reference, generated = reference[:height, :width], generated[:height, :width]
+    if shift >= 0:
+        return reference[:height - shift], generated[shift:]
+    return reference[-shift:], generated[:height + shift]
+
+
+def _tiles(image, tile):
+    """View an image as a (rows, cols, tile, tile) block array, dropping partial edge tiles"""
+    rows, cols = image.shape[0] // tile, image.shape[1] // tile
+    return image[:rows * tile, :cols * tile].reshape(rows, tile, cols, tile).swapaxes(1, 2)
+
+
+def tile_scores(reference, generated, tile, metric='ssim'):
+    """Score each tile of two aligned, equally sized images; 0 means identical"""
+    ref_tiles = _tiles(reference, tile)
+    gen_tiles = _tiles(generated, tile)
+    if metric == 'mad':
+        return np.mean(np.abs(ref_tiles - gen_tiles), axis=(2, 3))
+
+    ref_mean = ref_tiles.mean(axis=(2, 3))
+    gen_mean = gen_tiles.mean(axis=(2, 3))
+    ref_var = ref_tiles.var(axis=(2, 3))
+    gen_var = gen_tiles.var(axis=(2, 3))
+    covariance = (ref_tiles * gen_tiles).mean(axis=(2, 3)) - ref_mean * gen_mean
+    ssim = ((2 * ref_mean * gen_mean + SSIM_C1) * (2 * covariance + SSIM_C2)) / \
+        ((ref_mean ** 2 + gen_mean ** 2 + SSIM_C1) * (ref_var + gen_var + SSIM_C2))
+    return 1.0 - ssim
+
+
+def compare_images(reference, generated, tile=DEFAULT_TILE, metric='ssim', threshold=None,
+                   ignore_top=DEFAULT_IGNORE_TOP, ignore_bottom=DEFAULT_IGNORE_BOTTOM,
+                   ignore_right=DEFAULT_IGNORE_RIGHT, scale=DEFAULT_SCALE, max_shift=DEFAULT_MAX_SHIFT):
+    """Crop the window chrome, align two grayscale images and score them tile by tile"""
+    if threshold is None:
+        threshold = DEFAULT_THRESHOLD[metric]
+    scale = max(1, scale)
+
+    reference = reference[ignore_top:reference.shape[0] - ignore_bottom, :reference.shape[1] - ignore_right]
+    generated = generated[ignore_top:generated.shape[0] - ignore_bottom, :generated.shape[1] - ignore_right]
+    shift = best_shift(reference, generated, max_shift) if max_shift else 0
+    reference, generated = _overlap(reference, generated, shift)
+
+    # Tiles are scored on the downsampled images but reported in original pixels
+    block = max(1, tile // scale)
+    scores = tile_scores(downsample(reference, scale), downsample(generated, scale), block, metric)
+    flagged = int(np.count_nonzero(scores > threshold))
+    return DiffResult(scores, flagged, shift, ignore_top + max(shift, 0), block * scale, threshold, metric)
+
+
+def compare_capture(capture_file, **options):
+    """Compare the reference and generated halves of a side-by-side capture"""
+    reference, generated = split_halves(load_gray(capture_file))
+    return compare_images(reference, generated, **options)
+
+
+def compare_pair(reference_file, generated_file, **options):
+    """Compare two separate renders"""
+    return compare_images(load_gray(reference_file), load_gray(generated_file), **options)
+
+
+def too_small(result):
+    """True when the cropped images hold no whole tile, so nothing was scored"""
+    return result.scores.size == 0
+
+
+def suggested_verdict(result):
+    """Return 'y' when no tile exceeds the threshold, 'n' when one does and None when nothing was scored"""
+    if too_small(result):
+        return None
+    return 'y' if result.flagged == 0 else 'n'
+
+
+def write_heatmap(result, generated, heatmap_file):
+    """Write the generated image dimmed, with flagged tiles tinted red by their score"""
+    rows, cols = result.scores.shape
+
+    # Scale scores so the threshold maps to half intensity and anything past twice it saturates
+    intensity = np.clip(result.scores / (2 * result.threshold), 0.0, 1.0)
+    intensity[result.scores <= result.threshold] = 0.0
+    overlay = np.zeros_like(generated)
+    overlay[result.top:result.top + rows * result.tile, :cols * result.tile] = \
+        np.kron(intensity, np.ones((result.tile, result.tile), dtype=np.float32))
+
+    dimmed = 0.35 + 0.5 * generated
+    rgb = np.stack([
+        dimmed * (1 - overlay) + overlay,
+        dimmed * (1 - overlay),
+        dimmed * (1 - overlay),
+    ], axis=-1)
+    Image.fromarray((rgb * 255).astype(np.uint8), 'RGB').save(heatmap_file)
+
+
+def heatmap_path(capture_file):
+    """Heat maps are written next to the capture as diff_<name>.png"""
+    capture_file = Path(capture_file)
+    return capture_file.with_name("diff_" + capture_file.name.removeprefix("comparison_"))
+
+
+def triage_capture(capture_file, heatmap=True, **options):
+    """Compare one capture, write its heat map and return (result, heat map path or None)"""
+    reference, generated = split_halves(load_gray(capture_file))
+    result = compare_images(reference, generated, **options)
+    heatmap_file = None
+    if heatmap:
+        if result.flagged:
+            heatmap_file = heatmap_path(capture_file)
+            write_heatmap(result, generated, heatmap_file)
+        elif heatmap_path(capture_file).exists():
+            # Drop the heat map of an earlier capture that was flagged
+            heatmap_path(capture_file).unlink()
+    return result, heatmap_file
+
+
+def find_captures(examples=None):
+    """Find comparison screenshots, for all examples or the given ones"""
+    if not examples:
+        return sorted(RESULTS_DIR.glob("*/comparison_*.png"))
+    captures = []
+    for example in examples:
+        capture_file = RESULTS_DIR / example / f"comparison_{example}.png"
+        if capture_file.exists():
+            captures.append(capture_file)
+        else:
+            print(f"⚠️ No comparison screenshot for {example}")
+    return captures
+
+
+def triage(captures, heatmap=True, **options):
+    """Score a list of captures, print a table and return the examples that need review"""
+    flagged = []
+    print(f"{'EXAMPLE':<25} {'TILES':>12} {'MAX':>7} {'SHIFT':>6}  VERDICT")
+    print("-" * 62)
+    for capture_file in captures:
+        example_name = capture_file.parent.name
+        try:
+            result, heatmap_file = triage_capture(capture_file, heatmap=heatmap, **options)
+        except Exception as e:
+            print(f"{example_name:<25} ❌ Error comparing screenshot: {e}")
+            flagged.append(example_name)
+            continue
+        verdict = suggested_verdict(result)
+        if verdict is None:
+            print(f"{example_name:<25} ⚠️ Too small to score: no {result.tile}px tile fits after cropping")
+            flagged.append(example_name)
+            continue
+        print(f"{example_name:<25} {result.flagged:>5}/{result.scores.size:<6} {result.scores.max():>7.3f} "
+              f"{result.shift:>5}px  {'✅' if verdict == 'y' else '⚠️ review'}")
+        if verdict != 'y':
+            flagged.append(example_name)
+
+    print(f"\n{len(flagged)} of {len(captures)} screenshots need review")
+    if heatmap and flagged:
+        print("Heat maps of the flagged tiles are in testing/results/<example>/diff_<example>.png")
+    return flagged
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score comparison screenshots and flag the ones that differ")
+    parser.add_argument("examples", nargs="*", help="Examples to triage (default: all with a comparison screenshot)")
+    parser.add_argument("--pair", nargs=2, metavar=("REFERENCE", "GENERATED"), help="Compare two separate images")
+    parser.add_argument("--metric", choices=sorted(DEFAULT_THRESHOLD), default="ssim", help="Tile score metric")
+    parser.add_argument("--threshold", type=float, help="Tile score above which a tile is flagged")
+    parser.add_argument("--tile", type=int, default=DEFAULT_TILE, help="Tile size in pixels")
+    parser.add_argument("--ignore-top", type=int, default=DEFAULT_IGNORE_TOP,
+                        help="Pixels of window chrome to ignore at the top of each half")
+    parser.add_argument("--ignore-bottom", type=int, default=DEFAULT_IGNORE_BOTTOM,
+                        help="Pixels of window chrome to ignore at the bottom of each half")
+    parser.add_argument("--ignore-right", type=int, default=DEFAULT_IGNORE_RIGHT,
+                        help="Pixels of window chrome to ignore at the right of each half")
+    parser.add_argument("--scale", type=int, default=DEFAULT_SCALE, help="Downsampling factor applied before scoring")
+    parser.add_argument("--max-shift", type=int, default=DEFAULT_MAX_SHIFT,
+                        help="Largest vertical offset between the halves to align (0 disables alignment)")
+    parser.add_argument("--no-heatmap", action="store_true", help="Do not write heat map images")
+
+    args = parser.parse_args()
+    options = dict(tile=args.tile, metric=args.metric, threshold=args.threshold,
+                   ignore_top=args.ignore_top, ignore_bottom=args.ignore_bottom,
+                   ignore_right=args.ignore_right, scale=args.scale, max_shift=args.max_shift)
+
+    if args.pair:
+        result = compare_pair(*args.pair, **options)
+        if too_small(result):
+            print(f"⚠️ Too small to score: no {result.tile}px tile fits after cropping")
+            return 1
+        print(f"{result.flagged} of {result.scores.size} tiles differ "
+              f"(max score {result.scores.max():.3f}, shift {result.shift}px)")
+        return 0 if result.flagged == 0 else 1
+
+    captures = find_captures(args.examples)
+    if not captures:
+        print("No comparison screenshots found.")
+        return 1
+
+    flagged = triage(captures, heatmap=not args.no_heatmap, **options)
+    return 0 if not flagged else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
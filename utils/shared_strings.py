@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Shared-strings index for the autocheck tool.
+
+openpyxl resolves and copies every sharedStrings.xml entry when a workbook
+is loaded. The index here only records where each <si> entry starts and
+ends plus a digest of its bytes. Digests are interned into small integers
+that are shared by the generated and the reference file, so cells with
+t="s" can be compared by integer lookups; a string is only decoded when a
+finding has to print it.
+"""
+
+import hashlib
+import re
+import xml.etree.ElementTree as ET
+from array import array
+
+SHARED_STRINGS_PART = 'xl/sharedStrings.xml'
+
+SI_RE = re.compile(rb'<si>.*?</si>|<si/>', re.DOTALL)
+
+# Raw-byte patterns for entries worth decoding: an escaped or literal null,
+# or text that ends in an ellipsis (possibly truncated)
+NULL_RE = re.compile(rb'\x00|_x0000_')
+TRUNCATED_RE = re.compile(rb'(?:\.\.\.|\xe2\x80\xa6|&#8230;|&#x2026;)</t>(?:</r>)?</si>$')
+
+
+class StringInterner:
+    """Map string digests to small integer ids, shared between workbooks"""
+
+    def __init__(self):
+        self._ids = {}
+
+    def intern(self, digest):
+        return self._ids.setdefault(digest, len(self._ids))
+
+    def intern_text(self, text):
+        """Intern a string that did not come from a shared-strings table"""
+        return self.intern(_digest(f"<si><t>{text}</t></si>".encode()))
+
+    def __len__(self):
+        return len(self._ids)
+
+
+def _digest(raw):
+    return hashlib.blake2b(raw, digest_size=16).digest()
+
+
+def decode_si(raw):
+    """Decode the text of a raw <si> element, skipping phonetic runs"""
+    element = ET.fromstring(bytes(raw))
+    parts = []
+
+    def collect(node):
+        for child in node:
+            if child.tag == 'rPh':
+                continue
+            if child.tag == 't':
+                parts.append(child.text or "")
+            else:
+                collect(child)
+
+    collect(element)
+    return "".join(parts)
+
+
+class SharedStringsIndex:
+    """Offsets, digests and interned ids of one workbook's shared strings.
+
+    archive is an XlsxArchive. Entries are located with a byte-level scan of
+    the part; nothing is decoded until text() is called for an entry.
+    """
+
+    def __init__(self, archive, interner):
+        self._interner = interner
+        self._data = archive.view(SHARED_STRINGS_PART) if SHARED_STRINGS_PART in archive else memoryview(b'')
+        self._starts = array('Q')
+        self._ends = array('Q')
+        self._ids = array('L')
+        self._decoded = {}
+
+        for match in SI_RE.finditer(self._data):
+            start, end = match.span()
+            self._starts.append(start)
+            self._ends.append(end)
+            self._ids.append(interner.intern(_digest(self._data[start:end])))
+
+    def __len__(self):
+        return len(self._ids)
+
+    def id(self, index):
+        """Return the interned id of entry index, comparable across workbooks"""
+        return self._ids[index]
+
+    def raw(self, index):
+        return self._data[self._starts[index]:self._ends[index]]
+
+    def text(self, index):
+        """Decode entry index, caching the result"""
+        if index not in self._decoded:
+            self._decoded[index] = decode_si(self.raw(index))
+        return self._decoded[index]
+
+    def suspicious(self):
+        """Yield (index, reason) for entries with null characters or a trailing ellipsis"""
+        for index in range(len(self._ids)):
+            raw = self.raw(index)
+            if NULL_RE.search(raw):
+                yield index, 'null'
+            if TRUNCATED_RE.search(raw):
+                yield index, 'truncated'
@@ -0,0 +1,452 @@
+#!/usr/bin/env python3
+"""
+Normalized reference snapshots for the autocheck tool.
+
+A snapshot holds what the checks compare in a reference workbook, already
+parsed: cell values stored column by column, an interned table of cell
+styles, row and column formats, range rules, chart digest trees and a hash
+of every part. Snapshots are gzip-compressed JSON lines, one record per
+line, so `zcat` on two of them gives a readable diff when references are
+regenerated, and loading one is much faster than unzipping and parsing
+the reference.
+
+The snapshot check compares a generated workbook with the snapshot in
+testing/reference-snapshots/ instead of the reference file.
+
+Common usage:
+  python3 utils/snapshots.py build                    # Snapshot every reference in testing/reference-xls
+  python3 utils/snapshots.py build chart_area hello   # Snapshot only some references
+  python3 utils/snapshots.py diff hello.xlsx testing/reference-snapshots/hello.jsonl.gz  # Compare workbooks or snapshots
+  python3 utils/snapshots.py show hello               # Print a reference's snapshot
+"""
+
+import sys
+import gzip
+import json
+import hashlib
+import argparse
+from pathlib import Path
+
+# Add the project root to sys.path to allow imports to work both when run as a module
+# and directly
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+try:
+    from utils.xlsx_parts import list_sheets, iter_sheet_cells, column_index, column_letters, format_range_ref, parse_sqref
+    from utils.xlsx_source import open_archive, resolve_generated, source_label, CHUNK_SIZE
+    from utils.shared_strings import StringInterner, SharedStringsIndex
+    from utils.file_comparison import get_relative_path
+    from utils.formula_tokens import expand_formula, formulas_equal
+    from utils.excel_checks import iter_sheet_rows, compare_rows
+    from utils.range_checks import read_range_rules, compare_range_rules
+    from utils.chart_checks import load_chart_trees, compare_chart_trees
+    from utils.findings import Findings, RangeCollector
+    from utils.xlsx_reader import read_style_components
+except ModuleNotFoundError:
+    from xlsx_parts import list_sheets, iter_sheet_cells, column_index, column_letters, format_range_ref, parse_sqref
+    from xlsx_source import open_archive, resolve_generated, source_label, CHUNK_SIZE
+    from shared_strings import StringInterner, SharedStringsIndex
+    from file_comparison import get_relative_path
+    from formula_tokens import expand_formula, formulas_equal
+    from excel_checks import iter_sheet_rows, compare_rows
+    from range_checks import read_range_rules, compare_range_rules
+    from chart_checks import load_chart_trees, compare_chart_trees
+    from findings import Findings, RangeCollector
+    from xlsx_reader import read_style_components
+
+PROJECT_ROOT = Path(__file__).parent.parent
+REFERENCE_DIR = PROJECT_ROOT / "testing" / "reference-xls"
+SNAPSHOT_DIR = PROJECT_ROOT / "testing" / "reference-snapshots"
+
+SNAPSHOT_VERSION = 1
+SNAPSHOT_SUFFIX = ".jsonl.gz"
+
+# Cells or rows per line, so that diffs of large sheets stay readable
+LINE_CHUNK = 256
+
+# Parts whose content the structured comparison already covers, or that
+# legitimately differ between runs, so their hashes are not compared
+HASH_EXEMPT_PREFIXES = ('docProps/', 'xl/worksheets/sheet', 'xl/charts/chart', 'xl/styles.xml', 'xl/sharedStrings.xml')
+
+
+def snapshot_path(example_name, snapshot_dir=SNAPSHOT_DIR):
+    return Path(snapshot_dir) / f"{example_name}{SNAPSHOT_SUFFIX}"
+
+
+def read_cell_styles(xlsx_zip):
+    """Return the canonical form of every cellXfs entry, by index.
+
+    A style is its number format code, font, fill, border, alignment and
+    protection, so two workbooks that number their styles differently
+    still produce the same strings for the same formatting.
+    """
+    return ["\n".join(style) for style in read_style_components(xlsx_zip)]
+
+
+def _part_hash(xlsx_zip, name):
+    digest = hashlib.sha256()
+    for chunk in xlsx_zip.iter_chunks(name, CHUNK_SIZE):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _hex_digests(value):
+    """Turn the binary digests of a chart tree into hex strings, so the tree can be stored as JSON"""
+    if isinstance(value, bytes):
+        return value.hex()
+    if isinstance(value, dict):
+        return {key: _hex_digests(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_hex_digests(item) for item in value]
+    return value
+
+
+def build_snapshot(source):
+    """Build the snapshot of a workbook source (a path, bytes or an XlsxArchive)"""
+    with open_archive(source) as xlsx_zip:
+        snapshot = {
+            'source': source_label(source),
+            'parts': {info.filename: (info.file_size, _part_hash(xlsx_zip, info.filename))
+                      for info in xlsx_zip.infolist()},
+            'styles': [],
+            'sheets': [],
+            'charts': {part: _hex_digests(tree) for part, tree in load_chart_trees(xlsx_zip).items()},
+        }
+
+        # Styles are interned: each distinct style is stored once and cells refer to it
+        style_ids = {}
+        cell_styles = [style_ids.setdefault(style, len(style_ids)) for style in read_cell_styles(xlsx_zip)]
+        snapshot['styles'] = list(style_ids)
+
+        strings = SharedStringsIndex(xlsx_zip, StringInterner())
+        for sheet_name, part, kind in list_sheets(xlsx_zip):
+            sheet = {'name': sheet_name, 'kind': kind, 'format': {}, 'rows': [], 'cells': {}, 'rules': {}}
+            snapshot['sheets'].append(sheet)
+            if kind != 'worksheet':
+                continue
+
+            with xlsx_zip.open(part) as stream:
+                sheet['rows'] = list(iter_sheet_rows(stream, sheet['format']))
+
+            shared_masters = {}
+            with xlsx_zip.open(part) as stream:
+                for row, col, cell_type, value, formula, style in iter_sheet_cells(stream, with_style=True):
+                    style = cell_styles[style] if style < len(cell_styles) else 0
+                    if formula is not None:
+                        cell_value = ('f',) + expand_formula(formula, row, col, shared_masters)
+                    elif value is None:
+                        cell_value = None
+                    elif cell_type == 's':
+                        cell_value = ('s', strings.text(int(value)))
+                    elif cell_type == 'inlineStr':
+                        cell_value = ('s', value)
+                    elif cell_type == 'n':
+                        cell_value = ('n', float(value))
+                    elif cell_type == 'b':
+                        cell_value = ('b', value == '1')
+                    else:
+                        cell_value = (cell_type, value)
+                    sheet['cells'][(row, col)] = (cell_value, style)
+
+            sheet['rules'] = read_range_rules(xlsx_zip, part)
+
+    return snapshot
+
+
+def snapshot_lines(snapshot):
+    """Yield the records of a snapshot as JSON lines, in a stable order"""
+    def line(record):
+        return json.dumps(record, ensure_ascii=False, sort_keys=True)
+
+    yield line({'type': 'snapshot', 'version': SNAPSHOT_VERSION, 'source': snapshot['source']})
+    for name, (size, digest) in sorted(snapshot['parts'].items()):
+        yield line({'type': 'part', 'name': name, 'size': size, 'sha256': digest})
+    for index, style in enumerate(snapshot['styles']):
+        yield line({'type': 'style', 'id': index, 'style': style})
+
+    for sheet in snapshot['sheets']:
+        name = sheet['name']
+        yield line({'type': 'sheet', 'name': name, 'kind': sheet['kind'],
+                    'height': sheet['format'].get('height'), 'hidden': sheet['format'].get('hidden'),
+                    'cols': sheet['format'].get('cols', [])})
+        for start in range(0, len(sheet['rows']), LINE_CHUNK):
+            yield line({'type': 'rows', 'sheet': name, 'rows': sheet['rows'][start:start + LINE_CHUNK]})
+
+        # Cells are stored column by column
+        columns = {}
+        for (row, col), (value, style) in sorted(sheet['cells'].items(), key=lambda item: (item[0][1], item[0][0])):
+            column = columns.setdefault(col, ([], [], []))
+            column[0].append(row)
+            column[1].append(value)
+            column[2].append(style)
+        for col, (rows, values, styles) in columns.items():
+            for start in range(0, len(rows), LINE_CHUNK):
+                end = start + LINE_CHUNK
+                yield line({'type': 'column', 'sheet': name, 'col': column_letters(col),
+                            'rows': rows[start:end], 'values': values[start:end], 'styles': styles[start:end]})
+
+        for (kind, signature), (label, rects) in sorted(sheet['rules'].items()):
+            yield line({'type': 'rule', 'sheet': name, 'kind': kind, 'signature': signature, 'label': label,
+                        'ranges': " ".join(format_range_ref(rect) for rect in rects)})
+
+    for part, tree in sorted(snapshot['charts'].items()):
+        yield line({'type': 'chart', 'part': part, 'tree': tree})
+
+
+def snapshot_fingerprint(snapshot):
+    """Hash the content of a snapshot, leaving out its source and the document properties.
+
+    docProps/ holds creation times, so two runs of the same generator give
+    the same fingerprint unless what they wrote actually changed.
+    """
+    stable = dict(snapshot, source='',
+                  parts={name: part for name, part in snapshot['parts'].items() if not name.startswith('docProps/')})
+    digest = hashlib.sha256()
+    for text in snapshot_lines(stable):
+        digest.update(text.encode('utf-8') + b"\n")
+    return digest.hexdigest()
+
+
+def write_snapshot(snapshot, path):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+    # No name or mtime in the gzip header, so an unchanged snapshot gives an identical file
+    with open(tmp_path, 'wb') as raw, gzip.GzipFile(filename='', fileobj=raw, mode='wb', mtime=0) as file:
+        for text in snapshot_lines(snapshot):
+            file.write(text.encode('utf-8') + b"\n")
+    tmp_path.replace(path)
+
+
+def _value(value):
+    return tuple(value) if value is not None else None
+
+
+def load_snapshot(path):
+    """Read a snapshot written by write_snapshot()"""
+    snapshot = {'source': str(path), 'parts': {}, 'styles': [], 'sheets': [], 'charts': {}}
+    sheets = {}
+    with gzip.open(path, 'rt', encoding='utf-8') as file:
+        for text in file:
+            record = json.loads(text)
+            kind = record['type']
+            if kind == 'snapshot':
+                if record['version'] != SNAPSHOT_VERSION:
+                    raise ValueError(f"Unsupported snapshot version {record['version']} in {path}")
+                snapshot['source'] = record['source']
+            elif kind == 'part':
+                snapshot['parts'][record['name']] = (record['size'], record['sha256'])
+            elif kind == 'style':
+                snapshot['styles'].append(record['style'])
+            elif kind == 'sheet':
+                sheet = {'name': record['name'], 'kind': record['kind'], 'rows': [], 'cells': {}, 'rules': {},
+                         'format': {'height': record['height'], 'hidden': record['hidden'],
+                                    'cols': [tuple(col) for col in record['cols']]}}
+                sheets[record['name']] = sheet
+                snapshot['sheets'].append(sheet)
+            elif kind == 'rows':
+                sheets[record['sheet']]['rows'].extend(tuple(row) for row in record['rows'])
+            elif kind == 'column':
+                cells = sheets[record['sheet']]['cells']
+                col = column_index(record['col'])
+                for row, value, style in zip(record['rows'], record['values'], record['styles']):
+                    cells[(row, col)] = (_value(value), style)
+            elif kind == 'rule':
+                sheets[record['sheet']]['rules'][(record['kind'], record['signature'])] = (
+                    record['label'], parse_sqref(record['ranges']))
+            elif kind == 'chart':
+                snapshot['charts'][record['part']] = record['tree']
+    return snapshot
+
+
+def _display(value):
+    if value is None:
+        return None
+    if value[0] == 'f':
+        return f"{{={value[1]}}}" if value[2] else f"={value[1]}"
+    if value[0] == 'n' and value[1].is_integer():
+        return int(value[1])
+    return value[1]
+
+
+def _formula_values_equal(gen_value, ref_value):
+    """Formulas that differ in text can still be the same formula"""
+    return (gen_value is not None and ref_value is not None and gen_value[0] == ref_value[0] == 'f'
+            and gen_value[2] == ref_value[2] and formulas_equal(gen_value[1], ref_value[1]))
+
+
+def compare_cells(findings, sheet_name, gen_sheet, gen_styles, ref_sheet, ref_styles, compare_styles):
+    """Compare the cell values, and optionally the styles, of two snapshot sheets"""
+    has_differences = False
+    gen_cells, ref_cells = gen_sheet['cells'], ref_sheet['cells']
+    with RangeCollector(findings, lambda kind: f"Value mismatch in sheet '{sheet_name}'") as values, \
+            RangeCollector(findings, lambda kind: f"Style mismatch in sheet '{sheet_name}'", details=False) as styles:
+        for position in sorted(gen_cells.keys() | ref_cells.keys()):
+            if findings.exhausted:
+                break
+            gen_value, gen_style = gen_cells.get(position, (None, 0))
+            ref_value, ref_style = ref_cells.get(position, (None, 0))
+            if gen_value != ref_value and not _formula_values_equal(gen_value, ref_value):
+                values.add(position[0], position[1], 'value', _display(ref_value), _display(gen_value))
+                has_differences = True
+            if compare_styles and gen_styles[gen_style] != ref_styles[ref_style]:
+                styles.add(position[0], position[1], 'style')
+                has_differences = True
+    return has_differences
+
+
+def compare_snapshots(example_name, gen, ref, findings, compare_styles=True):
+    """Compare a generated workbook's snapshot with its reference snapshot and report through findings"""
+    has_differences = False
+
+    missing = sorted(ref['parts'].keys() - gen['parts'].keys())
+    extra = sorted(gen['parts'].keys() - ref['parts'].keys())
+    if missing:
+        findings.warn(f"Generated file is missing these internal files: {', '.join(missing)}", details=False)
+        has_differences = True
+    if extra:
+        findings.warn(f"Generated file has these extra internal files: {', '.join(extra)}", details=False)
+        has_differences = True
+    changed = [name for name in sorted(gen['parts'].keys() & ref['parts'].keys())
+               if gen['parts'][name] != ref['parts'][name] and not name.startswith(HASH_EXEMPT_PREFIXES)]
+    if changed:
+        findings.warn(f"Content of these internal files differs: {', '.join(changed)}", details=False)
+        has_differences = True
+
+    gen_sheets = {sheet['name']: sheet for sheet in gen['sheets']}
+    for ref_sheet in ref['sheets']:
+        if findings.exhausted:
+            break
+        sheet_name = ref_sheet['name']
+        gen_sheet = gen_sheets.get(sheet_name)
+        if gen_sheet is None:
+            findings.warn(f"Generated file is missing sheet: {sheet_name}", details=False)
+            has_differences = True
+            continue
+        if ref_sheet['kind'] != 'worksheet' or gen_sheet['kind'] != 'worksheet':
+            continue
+
+        if compare_cells(findings, sheet_name, gen_sheet, gen['styles'], ref_sheet, ref['styles'], compare_styles):
+            has_differences = True
+        if not findings.exhausted and compare_rows(example_name, sheet_name, gen_sheet['rows'], gen_sheet['format'],
+                                                   ref_sheet['rows'], ref_sheet['format'], findings):
+            has_differences = True
+
+    ref_names = {sheet['name'] for sheet in ref['sheets']}
+    for sheet_name in gen_sheets:
+        if sheet_name not in ref_names:
+            findings.warn(f"Generated file has extra sheet: {sheet_name}", details=False)
+            has_differences = True
+
+    # Range rules and charts are reported by their own comparisons, which print directly
+    findings.flush()
+    for sheet_name, gen_sheet in gen_sheets.items():
+        ref_sheet = next((sheet for sheet in ref['sheets'] if sheet['name'] == sheet_name), None)
+        if ref_sheet is not None and ref_sheet['kind'] == 'worksheet' and gen_sheet['kind'] == 'worksheet':
+            if compare_range_rules(example_name, sheet_name, gen_sheet['rules'], ref_sheet['rules']):
+                has_differences = True
+    for part in sorted(gen['charts'].keys() | ref['charts'].keys()):
+        if part not in gen['charts'] or part not in ref['charts']:
+            # Missing and extra chart parts are already reported with the other parts
+            continue
+        if compare_chart_trees(example_name, part, gen['charts'][part], ref['charts'][part]):
+            has_differences = True
+
+    return has_differences
+
+
+def check_snapshot(example_name, snapshot_dir=SNAPSHOT_DIR, generated=None, ignore_styles=False, max_findings=None):
+    """Compare a generated workbook with the example's reference snapshot"""
+    path = snapshot_path(example_name, snapshot_dir)
+    if not path.exists():
+        print(f"[{example_name}] ⚠️ Reference snapshot not found: {path}")
+        print("Build it with: python3 utils/snapshots.py build " + example_name)
+        return False
+
+    findings = Findings(example_name, max_findings)
+    try:
+        with findings:
+            ref = load_snapshot(path)
+            gen = build_snapshot(resolve_generated(example_name, generated))
+            has_differences = compare_snapshots(example_name, gen, ref, findings,
+                                                compare_styles=not ignore_styles and example_name != "chartsheet")
+            findings.stopped_note()
+        return not has_differences
+
+    except Exception as e:
+        print(f"[{example_name}] ❌ Error comparing with reference snapshot: {e}")
+        return False
+
+
+def _load_any(path):
+    """Load a snapshot file, or build the snapshot of a workbook"""
+    path = Path(path)
+    if path.name.endswith(SNAPSHOT_SUFFIX):
+        return load_snapshot(path)
+    return build_snapshot(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build, compare and show normalized reference snapshots")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subparsers.add_parser("build", help="Snapshot reference workbooks")
+    build_parser.add_argument("examples", nargs="*", help="Examples to snapshot (default: every reference)")
+    build_parser.add_argument("--reference-dir", default=str(REFERENCE_DIR), help="Directory with the reference workbooks")
+    build_parser.add_argument("--snapshot-dir", default=str(SNAPSHOT_DIR), help="Directory to write the snapshots to")
+
+    diff_parser = subparsers.add_parser("diff", help="Compare two workbooks or snapshots")
+    diff_parser.add_argument("generated", help="Generated workbook or snapshot")
+    diff_parser.add_argument("reference", help="Reference workbook or snapshot")
+    diff_parser.add_argument("--ignore-styles", action="store_true", help="Ignore style differences")
+
+    show_parser = subparsers.add_parser("show", help="Print a snapshot as JSON lines")
+    show_parser.add_argument("source", help="Example name, workbook or snapshot file")
+
+    args = parser.parse_args()
+
+    if args.command == "build":
+        reference_dir = Path(args.reference_dir)
+        if args.examples:
+            sources = []
+            for example_name in args.examples:
+                for suffix in (".xlsm", ".xlsx"):
+                    if (reference_dir / f"{example_name}{suffix}").exists():
+                        sources.append(reference_dir / f"{example_name}{suffix}")
+                        break
+                else:
+                    print(f"❌ Reference file not found for {example_name}")
+                    return 1
+        else:
+            sources = sorted(list(reference_dir.glob("*.xlsx")) + list(reference_dir.glob("*.xlsm")))
+        for source in sources:
+            path = snapshot_path(source.stem, args.snapshot_dir)
+            snapshot = build_snapshot(source)
+            # Record where the snapshot came from without this checkout's location
+            snapshot['source'] = str(get_relative_path(source.resolve(), PROJECT_ROOT.resolve()))
+            write_snapshot(snapshot, path)
+            print(f"✅ {source.name} -> {path}")
+        return 0
+
+    if args.command == "diff":
+        findings = Findings("diff")
+        with findings:
+            has_differences = compare_snapshots("diff", _load_any(args.generated), _load_any(args.reference),
+                                                findings, compare_styles=not args.ignore_styles)
+        if has_differences:
+            print("❌ Snapshots differ")
+            return 1
+        print("✅ Snapshots match")
+        return 0
+
+    source = Path(args.source)
+    if not source.exists():
+        source = snapshot_path(args.source)
+    snapshot = _load_any(source)
+    for text in snapshot_lines(snapshot):
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,492 @@
+#!/usr/bin/env python3
+"""
+Synthetic workbook corpus for benchmarking the autocheck tool.
+
+The examples only produce tiny workbooks, so they say nothing about how the
+checks scale. This module streams raw SpreadsheetML straight into a zip
+archive, from a few thousand to tens of millions of cells, with knobs for
+formula density, string and shared-string ratios, style count, hidden rows
+and charts. Rows are written as they are generated and strings that occur
+once are spooled to a temporary file, so memory stays flat at any size.
+
+The same spec and seed always produce the same workbook. A mutated copy
+for the "generated" side differs from the reference only where the
+requested mutations say so, which makes each check's findings predictable.
+
+Common usage:
+  python3 utils/synth_corpus.py --cells 1000000 --out /tmp/corpus             # One reference/generated pair
+  python3 utils/synth_corpus.py --ladder --out /tmp/corpus                     # 10k to 10M cells
+  python3 utils/synth_corpus.py --cells 100000 --mutate value=10,hidden=2 --out /tmp/corpus
+
+The corpus layout matches what the checks expect: references in
+<out>/reference-xls/<name>.xlsx and the generated side in <out>/<name>.xlsx.
+"""
+
+import sys
+import random
+import argparse
+import tempfile
+import collections
+import zipfile
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+try:
+    from utils.xlsx_parts import column_letters
+except ModuleNotFoundError:
+    from xlsx_parts import column_letters
+
+# Cell counts of the standard size ladder
+LADDER = (10_000, 100_000, 1_000_000, 10_000_000)
+
+CorpusSpec = collections.namedtuple('CorpusSpec', [
+    'cells',            # total number of cells, spread over rows of `columns` cells
+    'columns',          # cells per row
+    'formula_density',  # fraction of cells (outside column A) holding a formula
+    'string_ratio',     # fraction of the remaining cells holding a string
+    'shared_ratio',     # fraction of string cells that reuse a string from a small pool
+    'styles',           # number of cell formats (cellXfs) used across the cells
+    'hidden_rows',      # fraction of rows that are hidden
+    'charts',           # number of charts drawn over column data
+    'seed',
+])
+
+DEFAULT_SPEC = CorpusSpec(cells=100_000, columns=20, formula_density=0.1, string_ratio=0.3,
+                          shared_ratio=0.8, styles=8, hidden_rows=0.01, charts=1, seed=1)
+
+# Distinct strings in the shared pool
+STRING_POOL_SIZE = 1000
+
+# Mutation kinds and the check that is expected to report them. A truncated or
+# null string is also one value difference for the content check, since only
+# the suffix is added to the cell's own text.
+MUTATIONS = {
+    'value': "content",       # a number changes
+    'string': "content",      # a string changes
+    'formula': "content",     # a formula references a different cell
+    'style': "content",       # a cell gets a different format
+    'hidden': "rows",         # a visible row becomes hidden
+    'truncate': "strings",    # a string gets a trailing ellipsis
+    'null': "strings",        # a string gets an escaped null character
+    'chart': "charts",        # a chart series points at a different range
+}
+
+# The kind of cell each cell mutation lands on; 'any' is any cell outside column A
+MUTATION_TARGETS = {
+    'value': 'number',
+    'string': 'string',
+    'truncate': 'string',
+    'null': 'string',
+    'formula': 'formula',
+    'style': 'any',
+}
+
+NS_MAIN = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+NS_R = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+NS_PR = "http://schemas.openxmlformats.org/package/2006/relationships"
+NS_CT = "http://schemas.openxmlformats.org/package/2006/content-types"
+NS_C = "http://schemas.openxmlformats.org/drawingml/2006/chart"
+NS_A = "http://schemas.openxmlformats.org/drawingml/2006/main"
+NS_XDR = "http://schemas.openxmlformats.org/drawingml/2006/spreadsheetDrawing"
+REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+CT = "application/vnd.openxmlformats-officedocument"
+
+XML_HEADER = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+
+# Rows per chart series
+CHART_POINTS = 50
+
+
+def parse_mutations(text):
+    """Parse 'value=10,hidden=2' into {'value': 10, 'hidden': 2}"""
+    mutations = {}
+    for item in (text or "").split(","):
+        if not item.strip():
+            continue
+        kind, _, count = item.partition("=")
+        kind = kind.strip()
+        if kind not in MUTATIONS:
+            raise ValueError(f"Unknown mutation: {kind} (available: {', '.join(MUTATIONS)})")
+        mutations[kind] = int(count) if count else 1
+    return mutations
+
+
+def _iter_cells(spec):
+    """Yield (row, hidden, cells) per row, cells being [(col, style, kind, value, shared_roll)].
+
+    Every cell draws the same random numbers whatever it turns out to be,
+    so a mutation never shifts the cells after it.
+    """
+    rng = random.Random(spec.seed)
+    rows = max(1, spec.cells // spec.columns)
+    string_limit = spec.formula_density + (1 - spec.formula_density) * spec.string_ratio
+    for row in range(1, rows + 1):
+        hidden = rng.random() < spec.hidden_rows
+        cells = []
+        for col in range(1, spec.columns + 1):
+            style = rng.randrange(spec.styles) if spec.styles > 1 else 0
+            roll = rng.random()
+            shared_roll = rng.random()
+            value = rng.randint(0, 1_000_000)
+            if col > 1 and roll < spec.formula_density:
+                kind = 'formula'
+            elif col > 1 and roll < string_limit:
+                kind = 'string'
+            else:
+                kind = 'number'
+            cells.append((col, style, kind, value, shared_roll))
+        yield row, hidden, cells
+
+
+def plan_mutations(spec, mutations):
+    """Choose where each mutation applies.
+
+    Rows, charts and cells are drawn without replacement, and a cell
+    mutation only lands on a cell of the kind it changes (MUTATION_TARGETS),
+    so each mutation yields exactly one finding in the check MUTATIONS
+    names for it, at the cell it was planned for. The cells are reservoir
+    sampled over one pass of the cell generator; when a kind has fewer
+    cells than requested, all of them are mutated.
+
+    Returns ({(row, col): kind}, {hidden row numbers}, {chart numbers}).
+    """
+    rng = random.Random(f"mutations-{spec.seed}")
+    rows = max(1, spec.cells // spec.columns)
+    hidden = set(rng.sample(range(1, rows + 1), min(rows, mutations.get('hidden', 0))))
+    charts = set(rng.sample(range(1, spec.charts + 1), min(spec.charts, mutations.get('chart', 0))))
+
+    wanted = collections.Counter()
+    for kind, count in mutations.items():
+        if kind in MUTATION_TARGETS:
+            wanted[MUTATION_TARGETS[kind]] += count
+    if not wanted:
+        return {}, hidden, charts
+    # Style mutations go to any cell the others left alone, so draw spares for those
+    if wanted['any']:
+        wanted['any'] += sum(count for target, count in wanted.items() if target != 'any')
+
+    samples = {target: [] for target in wanted}
+    seen = collections.Counter()
+    for row, _, cells in _iter_cells(spec):
+        for col, _, cell_kind, _, _ in cells:
+            # Column A holds the chart data and stays numeric
+            if col == 1:
+                continue
+            for target in (cell_kind, 'any'):
+                if target not in samples:
+                    continue
+                seen[target] += 1
+                if len(samples[target]) < wanted[target]:
+                    samples[target].append((row, col))
+                else:
+                    index = rng.randrange(seen[target])
+                    if index < wanted[target]:
+                        samples[target][index] = (row, col)
+
+    planned = {}
+    for kind, count in sorted(mutations.items()):
+        target = MUTATION_TARGETS.get(kind)
+        if target in (None, 'any'):
+            continue
+        for cell in samples[target][:count]:
+            planned[cell] = kind
+        del samples[target][:count]
+    if mutations.get('style'):
+        free = [cell for cell in samples['any'] if cell not in planned]
+        for cell in free[:mutations['style']]:
+            planned[cell] = 'style'
+    return planned, hidden, charts
+
+
+def _styles_xml(count):
+    """A stylesheet with `count` cell formats, each with its own font"""
+    fonts = []
+    xfs = []
+    for index in range(max(1, count)):
+        bold = "<b/>" if index % 2 else ""
+        italic = "<i/>" if index % 4 >= 2 else ""
+        color = f'<color rgb="FF{(index * 2654435761) & 0xFFFFFF:06X}"/>' if index else '<color theme="1"/>'
+        fonts.append(f'<font>{bold}{italic}<sz val="11"/>{color}<name val="Calibri"/><family val="2"/>'
+                     f'<scheme val="minor"/></font>')
+        apply = ' applyFont="1"' if index else ""
+        xfs.append(f'<xf numFmtId="0" fontId="{index}" fillId="0" borderId="0" xfId="0"{apply}/>')
+    return (f'{XML_HEADER}<styleSheet xmlns="{NS_MAIN}">'
+            f'<fonts count="{len(fonts)}">{"".join(fonts)}</fonts>'
+            '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+            '<fill><patternFill patternType="gray125"/></fill></fills>'
+            '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+            '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+            f'<cellXfs count="{len(xfs)}">{"".join(xfs)}</cellXfs>'
+            '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+            '<dxfs count="0"/><tableStyles count="0" defaultTableStyle="TableStyleMedium9" '
+            'defaultPivotStyle="PivotStyleLight16"/></styleSheet>')
+
+
+def _chart_xml(number, rows, moved=False):
+    """A clustered column chart over a block of column A"""
+    first = ((number - 1) * CHART_POINTS) % max(1, rows - CHART_POINTS) + 1 if rows > CHART_POINTS else 1
+    if moved:
+        first += 1
+    last = min(rows, first + CHART_POINTS - 1)
+    return (f'{XML_HEADER}<c:chartSpace xmlns:c="{NS_C}" xmlns:a="{NS_A}" xmlns:r="{NS_R}">'
+            '<c:lang val="en-US"/><c:chart><c:plotArea><c:layout/>'
+            '<c:barChart><c:barDir val="col"/><c:grouping val="clustered"/>'
+            '<c:ser><c:idx val="0"/><c:order val="0"/>'
+            f'<c:val><c:numRef><c:f>Sheet1!$A${first}:$A${last}</c:f></c:numRef></c:val></c:ser>'
+            f'<c:axId val="{50010001 + number * 2}"/><c:axId val="{50010002 + number * 2}"/></c:barChart>'
+            f'<c:catAx><c:axId val="{50010001 + number * 2}"/><c:scaling><c:orientation val="minMax"/></c:scaling>'
+            f'<c:axPos val="b"/><c:crossAx val="{50010002 + number * 2}"/></c:catAx>'
+            f'<c:valAx><c:axId val="{50010002 + number * 2}"/><c:scaling><c:orientation val="minMax"/></c:scaling>'
+            f'<c:axPos val="l"/><c:crossAx val="{50010001 + number * 2}"/></c:valAx>'
+            '</c:plotArea><c:plotVisOnly val="1"/></c:chart></c:chartSpace>')
+
+
+def _drawing_xml(charts, columns):
+    anchors = []
+    for number in range(1, charts + 1):
+        top = (number - 1) * 16 + 1
+        anchors.append(
+            f'<xdr:twoCellAnchor><xdr:from><xdr:col>{columns + 1}</xdr:col><xdr:colOff>0</xdr:colOff>'
+            f'<xdr:row>{top}</xdr:row><xdr:rowOff>0</xdr:rowOff></xdr:from>'
+            f'<xdr:to><xdr:col>{columns + 8}</xdr:col><xdr:colOff>0</xdr:colOff>'
+            f'<xdr:row>{top + 14}</xdr:row><xdr:rowOff>0</xdr:rowOff></xdr:to>'
+            f'<xdr:graphicFrame macro=""><xdr:nvGraphicFramePr><xdr:cNvPr id="{number + 1}" name="Chart {number}"/>'
+            '<xdr:cNvGraphicFramePr/></xdr:nvGraphicFramePr><xdr:xfrm><a:off x="0" y="0"/><a:ext cx="0" cy="0"/>'
+            f'</xdr:xfrm><a:graphic><a:graphicData uri="{NS_C}"><c:chart xmlns:c="{NS_C}" xmlns:r="{NS_R}" '
+            f'r:id="rId{number}"/></a:graphicData></a:graphic></xdr:graphicFrame><xdr:clientData/>'
+            '</xdr:twoCellAnchor>')
+    return f'{XML_HEADER}<xdr:wsDr xmlns:xdr="{NS_XDR}" xmlns:a="{NS_A}">{"".join(anchors)}</xdr:wsDr>'
+
+
+def _rels_xml(relationships):
+    rels = "".join(f'<Relationship Id="{rel_id}" Type="{rel_type}" Target="{target}"/>'
+                   for rel_id, rel_type, target in relationships)
+    return f'{XML_HEADER}<Relationships xmlns="{NS_PR}">{rels}</Relationships>'
+
+
+def _content_types_xml(charts):
+    overrides = [
+        ("/xl/workbook.xml", f"{CT}.spreadsheetml.sheet.main+xml"),
+        ("/xl/worksheets/sheet1.xml", f"{CT}.spreadsheetml.worksheet+xml"),
+        ("/xl/styles.xml", f"{CT}.spreadsheetml.styles+xml"),
+        ("/xl/sharedStrings.xml", f"{CT}.spreadsheetml.sharedStrings+xml"),
+    ]
+    if charts:
+        overrides.append(("/xl/drawings/drawing1.xml", f"{CT}.drawing+xml"))
+        overrides.extend((f"/xl/charts/chart{number}.xml", f"{CT}.drawingml.chart+xml")
+                         for number in range(1, charts + 1))
+    parts = "".join(f'<Override PartName="{name}" ContentType="{content_type}"/>'
+                    for name, content_type in overrides)
+    return (f'{XML_HEADER}<Types xmlns="{NS_CT}">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            f'<Default Extension="xml" ContentType="application/xml"/>{parts}</Types>')
+
+
+class _SharedStrings:
+    """Shared-string table built while the sheet is written.
+
+    Pool strings take the first indexes; strings used once are appended
+    after them and spooled to a temporary file instead of being kept.
+    """
+
+    def __init__(self):
+        self.pool = [f"Pool string {index}" for index in range(STRING_POOL_SIZE)]
+        self.spool = tempfile.TemporaryFile(mode="w+", encoding="utf-8")
+        self.unique = 0
+        self.references = 0
+
+    def pooled(self, index):
+        self.references += 1
+        return index
+
+    def add(self, text):
+        self.references += 1
+        self.spool.write(f"<si><t>{escape(text)}</t></si>")
+        self.unique += 1
+        return STRING_POOL_SIZE + self.unique - 1
+
+    def write(self, stream):
+        count = STRING_POOL_SIZE + self.unique
+        stream.write(f'{XML_HEADER}<sst xmlns="{NS_MAIN}" count="{self.references}" uniqueCount="{count}">'
+                     .encode())
+        stream.write("".join(f"<si><t>{text}</t></si>" for text in self.pool).encode())
+        self.spool.seek(0)
+        for chunk in iter(lambda: self.spool.read(1024 * 1024), ""):
+            stream.write(chunk.encode())
+        stream.write(b"</sst>")
+
+    def close(self):
+        self.spool.close()
+
+
+def _write_sheet(stream, spec, strings, mutated_cells, mutated_rows):
+    """Stream the worksheet XML row by row, buffering one row at a time"""
+    rows = max(1, spec.cells // spec.columns)
+    columns = spec.columns
+    letters = [column_letters(col) for col in range(1, columns + 1)]
+    last_cell = f"{letters[-1]}{rows}"
+
+    stream.write(f'{XML_HEADER}<worksheet xmlns="{NS_MAIN}" xmlns:r="{NS_R}"><dimension ref="A1:{last_cell}"/>'
+                 '<sheetViews><sheetView tabSelected="1" workbookViewId="0"/></sheetViews>'
+                 '<sheetFormatPr defaultRowHeight="15"/><sheetData>'.encode())
+
+    for row, hidden, cells in _iter_cells(spec):
+        if row in mutated_rows:
+            hidden = not hidden
+        hidden_attr = ' hidden="1"' if hidden else ""
+        parts = [f'<row r="{row}" spans="1:{columns}"{hidden_attr}>']
+        previous = None
+        for col, style, kind, value, shared_roll in cells:
+            ref = f"{letters[col - 1]}{row}"
+            mutation = mutated_cells.get((row, col))
+            if mutation == 'style':
+                style = (style + 1) % max(2, spec.styles)
+            style_attr = f' s="{style}"' if style else ""
+
+            if kind == 'formula':
+                cached = previous * 2 if isinstance(previous, int) else 0
+            elif kind == 'string':
+                cached = None
+            else:
+                cached = value
+
+            if mutation == 'value':
+                parts.append(f'<c r="{ref}"{style_attr}><v>{value + 1}</v></c>')
+            elif mutation == 'formula':
+                parts.append(f'<c r="{ref}"{style_attr}><f>{letters[col - 2]}{row}*3</f><v>0</v></c>')
+            elif mutation == 'string':
+                parts.append(f'<c r="{ref}"{style_attr} t="s"><v>{strings.add(f"Changed {row}:{col}")}</v></c>')
+            elif kind == 'formula':
+                parts.append(f'<c r="{ref}"{style_attr}><f>{letters[col - 2]}{row}*2</f><v>{cached}</v></c>')
+            elif kind == 'string':
+                pooled = shared_roll < spec.shared_ratio
+                if mutation in ('truncate', 'null'):
+                    # The cell's own text with the suffix, so only the suffix differs
+                    text = strings.pool[value % STRING_POOL_SIZE] if pooled else f"Text {row}:{col} {value}"
+                    index = strings.add(text + {'truncate': "...", 'null': "_x0000_"}[mutation])
+                elif pooled:
+                    index = strings.pooled(value % STRING_POOL_SIZE)
+                else:
+                    index = strings.add(f"Text {row}:{col} {value}")
+                parts.append(f'<c r="{ref}"{style_attr} t="s"><v>{index}</v></c>')
+            else:
+                parts.append(f'<c r="{ref}"{style_attr}><v>{value}</v></c>')
+            previous = cached
+        parts.append('</row>')
+        stream.write("".join(parts).encode())
+
+    stream.write('</sheetData><pageMargins left="0.7" right="0.7" top="0.75" bottom="0.75" '
+                 'header="0.3" footer="0.3"/>'.encode())
+    if spec.charts:
+        stream.write('<drawing r:id="rId1"/>'.encode())
+    stream.write(b'</worksheet>')
+
+
+def write_workbook(path, spec=DEFAULT_SPEC, mutations=None, compresslevel=6):
+    """Write a synthetic workbook; mutations maps mutation kinds to counts"""
+    mutated_cells, mutated_rows, mutated_charts = plan_mutations(spec, mutations or {})
+    rows = max(1, spec.cells // spec.columns)
+    strings = _SharedStrings()
+
+    try:
+        with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED, compresslevel=compresslevel) as xlsx_zip:
+            xlsx_zip.writestr("[Content_Types].xml", _content_types_xml(spec.charts))
+            xlsx_zip.writestr("_rels/.rels", _rels_xml([("rId1", f"{REL}/officeDocument", "xl/workbook.xml")]))
+            xlsx_zip.writestr("xl/workbook.xml", (
+                f'{XML_HEADER}<workbook xmlns="{NS_MAIN}" xmlns:r="{NS_R}"><bookViews><workbookView/></bookViews>'
+                '<sheets><sheet name="Sheet1" sheetId="1" r:id="rId1"/></sheets>'
+                '<calcPr calcId="124519" fullCalcOnLoad="1"/></workbook>'))
+            xlsx_zip.writestr("xl/_rels/workbook.xml.rels", _rels_xml([
+                ("rId1", f"{REL}/worksheet", "worksheets/sheet1.xml"),
+                ("rId2", f"{REL}/styles", "styles.xml"),
+                ("rId3", f"{REL}/sharedStrings", "sharedStrings.xml"),
+            ]))
+            xlsx_zip.writestr("xl/styles.xml", _styles_xml(spec.styles))
+
+            with xlsx_zip.open("xl/worksheets/sheet1.xml", "w", force_zip64=True) as stream:
+                _write_sheet(stream, spec, strings, mutated_cells, mutated_rows)
+
+            with xlsx_zip.open("xl/sharedStrings.xml", "w", force_zip64=True) as stream:
+                strings.write(stream)
+
+            if spec.charts:
+                xlsx_zip.writestr("xl/worksheets/_rels/sheet1.xml.rels", _rels_xml([
+                    ("rId1", f"{REL}/drawing", "../drawings/drawing1.xml")]))
+                xlsx_zip.writestr("xl/drawings/drawing1.xml", _drawing_xml(spec.charts, spec.columns))
+                xlsx_zip.writestr("xl/drawings/_rels/drawing1.xml.rels", _rels_xml([
+                    (f"rId{number}", f"{REL}/chart", f"../charts/chart{number}.xml")
+                    for number in range(1, spec.charts + 1)]))
+                for number in range(1, spec.charts + 1):
+                    xlsx_zip.writestr(f"xl/charts/chart{number}.xml",
+                                      _chart_xml(number, rows, moved=number in mutated_charts))
+    finally:
+        strings.close()
+    return Path(path)
+
+
+def corpus_name(spec):
+    """Name of a corpus workbook, e.g. synth_100k"""
+    for unit, size in (("M", 1_000_000), ("k", 1_000)):
+        if spec.cells >= size and spec.cells % size == 0:
+            return f"synth_{spec.cells // size}{unit}"
+    return f"synth_{spec.cells}"
+
+
+def write_pair(out_dir, spec=DEFAULT_SPEC, mutations=None, name=None, compresslevel=6):
+    """Write a reference workbook and its (possibly mutated) generated counterpart.
+
+    Returns (name, reference path, generated path).
+    """
+    out_dir = Path(out_dir)
+    name = name or corpus_name(spec)
+    reference_dir = out_dir / "reference-xls"
+    reference_dir.mkdir(parents=True, exist_ok=True)
+    reference_file = write_workbook(reference_dir / f"{name}.xlsx", spec, compresslevel=compresslevel)
+    generated_file = write_workbook(out_dir / f"{name}.xlsx", spec, mutations, compresslevel=compresslevel)
+    return name, reference_file, generated_file
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic workbooks for benchmarking the checks")
+    parser.add_argument("--out", required=True, help="Directory to write the corpus to")
+    parser.add_argument("--cells", type=int, default=DEFAULT_SPEC.cells, help="Number of cells")
+    parser.add_argument("--ladder", action="store_true",
+                        help=f"Write one pair per size in {', '.join(str(size) for size in LADDER)} cells")
+    parser.add_argument("--columns", type=int, default=DEFAULT_SPEC.columns, help="Cells per row")
+    parser.add_argument("--formula-density", type=float, default=DEFAULT_SPEC.formula_density,
+                        help="Fraction of cells with a formula")
+    parser.add_argument("--string-ratio", type=float, default=DEFAULT_SPEC.string_ratio,
+                        help="Fraction of the non-formula cells with a string")
+    parser.add_argument("--shared-ratio", type=float, default=DEFAULT_SPEC.shared_ratio,
+                        help="Fraction of string cells drawn from a shared pool")
+    parser.add_argument("--styles", type=int, default=DEFAULT_SPEC.styles, help="Number of cell formats")
+    parser.add_argument("--hidden-rows", type=float, default=DEFAULT_SPEC.hidden_rows,
+                        help="Fraction of hidden rows")
+    parser.add_argument("--charts", type=int, default=DEFAULT_SPEC.charts, help="Number of charts")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SPEC.seed, help="Random seed")
+    parser.add_argument("--mutate", help=f"Mutations for the generated side, e.g. value=10,hidden=2 "
+                                         f"(kinds: {', '.join(MUTATIONS)})")
+    parser.add_argument("--name", help="Workbook name (default: derived from the cell count)")
+
+    args = parser.parse_args()
+
+    try:
+        mutations = parse_mutations(args.mutate)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 1
+
+    sizes = LADDER if args.ladder else (args.cells,)
+    for cells in sizes:
+        spec = CorpusSpec(cells=cells, columns=args.columns, formula_density=args.formula_density,
+                          string_ratio=args.string_ratio, shared_ratio=args.shared_ratio, styles=args.styles,
+                          hidden_rows=args.hidden_rows, charts=args.charts, seed=args.seed)
+        name, reference_file, generated_file = write_pair(args.out, spec, mutations,
+                                                          name=None if args.ladder else args.name)
+        print(f"✅ {name}: {reference_file} ({reference_file.stat().st_size} bytes), "
+              f"{generated_file} ({generated_file.stat().st_size} bytes)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
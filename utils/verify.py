@@ -9,11 +9,26 @@ import os
 import sys
 import subprocess
 import time
-import shutil
+import glob
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 import argparse
-from PIL import Image
+from PIL import Image, PngImagePlugin
 
+try:
+    from utils.artifact_store import store_artifact
+except ModuleNotFoundError:
+    from artifact_store import store_artifact
+
+# The automated screenshot comparison needs numpy, which is optional
+try:
+    try:
+        from utils import screenshot_diff
+    except ModuleNotFoundError:
+        import screenshot_diff
+except ImportError:
+    screenshot_diff = None
 
 
 def check_screenshot_exists(example_name):
@@ -78,6 +93,9 @@ def cleanup_excel_file(example_name, zig_excel_file, prefix=""):
     """
     Move the Zig-generated Excel file to the results directory.
     
+    The file goes into the artifact store (see artifact_store.py), so a
+    file identical to one stored before takes no extra space.
+    
     Args:
         example_name: The name of the example
         zig_excel_file: Path to the Zig-generated Excel file
@@ -86,21 +104,12 @@ def cleanup_excel_file(example_name, zig_excel_file, prefix=""):
     Returns:
         bool: True if the file was moved successfully, False otherwise
     """
-    root_dir = Path(__file__).parent.parent
-    results_dir = root_dir / "testing" / "results" / example_name
-    
-    # Create the directory if it doesn't exist
-    results_dir.mkdir(parents=True, exist_ok=True)
-    
     # Special case for macro example which uses .xlsm
     extension = ".xlsm" if example_name == "macro" else ".xlsx"
     
-    # Destination path 
-    dest_file = results_dir / f"{prefix}{example_name}{extension}"
-    
     try:
         # Move the file
-        shutil.move(str(zig_excel_file), str(dest_file))
+        store_artifact(example_name, zig_excel_file, name=f"{prefix}{example_name}{extension}")
         # Print relative path instead of full path
         relative_path = f"testing/results/{example_name}/{prefix}{example_name}{extension}"
         print(f"✅ Moved Excel file to: {relative_path}")
@@ -110,26 +119,90 @@ def cleanup_excel_file(example_name, zig_excel_file, prefix=""):
         return False
 
 
+# PNG text chunk recording the crop margins already applied to a file
+CROP_METADATA_KEY = "zig-xlsx-crop"
+
+
+def _crop_margins(left_crop, top_crop, right_crop, bottom_crop):
+    return f"{left_crop},{top_crop},{right_crop},{bottom_crop}"
+
+
+def crop_png(file_path, top_crop=0, bottom_crop=0, left_crop=0, right_crop=0, skip_cropped=True):
+    """Crop pixels from the edges of a PNG file, replacing it atomically.
+
+    The margins are recorded in the PNG metadata; when skip_cropped is set,
+    a file that already carries the same margins is left alone. Returns
+    True if the file was cropped and False if it was skipped.
+    """
+    file_path = Path(file_path)
+    margins = _crop_margins(left_crop, top_crop, right_crop, bottom_crop)
+    with Image.open(file_path) as img:
+        if skip_cropped and img.info.get(CROP_METADATA_KEY) == margins:
+            return False
+        width, height = img.size
+        cropped = img.crop((
+            left_crop,
+            top_crop, 
+            width - right_crop, 
+            height - bottom_crop
+        ))
+        metadata = PngImagePlugin.PngInfo()
+        metadata.add_text(CROP_METADATA_KEY, margins)
+        icc_profile = img.info.get("icc_profile")
+
+    # Write next to the original and rename over it, so an interrupted crop never leaves a truncated file
+    fd, tmp_name = tempfile.mkstemp(prefix=f".{file_path.stem}-", suffix=".png", dir=file_path.parent)
+    try:
+        with os.fdopen(fd, "wb") as tmp_file:
+            cropped.save(tmp_file, format="PNG", pnginfo=metadata, icc_profile=icc_profile)
+        os.chmod(tmp_name, file_path.stat().st_mode & 0o777)
+        os.replace(tmp_name, file_path)
+    except BaseException:
+        os.unlink(tmp_name)
+        raise
+    return True
+
+
 def process_screenshot(screenshot_file, top_crop=25, bottom_crop=155, left_crop=0, right_crop=0):
     """Post-process screenshot to crop pixels from edges.
     Default crops 25px from top (Excel title bar) and 155px from bottom (Excel status bar)."""
     try:
-        with Image.open(screenshot_file) as img:
-            width, height = img.size
-            cropped = img.crop((
-                left_crop,
-                top_crop, 
-                width - right_crop, 
-                height - bottom_crop
-            ))
-            cropped.save(screenshot_file)
-            return True
+        # A new capture is always cropped, even if an older one had the same margins
+        crop_png(screenshot_file, top_crop, bottom_crop, left_crop, right_crop, skip_cropped=False)
+        return True
     except Exception as e:
         relative_path = str(screenshot_file).split(str(Path(__file__).parent.parent) + "/")[1]
         print(f"Error processing screenshot {relative_path}: {e}")
         return False
 
 
+def suggest_verdict(screenshot_file):
+    """Compare the two halves of a screenshot automatically and return 'y', 'n' or None.
+
+    Differing tiles are shown in a diff_<example>.png heat map next to the
+    screenshot. None is returned when numpy is not installed, the
+    comparison fails or the screenshot is too small to score.
+    """
+    if screenshot_diff is None:
+        return None
+    try:
+        result, heatmap_file = screenshot_diff.triage_capture(screenshot_file)
+    except Exception as e:
+        print(f"Warning: Automated screenshot comparison failed: {e}")
+        return None
+
+    verdict = screenshot_diff.suggested_verdict(result)
+    if verdict is None:
+        print("Warning: Screenshot is too small for the automated comparison")
+    elif verdict == 'y':
+        print("✅ Automated comparison found no differing tiles")
+    else:
+        relative_path = f"testing/results/{heatmap_file.parent.name}/{heatmap_file.name}"
+        print(f"⚠️ Automated comparison flagged {result.flagged} of {result.scores.size} tiles, "
+              f"see {relative_path}")
+    return verdict
+
+
 def take_screenshot(example_name, top_crop=25, bottom_crop=155, left_crop=0, right_crop=0):
     """
     Take a screenshot of the Excel file.
@@ -210,6 +283,8 @@ def take_screenshot(example_name, top_crop=25, bottom_crop=155, left_crop=0, rig
     # Take screenshot using screencapture
     relative_screenshot_path = f"testing/results/{example_name}/comparison_{example_name}.png"
     print(f"Taking screenshot and saving to: {relative_screenshot_path}")
+    # The old screenshot is a link into the artifact store, which must not be written through
+    screenshot_file.unlink(missing_ok=True)
     try:
         subprocess.run([
             "screencapture",
@@ -223,6 +298,8 @@ def take_screenshot(example_name, top_crop=25, bottom_crop=155, left_crop=0, rig
             print("Screenshot processed successfully")
         else:
             print("Warning: Failed to process screenshot")
+        if screenshot_file.exists():
+            store_artifact(example_name, screenshot_file)
             
     except subprocess.CalledProcessError as e:
         print(f"Error taking screenshot: {e}")
@@ -258,10 +335,14 @@ def take_screenshot(example_name, top_crop=25, bottom_crop=155, left_crop=0, rig
             print(f"Error opening screenshot: {e}")
             # Continue anyway, as this is not critical
         
-        # Ask user if output looks correct
+        # Ask user if output looks correct, suggesting the automated verdict
         print("\n=== VISUAL VERIFICATION ===")
         print("Does the Excel output look correct? (y/n)")
-        user_input = input("Enter y or n: ").lower()
+        suggestion = suggest_verdict(screenshot_file)
+        if suggestion:
+            user_input = input(f"Enter y or n [{suggestion}]: ").lower() or suggestion
+        else:
+            user_input = input("Enter y or n: ").lower()
         
         # Save verification result in the same directory as the screenshot
         result_file = results_dir / f"{example_name}_output.txt"
@@ -340,22 +421,65 @@ def take_simple_screenshot(screenshot_file, top_crop=25, bottom_crop=30, left_cr
 def crop_existing_file(file_path, top_crop=25, bottom_crop=30, left_crop=0, right_crop=0):
     """Just crop an existing PNG file."""
     try:
-        with Image.open(file_path) as img:
-            width, height = img.size
-            cropped = img.crop((
-                left_crop,
-                top_crop, 
-                width - right_crop, 
-                height - bottom_crop
-            ))
-            cropped.save(file_path)
+        if crop_png(file_path, top_crop, bottom_crop, left_crop, right_crop):
             print("✅ File cropped successfully")
-            return True
+        else:
+            print("✅ File already cropped with these margins, skipped")
+        return True
     except Exception as e:
         print(f"❌ Error cropping file: {e}")
         return False
 
 
+def expand_crop_targets(patterns):
+    """Expand file names, glob patterns and directories into a sorted list of PNG files"""
+    files = set()
+    for pattern in patterns:
+        path = Path(pattern)
+        if path.is_dir():
+            files.update(path.rglob("*.png"))
+        elif path.exists():
+            files.add(path)
+        else:
+            matches = [Path(match) for match in glob.glob(pattern, recursive=True) if os.path.isfile(match)]
+            if not matches:
+                print(f"⚠️ No files match: {pattern}")
+            files.update(matches)
+    # Temporary files from an interrupted crop are never targets
+    return sorted(file for file in files if not file.name.startswith("."))
+
+
+def crop_files(patterns, top_crop=0, bottom_crop=0, left_crop=0, right_crop=0, jobs=None):
+    """Crop many PNG files in a thread pool; Pillow releases the GIL while decoding and encoding"""
+    files = expand_crop_targets(patterns)
+    if not files:
+        print("❌ No PNG files to crop")
+        return False
+    if len(files) == 1:
+        return crop_existing_file(files[0], top_crop, bottom_crop, left_crop, right_crop)
+
+    cropped = skipped = 0
+    failed = []
+    with ThreadPoolExecutor(max_workers=jobs or min(32, (os.cpu_count() or 1) + 4)) as pool:
+        futures = {
+            pool.submit(crop_png, file, top_crop, bottom_crop, left_crop, right_crop): file
+            for file in files
+        }
+        for future in as_completed(futures):
+            try:
+                if future.result():
+                    cropped += 1
+                else:
+                    skipped += 1
+            except Exception as e:
+                failed.append(futures[future])
+                print(f"❌ Error cropping {futures[future]}: {e}")
+
+    print(f"✅ Cropped {cropped} files, skipped {skipped} already cropped"
+          + (f", {len(failed)} failed" if failed else ""))
+    return not failed
+
+
 def main():
     """Main function to create screenshots for Zig examples."""
     parser = argparse.ArgumentParser(description="Create screenshots for Zig examples")
@@ -366,7 +490,11 @@ def main():
     parser.add_argument("--right", type=int, default=0, help="Pixels to crop from right")
     parser.add_argument("--top", type=int, default=0, help="Pixels to crop from top")
     parser.add_argument("--bottom", type=int, default=0, help="Pixels to crop from bottom")
-    parser.add_argument("--crop", help="Just crop an existing PNG file")
+    parser.add_argument("--crop", nargs="+", metavar="PATH",
+                        help="Just crop existing PNG files (file names, glob patterns or directories)")
+    parser.add_argument("--jobs", "-j", type=int, help="Number of files to crop in parallel")
+    parser.add_argument("--diff", action="store_true",
+                        help="Compare existing screenshots automatically (the example, or all of them)")
     
     args = parser.parse_args()
     
@@ -406,14 +534,25 @@ def main():
         return 0
     
     if args.crop:
-        return 0 if crop_existing_file(
+        return 0 if crop_files(
             args.crop,
             args.top,
             args.bottom,
             args.left,
             args.right,
+            jobs=args.jobs,
         ) else 1
     
+    if args.diff:
+        if screenshot_diff is None:
+            print("Error: --diff requires numpy. Install with: pip install numpy")
+            return 1
+        captures = screenshot_diff.find_captures([args.example] if args.example else None)
+        if not captures:
+            print("No comparison screenshots found.")
+            return 1
+        return 0 if not screenshot_diff.triage(captures) else 1
+    
     if not args.example:
         parser.print_help()
         return 1
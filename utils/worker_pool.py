@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Recycling worker processes for the autocheck tool.
+
+Long sweeps run their tasks in worker processes that are replaced after a
+number of tasks, or as soon as their resident memory crosses a ceiling, so
+memory that openpyxl leaves behind never accumulates over a whole run.
+Each worker samples its own memory while a task runs; the peak is reported
+with the task's result, and a task that exceeds the per-task memory budget
+ends its worker and is reported as failed while the sweep carries on.
+"""
+
+import os
+import sys
+import time
+import threading
+import collections
+import multiprocessing
+from multiprocessing.connection import wait
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Exit code of a worker that stopped itself for exceeding the memory budget
+MEMORY_EXIT_CODE = 86
+
+# How often a worker samples its memory while a task runs
+SAMPLE_INTERVAL = 0.02
+
+MB = 1024 * 1024
+
+TaskOutcome = collections.namedtuple('TaskOutcome', ['task', 'result', 'error', 'peak_rss'])
+
+
+def current_rss():
+    """Resident set size of this process in bytes, or None if it cannot be read"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        pass
+    if resource is not None:
+        # No /proc (e.g. macOS): fall back to the peak, which is in bytes there
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+    return None
+
+
+class _MemoryMonitor:
+    """Samples the worker's RSS in a thread and ends the worker when it exceeds the budget"""
+
+    def __init__(self, budget):
+        self.budget = budget
+        self.peak = 0
+        self._lock = threading.Lock()
+        thread = threading.Thread(target=self._run, daemon=True)
+        thread.start()
+
+    def reset(self):
+        with self._lock:
+            self.peak = current_rss() or 0
+
+    def _sample(self):
+        rss = current_rss()
+        if rss is None:
+            return
+        with self._lock:
+            self.peak = max(self.peak, rss)
+        if self.budget and rss > self.budget:
+            # The task cannot be interrupted safely from here; end the worker
+            # and let the pool report the task
+            os._exit(MEMORY_EXIT_CODE)
+
+    def _run(self):
+        while True:
+            self._sample()
+            time.sleep(SAMPLE_INTERVAL)
+
+    def task_peak(self):
+        self._sample()
+        with self._lock:
+            return self.peak
+
+
+def _worker_main(connection, task_function, initializer, initargs, memory_budget):
+    if initializer is not None:
+        initializer(*initargs)
+    monitor = _MemoryMonitor(memory_budget)
+    while True:
+        message = connection.recv()
+        if message is None:
+            break
+        index, task = message
+        monitor.reset()
+        try:
+            result, error = task_function(task), None
+        except Exception as e:
+            result, error = None, f"{type(e).__name__}: {e}"
+        connection.send((index, result, error, monitor.task_peak(), current_rss()))
+    connection.close()
+
+
+class _Worker:
+    def __init__(self, context, pool):
+        self.connection, child_connection = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main,
+            args=(child_connection, pool.task_function, pool.initializer, pool.initargs, pool.memory_budget),
+            daemon=True)
+        self.process.start()
+        child_connection.close()
+        self.tasks_done = 0
+        self.current = None
+
+    def stop(self):
+        try:
+            self.connection.send(None)
+        except OSError:
+            pass
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.connection.close()
+
+    def failure(self):
+        """Describe why a worker that died mid-task stopped"""
+        self.process.join(timeout=5)
+        code = self.process.exitcode
+        if code == MEMORY_EXIT_CODE:
+            return "exceeded the memory budget"
+        if code is not None and code < 0:
+            return f"worker was killed by signal {-code}"
+        return f"worker exited with code {code}"
+
+
+class RecyclingPool:
+    """Runs task_function(task) in worker processes that are recycled as they age or grow.
+
+    recycle_after replaces a worker after that many tasks; max_rss (bytes)
+    replaces it once its RSS after a task is above the ceiling. With
+    memory_budget (bytes), a worker whose RSS goes over the budget during a
+    task is ended, and the task's outcome carries an error instead of a
+    result. initializer(*initargs) runs once in every new worker.
+    """
+
+    def __init__(self, task_function, jobs=None, recycle_after=None, max_rss=None, memory_budget=None,
+                 initializer=None, initargs=()):
+        self.task_function = task_function
+        self.jobs = jobs or os.cpu_count() or 1
+        self.recycle_after = recycle_after
+        self.max_rss = max_rss
+        self.memory_budget = memory_budget
+        self.initializer = initializer
+        self.initargs = initargs
+        self.recycled = 0
+        self._context = multiprocessing.get_context()
+
+    def run(self, tasks):
+        """Yield a TaskOutcome per task, in the order of the tasks"""
+        tasks = list(tasks)
+        pending = collections.deque(enumerate(tasks))
+        outcomes = {}
+        next_index = 0
+        workers = []
+
+        def assign(worker):
+            if pending:
+                worker.current = pending.popleft()
+                worker.connection.send(worker.current)
+            else:
+                worker.current = None
+
+        try:
+            for _ in range(min(self.jobs, len(tasks))):
+                worker = _Worker(self._context, self)
+                workers.append(worker)
+                assign(worker)
+
+            while next_index < len(tasks):
+                busy = {worker.connection: worker for worker in workers if worker.current is not None}
+                for connection in wait(list(busy)):
+                    worker = busy[connection]
+                    try:
+                        index, result, error, peak, rss = connection.recv()
+                        outcomes[index] = TaskOutcome(tasks[index], result, error, peak)
+                        worker.tasks_done += 1
+                        retire = ((self.recycle_after and worker.tasks_done >= self.recycle_after)
+                                  or (self.max_rss and rss and rss > self.max_rss))
+                    except (EOFError, OSError):
+                        index = worker.current[0]
+                        outcomes[index] = TaskOutcome(tasks[index], None, worker.failure(), None)
+                        retire = True
+
+                    if retire:
+                        workers.remove(worker)
+                        worker.stop()
+                        if pending:
+                            self.recycled += 1
+                            worker = _Worker(self._context, self)
+                            workers.append(worker)
+                    assign(worker)
+
+                while next_index in outcomes:
+                    yield outcomes.pop(next_index)
+                    next_index += 1
+        finally:
+            for worker in workers:
+                worker.stop()
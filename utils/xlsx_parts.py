@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Package-part helpers for the autocheck tool.
+
+These work directly on the zip archive and the SpreadsheetML parts inside it,
+without building an openpyxl object model.
+"""
+
+import posixpath
+import re
+import xml.etree.ElementTree as ET
+
+# Namespaces used by the SpreadsheetML parts that libxlsxwriter writes
+NS = {
+    's': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main',
+    'r': 'http://schemas.openxmlformats.org/officeDocument/2006/relationships',
+    'pr': 'http://schemas.openxmlformats.org/package/2006/relationships',
+    'c': 'http://schemas.openxmlformats.org/drawingml/2006/chart',
+    'a': 'http://schemas.openxmlformats.org/drawingml/2006/main',
+}
+
+CELL_REF_RE = re.compile(r'^\$?([A-Z]{1,3})\$?(\d+)$')
+
+
+def qname(prefix, tag):
+    """Return the Clark-notation name ElementTree uses for prefix:tag"""
+    return f"{{{NS[prefix]}}}{tag}"
+
+
+def column_index(letters):
+    """Convert column letters (A, AB, XFD) to a 1-based column index"""
+    index = 0
+    for char in letters:
+        index = index * 26 + (ord(char) - 64)
+    return index
+
+
+def column_letters(index):
+    """Convert a 1-based column index to column letters"""
+    letters = ""
+    while index > 0:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+
+def parse_cell_ref(ref):
+    """Parse an A1-style cell reference into a (row, col) tuple, or None"""
+    match = CELL_REF_RE.match(ref)
+    if not match:
+        return None
+    return int(match.group(2)), column_index(match.group(1))
+
+
+def parse_range_ref(ref):
+    """Parse A1 or A1:B2 into an inclusive (row1, col1, row2, col2) rectangle, or None"""
+    first, _, last = ref.partition(':')
+    start = parse_cell_ref(first)
+    end = parse_cell_ref(last) if last else start
+    if start is None or end is None:
+        return None
+    return (min(start[0], end[0]), min(start[1], end[1]),
+            max(start[0], end[0]), max(start[1], end[1]))
+
+
+def parse_sqref(sqref):
+    """Parse a space separated sqref attribute into a list of rectangles"""
+    rects = []
+    for ref in (sqref or "").split():
+        rect = parse_range_ref(ref)
+        if rect is not None:
+            rects.append(rect)
+    return rects
+
+
+def format_range_ref(rect):
+    """Format an inclusive (row1, col1, row2, col2) rectangle as A1 or A1:B2"""
+    row1, col1, row2, col2 = rect
+    start = f"{column_letters(col1)}{row1}"
+    if (row1, col1) == (row2, col2):
+        return start
+    return f"{start}:{column_letters(col2)}{row2}"
+
+
+def rels_path(part):
+    """Return the name of the relationships part for a package part"""
+    directory, name = posixpath.split(part)
+    return posixpath.join(directory, "_rels", f"{name}.rels")
+
+
+def read_rels(xlsx_zip, part):
+    """Read the relationships of a part as {rId: (type, resolved target)}"""
+    rels_name = rels_path(part)
+    if rels_name not in xlsx_zip.namelist():
+        return {}
+
+    base = posixpath.dirname(part)
+    rels = {}
+    with xlsx_zip.open(rels_name) as file:
+        root = ET.parse(file).getroot()
+    for rel in root.findall('pr:Relationship', NS):
+        target = rel.get('Target', '')
+        if rel.get('TargetMode') != 'External':
+            target = posixpath.normpath(posixpath.join(base, target))
+        rels[rel.get('Id')] = (rel.get('Type', '').rsplit('/', 1)[-1], target)
+    return rels
+
+
+def list_sheets(xlsx_zip):
+    """List the sheets of a workbook in tab order as (name, part, kind) tuples.
+
+    kind is 'worksheet' or 'chartsheet', taken from the workbook relationships.
+    """
+    rels = read_rels(xlsx_zip, 'xl/workbook.xml')
+    with xlsx_zip.open('xl/workbook.xml') as file:
+        root = ET.parse(file).getroot()
+
+    sheets = []
+    for sheet in root.findall('s:sheets/s:sheet', NS):
+        rel_type, target = rels.get(sheet.get(qname('r', 'id')), ('', ''))
+        sheets.append((sheet.get('name'), target, rel_type))
+    return sheets
+
+
+def canonical_xml(element):
+    """Serialize an element with sorted attributes and stripped text.
+
+    Two elements that differ only in attribute order or insignificant
+    whitespace produce the same string, which makes the result usable as a
+    dictionary key or hash input.
+    """
+    attrs = " ".join(f'{key}="{value}"' for key, value in sorted(element.attrib.items()))
+    text = (element.text or "").strip()
+    children = "".join(canonical_xml(child) for child in element)
+    return f"<{element.tag} {attrs}>{text}{children}</{element.tag}>"
+
+
+def iter_sheet_cells(stream, with_style=False):
+    """Incrementally scan a worksheet stream and yield its cells in row-major order.
+
+    Yields (row, col, cell_type, value, formula) where value is the raw <v>
+    text (or the text of an inline string), and formula is None or a
+    (text, attributes) tuple for the cell's <f> element. With with_style
+    the cell's style index is added as a sixth item. Each row is
+    discarded as soon as it has been processed.
+    """
+    ns = f"{{{NS['s']}}}"
+    parser = ET.XMLPullParser(events=('start', 'end'))
+    sheet_data = None
+    # The r attributes of rows and cells are optional; without them rows and
+    # the cells within a row are sequential
+    row = 0
+    next_col = 1
+
+    for chunk in iter(lambda: stream.read(64 * 1024), b''):
+        parser.feed(chunk)
+        for event, element in parser.read_events():
+            if event == 'start':
+                if element.tag == ns + 'sheetData':
+                    sheet_data = element
+                elif element.tag == ns + 'row':
+                    row = int(element.get('r', row + 1))
+                    next_col = 1
+                continue
+            if element.tag == ns + 'c':
+                position = parse_cell_ref(element.get('r', '')) or (row, next_col)
+                next_col = position[1] + 1
+                cell_type = element.get('t', 'n')
+                if cell_type == 'inlineStr':
+                    value = "".join(t.text or "" for t in element.iter(ns + 't'))
+                else:
+                    value_element = element.find(ns + 'v')
+                    value = value_element.text if value_element is not None else None
+                formula_element = element.find(ns + 'f')
+                formula = None
+                if formula_element is not None:
+                    formula = (formula_element.text or "", dict(formula_element.attrib))
+                if with_style:
+                    yield position[0], position[1], cell_type, value, formula, int(element.get('s', 0))
+                else:
+                    yield position[0], position[1], cell_type, value, formula
+            elif element.tag == ns + 'row' and sheet_data is not None:
+                sheet_data.clear()
+    parser.close()
@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+Lightweight workbook reader for the autocheck tool.
+
+openpyxl builds an object for every cell, style and dimension of a
+workbook, and the checks throw most of that away. This reader parses only
+the SpreadsheetML the checks use, streaming each worksheet out of the
+archive, and keeps every sheet as parallel arrays: row, column, kind,
+value id and style id per cell. Shared strings stay in the shared-strings
+index and are decoded on demand; other values are interned once per
+workbook. Each cell style is reduced to digests of its number format,
+font, fill, border, alignment and protection, so styles of two workbooks
+compare by digest no matter how either one numbers its styles.
+
+openpyxl is only needed by the optional openpyxl check, which cross-checks
+this reader against it.
+"""
+
+import re
+import hashlib
+import datetime
+import collections
+import xml.etree.ElementTree as ET
+from array import array
+
+try:
+    from utils.xlsx_parts import NS, list_sheets, iter_sheet_cells, column_letters, canonical_xml
+    from utils.shared_strings import StringInterner, SharedStringsIndex
+    from utils.formula_tokens import expand_formula, formula_text
+    from utils.findings import Findings, RangeCollector
+except ModuleNotFoundError:
+    from xlsx_parts import NS, list_sheets, iter_sheet_cells, column_letters, canonical_xml
+    from shared_strings import StringInterner, SharedStringsIndex
+    from formula_tokens import expand_formula, formula_text
+    from findings import Findings, RangeCollector
+
+# Cell kinds, stored as one byte per cell
+NUMBER, SHARED_STRING, STRING, BOOL, ERROR, FORMULA, ARRAY_FORMULA, BLANK = range(8)
+KIND_NAMES = ('number', 'shared string', 'string', 'bool', 'error', 'formula', 'array formula', 'blank')
+
+# The components of a cell style, in the order of StyleTable digests
+STYLE_COMPONENTS = ('Number format', 'Font', 'Fill', 'Border', 'Alignment', 'Protection')
+
+DATE_TYPES = (datetime.datetime, datetime.date, datetime.time, datetime.timedelta)
+
+ESCAPED_RE = re.compile(r'_x([0-9A-Fa-f]{4})_')
+
+
+def unescape(text):
+    """Replace the _xHHHH_ escapes SpreadsheetML uses for control characters, as Excel does"""
+    if '_x' not in text:
+        return text
+    return ESCAPED_RE.sub(lambda match: chr(int(match.group(1), 16)), text)
+
+
+def read_style_components(xlsx_zip):
+    """Return the canonical components of every cellXfs entry, by index.
+
+    Each style is a tuple of strings in STYLE_COMPONENTS order, resolved
+    through the number format, font, fill and border tables.
+    """
+    if 'xl/styles.xml' not in xlsx_zip:
+        return []
+    with xlsx_zip.open('xl/styles.xml') as file:
+        root = ET.parse(file).getroot()
+
+    num_fmts = {fmt.get('numFmtId'): fmt.get('formatCode') for fmt in root.findall('s:numFmts/s:numFmt', NS)}
+    fonts = [canonical_xml(font) for font in root.findall('s:fonts/s:font', NS)]
+    fills = [canonical_xml(fill) for fill in root.findall('s:fills/s:fill', NS)]
+    borders = [canonical_xml(border) for border in root.findall('s:borders/s:border', NS)]
+
+    def pick(table, index):
+        index = int(index or 0)
+        return table[index] if index < len(table) else ""
+
+    styles = []
+    for xf in root.findall('s:cellXfs/s:xf', NS):
+        num_fmt_id = xf.get('numFmtId', '0')
+        alignment = xf.find('s:alignment', NS)
+        protection = xf.find('s:protection', NS)
+        styles.append((
+            num_fmts.get(num_fmt_id, f"builtin {num_fmt_id}"),
+            pick(fonts, xf.get('fontId')),
+            pick(fills, xf.get('fillId')),
+            pick(borders, xf.get('borderId')),
+            canonical_xml(alignment) if alignment is not None else "",
+            canonical_xml(protection) if protection is not None else "",
+        ))
+    return styles
+
+
+class StyleTable:
+    """Digests of the components of every cell style of a workbook"""
+
+    def __init__(self, xlsx_zip):
+        self.digests = [tuple(hashlib.blake2b(component.encode(), digest_size=8).digest() for component in style)
+                        for style in read_style_components(xlsx_zip)]
+        self._default = self.digests[0] if self.digests else (b'',) * len(STYLE_COMPONENTS)
+
+    def __len__(self):
+        return len(self.digests)
+
+    def digest(self, style_id):
+        return self.digests[style_id] if style_id < len(self.digests) else self._default
+
+
+class SheetCells:
+    """The cells of one worksheet in row-major order, as parallel compact arrays"""
+
+    __slots__ = ('rows', 'cols', 'kinds', 'values', 'styles')
+
+    def __init__(self):
+        self.rows = array('L')
+        self.cols = array('H')
+        self.kinds = bytearray()
+        self.values = array('L')
+        self.styles = array('L')
+
+    def append(self, row, col, kind, value_id, style_id):
+        self.rows.append(row)
+        self.cols.append(col)
+        self.kinds.append(kind)
+        self.values.append(value_id)
+        self.styles.append(style_id)
+
+    def __len__(self):
+        return len(self.rows)
+
+
+Worksheet = collections.namedtuple('Worksheet', ['name', 'kind', 'cells', 'max_row', 'max_column'])
+
+
+class XlsxWorkbook:
+    """The sheets, values and styles of a workbook, read straight from its archive.
+
+    archive is an XlsxArchive. Worksheets are parsed the first time they
+    are asked for and kept as SheetCells.
+    """
+
+    def __init__(self, archive):
+        self.archive = archive
+        self._parts = {name: (part, kind) for name, part, kind in list_sheets(archive)}
+        self.sheetnames = list(self._parts)
+        self.strings = SharedStringsIndex(archive, StringInterner())
+        self.styles = StyleTable(archive)
+        self._values = []
+        self._value_ids = {}
+        self._sheets = {}
+
+    def _intern(self, kind, value):
+        # Keyed by kind too, since True == 1 and "1" is not 1
+        key = (kind, value)
+        value_id = self._value_ids.get(key)
+        if value_id is None:
+            value_id = self._value_ids[key] = len(self._values)
+            self._values.append(value)
+        return value_id
+
+    def __getitem__(self, name):
+        if name not in self._sheets:
+            self._sheets[name] = self._read_sheet(name)
+        return self._sheets[name]
+
+    def worksheets(self):
+        """Yield the worksheets in tab order, skipping chartsheets"""
+        for name in self.sheetnames:
+            if self._parts[name][1] == 'worksheet':
+                yield self[name]
+
+    def _read_sheet(self, name):
+        part, kind = self._parts[name]
+        cells = SheetCells()
+        if kind != 'worksheet':
+            return Worksheet(name, kind, cells, 0, 0)
+
+        shared_masters = {}
+        max_row = max_column = 0
+        with self.archive.open(part) as stream:
+            for row, col, cell_type, value, formula, style in iter_sheet_cells(stream, with_style=True):
+                if formula is not None:
+                    text, array_ref = expand_formula(formula, row, col, shared_masters, lazy=True)
+                    if array_ref is not None:
+                        cell_kind, value_id = ARRAY_FORMULA, self._intern(ARRAY_FORMULA, (text, array_ref))
+                    else:
+                        cell_kind, value_id = FORMULA, self._intern(FORMULA, text)
+                elif value is None:
+                    if style == 0:
+                        continue
+                    cell_kind, value_id = BLANK, self._intern(BLANK, None)
+                elif cell_type == 's':
+                    cell_kind, value_id = SHARED_STRING, int(value)
+                elif cell_type in ('inlineStr', 'str'):
+                    cell_kind, value_id = STRING, self._intern(STRING, unescape(value))
+                elif cell_type == 'b':
+                    cell_kind, value_id = BOOL, self._intern(BOOL, value == '1')
+                elif cell_type == 'e':
+                    cell_kind, value_id = ERROR, self._intern(ERROR, value)
+                else:
+                    number = float(value)
+                    cell_kind, value_id = NUMBER, self._intern(NUMBER, int(number) if number.is_integer() else number)
+                cells.append(row, col, cell_kind, value_id, style)
+                max_row = max(max_row, row)
+                max_column = max(max_column, col)
+        return Worksheet(name, kind, cells, max_row, max_column)
+
+    def value(self, kind, value_id):
+        """Decode a cell's value the way openpyxl shows it: formulas as "=..." text"""
+        if kind == SHARED_STRING:
+            return unescape(self.strings.text(value_id))
+        value = self._values[value_id]
+        if kind == FORMULA:
+            return f"={formula_text(value)}"
+        if kind == ARRAY_FORMULA:
+            return f"{{={formula_text(value[0])}}}"
+        return value
+
+    def iter_values(self, sheet, kinds=None):
+        """Yield (row, col, kind, value) for the cells of a worksheet, optionally only of the given kinds"""
+        cells = sheet.cells
+        for index in range(len(cells)):
+            kind = cells.kinds[index]
+            if kinds is not None and kind not in kinds:
+                continue
+            yield cells.rows[index], cells.cols[index], kind, self.value(kind, cells.values[index])
+
+    def suspicious_strings(self):
+        """Return the shared string indexes with null characters or a trailing ellipsis"""
+        return {index for index, _ in self.strings.suspicious()}
+
+
+def coordinate(row, col):
+    return f"{column_letters(col)}{row}"
+
+
+def compare_style_ids(gen_styles, ref_styles, gen_style, ref_style, cache):
+    """Return the names of the style components that differ between two style ids, memoized in cache"""
+    key = (gen_style, ref_style)
+    if key not in cache:
+        gen_digest, ref_digest = gen_styles.digest(gen_style), ref_styles.digest(ref_style)
+        cache[key] = [name for name, gen, ref in zip(STYLE_COMPONENTS, gen_digest, ref_digest) if gen != ref]
+    return cache[key]
+
+
+def iter_style_pairs(gen_cells, ref_cells):
+    """Merge-join two sheets in row-major order and yield (row, col, gen style, ref style).
+
+    A cell that only one sheet has is paired with style 0 on the other side.
+    """
+    gen_index = ref_index = 0
+    gen_count, ref_count = len(gen_cells), len(ref_cells)
+    while gen_index < gen_count or ref_index < ref_count:
+        gen_key = (gen_cells.rows[gen_index], gen_cells.cols[gen_index]) if gen_index < gen_count else None
+        ref_key = (ref_cells.rows[ref_index], ref_cells.cols[ref_index]) if ref_index < ref_count else None
+        if ref_key is None or (gen_key is not None and gen_key < ref_key):
+            yield gen_key + (gen_cells.styles[gen_index], 0)
+            gen_index += 1
+        elif gen_key is None or ref_key < gen_key:
+            yield ref_key + (0, ref_cells.styles[ref_index])
+            ref_index += 1
+        else:
+            yield gen_key + (gen_cells.styles[gen_index], ref_cells.styles[ref_index])
+            gen_index += 1
+            ref_index += 1
+
+
+def _openpyxl_value(value, epoch):
+    """Bring an openpyxl cell value to the form the reader gives it: dates as serial numbers, array formulas as {=...}"""
+    if isinstance(value, DATE_TYPES):
+        from openpyxl.utils.datetime import to_excel
+        return to_excel(value, epoch)
+    if hasattr(value, 'ref') and hasattr(value, 'text'):
+        return f"{{{value.text}}}"
+    return value
+
+
+def _same_value(reader_value, openpyxl_value):
+    if isinstance(reader_value, (int, float)) and isinstance(openpyxl_value, (int, float)) \
+            and not isinstance(reader_value, bool) and not isinstance(openpyxl_value, bool):
+        return abs(reader_value - openpyxl_value) <= 1e-9 * max(1, abs(openpyxl_value))
+    return reader_value == openpyxl_value
+
+
+def check_against_openpyxl(workbook, openpyxl_workbook, example_name, max_findings=None):
+    """Cross-check the values the reader gives for every worksheet against openpyxl's"""
+    has_differences = False
+    with Findings(example_name, max_findings) as findings:
+        if workbook.sheetnames != openpyxl_workbook.sheetnames:
+            findings.count()
+            findings.warn("Sheet names differ from openpyxl:", openpyxl_workbook.sheetnames, workbook.sheetnames)
+            has_differences = True
+
+        for sheet in workbook.worksheets():
+            if findings.exhausted or sheet.name not in openpyxl_workbook.sheetnames:
+                continue
+            expected = {}
+            for row in openpyxl_workbook[sheet.name].iter_rows():
+                for cell in row:
+                    if cell.value is not None:
+                        expected[(cell.row, cell.column)] = _openpyxl_value(cell.value, openpyxl_workbook.epoch)
+            values = {(row, col): value for row, col, kind, value in workbook.iter_values(sheet) if kind != BLANK}
+
+            with RangeCollector(findings, lambda kind, name=sheet.name: f"{kind} in sheet '{name}'") as collector:
+                for position in sorted(expected.keys() | values.keys()):
+                    if findings.exhausted:
+                        break
+                    reader_value, openpyxl_value = values.get(position), expected.get(position)
+                    if not _same_value(reader_value, openpyxl_value):
+                        collector.add(*position, "Reader value differs from openpyxl", openpyxl_value, reader_value)
+                        has_differences = True
+
+        findings.stopped_note()
+    return not has_differences
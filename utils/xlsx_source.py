@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+Workbook source helpers for the autocheck tool.
+
+A generated workbook can be given to the checks as a path, as the bytes of
+an xlsx file (bytes, bytearray or memoryview), as a seekable binary file
+object or as an already open XlsxArchive. When no source is given the
+checks fall back to the <example_name>.xlsm / <example_name>.xlsx file in
+the current directory.
+"""
+
+import contextlib
+import hashlib
+import io
+import mmap
+import os
+import struct
+import zipfile
+from pathlib import Path
+
+# Size of the fixed part of a zip local file header
+LOCAL_HEADER_SIZE = 30
+
+# Chunk size used when streaming members
+CHUNK_SIZE = 256 * 1024
+
+# Parts that inflate() decompresses ahead of time by default
+XML_SUFFIXES = ('.xml', '.rels', '.vml')
+
+
+class BufferReader(io.RawIOBase):
+    """Read-only, seekable file object over a buffer, without copying it.
+
+    io.BytesIO copies anything that is not a bytes object; this reader
+    keeps a memoryview of the original buffer and only copies the slices
+    that are actually read.
+    """
+
+    def __init__(self, buffer):
+        super().__init__()
+        self._view = memoryview(buffer).cast('B')
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, target):
+        end = min(self._pos + len(target), len(self._view))
+        count = end - self._pos
+        target[:count] = self._view[self._pos:end]
+        self._pos = end
+        return count
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            self._pos = offset
+        elif whence == io.SEEK_CUR:
+            self._pos += offset
+        elif whence == io.SEEK_END:
+            self._pos = len(self._view) + offset
+        else:
+            raise ValueError(f"invalid whence ({whence})")
+        if self._pos < 0:
+            raise ValueError("negative seek position")
+        return self._pos
+
+    def tell(self):
+        return self._pos
+
+    def close(self):
+        # Release the view so the underlying buffer can be resized or closed
+        self._view.release()
+        super().close()
+
+
+class XlsxArchive:
+    """A workbook archive that is mapped and indexed once and shared by all checks.
+
+    Files are memory-mapped rather than read through a buffered file, and
+    the central directory is parsed a single time when the archive is
+    opened. Members can then be streamed with open(), or, when they are
+    stored uncompressed, viewed in place with view() without any copy.
+    Views and readers must not outlive the archive.
+
+    With preload=True a file is read into memory up front instead of being
+    mapped, so no later access has to wait for the disk. inflate()
+    decompresses members ahead of time; open(), read() and view() then
+    serve them from memory.
+    """
+
+    def __init__(self, source, preload=False):
+        self.path = Path(source) if isinstance(source, (str, os.PathLike)) else None
+        self._file = None
+        self._map = None
+        self._inflated = {}
+        self._digest = None
+
+        if self.path is not None and preload:
+            with open(self.path, 'rb') as f:
+                self._buffer = memoryview(f.read())
+        elif self.path is not None:
+            self._file = open(self.path, 'rb')
+            try:
+                self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                self._file.close()
+                raise zipfile.BadZipFile(f"File is empty: {self.path}")
+            self._buffer = memoryview(self._map)
+        elif isinstance(source, (bytes, bytearray, memoryview)):
+            self._buffer = memoryview(source).cast('B')
+        else:
+            # Arbitrary file objects cannot be mapped; read them once
+            source.seek(0)
+            self._buffer = memoryview(source.read())
+
+        self._reader = BufferReader(self._buffer)
+        self._zip = zipfile.ZipFile(self._reader, 'r')
+
+    @property
+    def size(self):
+        return len(self._buffer)
+
+    @property
+    def label(self):
+        if self.path is not None:
+            return str(self.path)
+        return f"<in-memory workbook, {self.size} bytes>"
+
+    def namelist(self):
+        return self._zip.namelist()
+
+    def infolist(self):
+        return self._zip.infolist()
+
+    def getinfo(self, name):
+        return self._zip.getinfo(name)
+
+    def __contains__(self, name):
+        return name in self._zip.NameToInfo
+
+    def open(self, name):
+        """Open a member as a streaming, decompressing file object"""
+        if name in self._inflated:
+            return io.BytesIO(self._inflated[name])
+        return self._zip.open(name)
+
+    def read(self, name):
+        """Read and decompress a whole member"""
+        if name in self._inflated:
+            return self._inflated[name]
+        return self._zip.read(name)
+
+    def inflate(self, names=None):
+        """Decompress members into memory now rather than when a check reads them.
+
+        By default every compressed XML part is inflated; media and other
+        binary parts are left to be streamed.
+        """
+        if names is None:
+            names = [info.filename for info in self._zip.infolist()
+                     if info.compress_type != zipfile.ZIP_STORED and info.filename.endswith(XML_SUFFIXES)]
+        for name in names:
+            if name not in self._inflated:
+                self._inflated[name] = self._zip.read(name)
+
+    def view(self, name):
+        """Return a member's content as a memoryview.
+
+        Stored members are sliced straight out of the mapped archive; only
+        compressed members have to be decompressed into a new buffer.
+        """
+        info = self._zip.getinfo(name)
+        if info.compress_type != zipfile.ZIP_STORED:
+            return memoryview(self.read(name))
+        # The local header's extra field can differ from the central directory's
+        name_length, extra_length = struct.unpack_from('<HH', self._buffer, info.header_offset + 26)
+        start = info.header_offset + LOCAL_HEADER_SIZE + name_length + extra_length
+        return self._buffer[start:start + info.file_size]
+
+    def iter_chunks(self, name, chunk_size=CHUNK_SIZE):
+        """Yield a member's decompressed content in fixed-size chunks"""
+        with self.open(name) as member:
+            for chunk in iter(lambda: member.read(chunk_size), b''):
+                yield chunk
+
+    def reader(self):
+        """Return a new file object over the whole archive, e.g. for openpyxl"""
+        return BufferReader(self._buffer)
+
+    def digest(self):
+        """SHA-256 of the whole archive as a hex string, worked out once"""
+        if self._digest is None:
+            self._digest = hashlib.sha256(self._buffer).hexdigest()
+        return self._digest
+
+    def close(self):
+        self._inflated.clear()
+        self._zip.close()
+        self._reader.close()
+        self._buffer.release()
+        if self._map is not None:
+            try:
+                self._map.close()
+            except BufferError:
+                # A view handed out by view() is still alive; the map is
+                # released when it is garbage collected
+                pass
+        if self._file is not None:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+@contextlib.contextmanager
+def open_archive(source):
+    """Open a workbook source as an XlsxArchive for the duration of a with block.
+
+    An XlsxArchive passed in is used as is and left open for its owner.
+    """
+    if isinstance(source, XlsxArchive):
+        yield source
+        return
+    archive = XlsxArchive(source)
+    try:
+        yield archive
+    finally:
+        archive.close()
+
+
+def members_equal(first, second, name):
+    """Compare a member of two archives, streaming only when the CRCs agree"""
+    first_info, second_info = first.getinfo(name), second.getinfo(name)
+    if first_info.file_size != second_info.file_size or first_info.CRC != second_info.CRC:
+        return False
+    return all(a == b for a, b in zip(first.iter_chunks(name), second.iter_chunks(name)))
+
+
+def generated_path(example_name):
+    """Return the generated file for an example, preferring the macro-enabled .xlsm"""
+    generated_file = Path(f"{example_name}.xlsx")
+    generated_macro_file = Path(f"{example_name}.xlsm")
+    return generated_macro_file if generated_macro_file.exists() else generated_file
+
+
+def reference_path(example_name, reference_dir):
+    """Return the reference file for an example, preferring the macro-enabled .xlsm"""
+    reference_file = reference_dir / f"{example_name}.xlsx"
+    reference_macro_file = reference_dir / f"{example_name}.xlsm"
+    return reference_macro_file if reference_macro_file.exists() else reference_file
+
+
+def resolve_generated(example_name, generated=None):
+    """Return the generated source to check: the given one, or the example's file on disk"""
+    if generated is None:
+        return generated_path(example_name)
+    if isinstance(generated, str):
+        return Path(generated)
+    return generated
+
+
+def resolve_reference(example_name, reference_dir, reference=None):
+    """Return the reference source to compare against: the given one, or the reference file on disk"""
+    if reference is None:
+        return reference_path(example_name, reference_dir)
+    if isinstance(reference, str):
+        return Path(reference)
+    return reference
+
+
+def open_source(source):
+    """Return something zipfile.ZipFile and openpyxl.load_workbook both accept.
+
+    Paths are returned unchanged. bytes are wrapped in io.BytesIO, which
+    shares the buffer; bytearray and memoryview get a BufferReader, and so
+    does an XlsxArchive. File objects are rewound and returned as they are.
+    """
+    if isinstance(source, XlsxArchive):
+        return source.reader()
+    if isinstance(source, (str, os.PathLike)):
+        return source
+    if isinstance(source, bytes):
+        return io.BytesIO(source)
+    if isinstance(source, (bytearray, memoryview)):
+        return BufferReader(source)
+    source.seek(0)
+    return source
+
+
+def source_size(source):
+    """Return the size in bytes of a workbook source"""
+    if isinstance(source, XlsxArchive):
+        return source.size
+    if isinstance(source, (str, os.PathLike)):
+        return Path(source).stat().st_size
+    if isinstance(source, (bytes, bytearray)):
+        return len(source)
+    if isinstance(source, memoryview):
+        return source.nbytes
+    return source.seek(0, io.SEEK_END)
+
+
+def source_label(source):
+    """Describe a workbook source for messages"""
+    if isinstance(source, XlsxArchive):
+        return source.label
+    if isinstance(source, (str, os.PathLike)):
+        return str(source)
+    return f"<in-memory workbook, {source_size(source)} bytes>"
+
+
+def source_path(source):
+    """Return the file path behind a workbook source, or None for in-memory sources"""
+    if isinstance(source, XlsxArchive):
+        return source.path
+    if isinstance(source, (str, os.PathLike)):
+        return Path(source)
+    return None
+
+
+def source_exists(source):
+    """Return True if a path source exists; in-memory sources always exist"""
+    if isinstance(source, (str, os.PathLike)):
+        return Path(source).exists()
+    return True